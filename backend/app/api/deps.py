@@ -1,43 +1,3 @@
-from fastapi import Depends, HTTPException, status
-from fastapi.security import OAuth2PasswordBearer
-from jose import jwt, JWTError
-from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy.future import select
-from app.core.config import settings
-from app.core.database import get_db
-from app.models.user import User
-
-oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/api/auth/login")
-
-async def get_current_user(
-    token: str = Depends(oauth2_scheme), 
-    db: AsyncSession = Depends(get_db)
-) -> User:
-    credentials_exception = HTTPException(
-        status_code=status.HTTP_401_UNAUTHORIZED,
-        detail="Could not validate credentials",
-        headers={"WWW-Authenticate": "Bearer"},
-    )
-    try:
-        payload = jwt.decode(token, settings.SECRET_KEY, algorithms=[settings.ALGORITHM])
-        username: str = payload.get("sub")
-        if username is None:
-            raise credentials_exception
-    except JWTError:
-        raise credentials_exception
-        
-    query = select(User).where(User.username == username)
-    result = await db.execute(query)
-    user = result.scalars().first()
-    
-    if user is None:
-        raise credentials_exception
-    return user
-
-async def get_current_admin(current_user: User = Depends(get_current_user)) -> User:
-    if current_user.role not in ["admin", "superadmin"]:
-        raise HTTPException(
-            status_code=status.HTTP_403_FORBIDDEN, 
-            detail="Not enough permissions"
-        )
-    return current_user
\ No newline at end of file
+# Auth dependencies live in app.core.security (one implementation, backed by
+# the principal cache); re-exported here for routers that import from deps.
+from app.core.security import oauth2_scheme, get_current_user, get_current_admin
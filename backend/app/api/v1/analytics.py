@@ -0,0 +1,49 @@
+from fastapi import APIRouter, Depends, Query
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import List, Optional
+
+from app.core.database import get_read_db
+from app.core.security import get_current_admin
+from app.core import analytics
+from app.models.user import User
+from app.schemas.analytics import TopSeller, CategoryRevenue, StockForecast
+
+router = APIRouter()
+
+# All of these read the sales rollup tables (a few hundred rows per window),
+# never the raw event log, and go to a read replica when one is configured.
+# Each first folds in sales the background roll-up hasn't got to yet.
+# `hours` is the window ending now; up to 6 hours uses per-minute buckets.
+
+@router.get("/top-sellers", response_model=List[TopSeller])
+async def top_sellers(
+    hours: int = Query(24, ge=1, le=24 * 90),
+    limit: int = Query(10, ge=1, le=100),
+    category: Optional[str] = None,
+    db: AsyncSession = Depends(get_read_db),
+    admin: User = Depends(get_current_admin)
+):
+    await analytics.rollup_updater.catch_up()
+    return await analytics.top_sellers(db, hours, limit, category)
+
+@router.get("/revenue-by-category", response_model=List[CategoryRevenue])
+async def revenue_by_category(
+    hours: int = Query(24, ge=1, le=24 * 90),
+    db: AsyncSession = Depends(get_read_db),
+    admin: User = Depends(get_current_admin)
+):
+    await analytics.rollup_updater.catch_up()
+    return await analytics.revenue_by_category(db, hours)
+
+@router.get("/stock-forecast", response_model=List[StockForecast])
+async def stock_forecast(
+    hours: int = Query(24, ge=1, le=24 * 14), # Sales history to learn the rate from
+    half_life_hours: float = Query(6, gt=0), # How fast older hours stop counting
+    limit: int = Query(20, ge=1, le=200),
+    category: Optional[str] = None,
+    db: AsyncSession = Depends(get_read_db),
+    admin: User = Depends(get_current_admin)
+):
+    await analytics.rollup_updater.catch_up()
+    # Sweets that will run out first, at their recent sales rate
+    return await analytics.stock_forecast(db, hours, half_life_hours, limit, category)
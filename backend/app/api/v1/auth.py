@@ -4,13 +4,15 @@ from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.future import select
 from datetime import timedelta
 
-from app.core.database import get_db
-from app.core.security import create_access_token, get_password_hash, verify_password
+from app.core.database import get_db, lock_for_write
+from app.core.security import create_access_token, get_current_admin, get_password_hash_async, verify_password_async
 from app.core.config import settings
+from app.core.refresh_tokens import InvalidRefreshToken, issue_refresh_token, revoke_refresh_token, rotate_refresh_token
+from app.core.user_admin import ROLES, SuperadminsProtected, set_roles
 from app.models.user import User
 # UPDATED: Import UserResponse instead of UserPublic
-from app.schemas.user import UserCreate, UserResponse 
-from app.schemas.token import Token
+from app.schemas.user import UserCreate, UserResponse, RoleChange, RoleChangeReport
+from app.schemas.token import Token, RefreshRequest
 
 router = APIRouter()
 
@@ -24,12 +26,17 @@ async def register_user(user_in: UserCreate, db: AsyncSession = Depends(get_db))
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="Username already registered"
         )
+    # Anyone can sign up, so only as the lowest role; an admin promotes
+    # staff afterwards through PUT /users/role
+    if user_in.role not in ROLES:
+        raise HTTPException(status_code=400, detail=f"Role must be one of: {', '.join(ROLES)}")
+    if user_in.role != ROLES[0]:
+        raise HTTPException(status_code=403, detail=f"New accounts are {ROLES[0]}s; ask an admin for a different role")
     
-    # Create new user (Now including ROLE)
     new_user = User(
         username=user_in.username,
-        hashed_password=get_password_hash(user_in.password),
-        role=user_in.role # <--- Save the selected role
+        hashed_password=await get_password_hash_async(user_in.password),
+        role=user_in.role
     )
     db.add(new_user)
     await db.commit()
@@ -42,18 +49,74 @@ async def login_for_access_token(form_data: OAuth2PasswordRequestForm = Depends(
     result = await db.execute(select(User).where(User.username == form_data.username))
     user = result.scalars().first()
     
-    if not user or not verify_password(form_data.password, user.hashed_password):
+    verified, new_hash = await verify_password_async(form_data.password, user.hashed_password) if user else (False, None)
+    if not verified:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Incorrect username or password",
             headers={"WWW-Authenticate": "Bearer"},
         )
-    
-    # Create token
+
+    # Writes below: end the read transaction first so SQLite can take the write lock
+    await db.commit()
+    await lock_for_write(db)
+    # Hash was made with old Argon2 parameters: store the upgraded one
+    if new_hash:
+        user.hashed_password = new_hash
+    refresh_token = issue_refresh_token(db, user.id)
+    await db.commit()
+    return _token_pair(user, refresh_token)
+
+def _token_pair(user: User, refresh_token: str) -> dict:
     access_token_expires = timedelta(minutes=settings.ACCESS_TOKEN_EXPIRE_MINUTES)
     # UPDATED: Include role in the token so frontend knows permissions immediately
     access_token = create_access_token(
-        data={"sub": user.username, "role": user.role}, 
+        data={"sub": user.username, "uid": user.id, "role": user.role}, 
         expires_delta=access_token_expires
     )
-    return {"access_token": access_token, "token_type": "bearer"}
\ No newline at end of file
+    return {"access_token": access_token, "token_type": "bearer", "refresh_token": refresh_token}
+
+# --- REFRESH (New access token without the password) ---
+@router.post("/refresh", response_model=Token)
+async def refresh_access_token(body: RefreshRequest, db: AsyncSession = Depends(get_db)):
+    # Tills stay signed in for a shift without re-sending the password every
+    # ACCESS_TOKEN_EXPIRE_MINUTES: one indexed lookup, no Argon2. The refresh
+    # token is rotated, so keep the new one from the response.
+    try:
+        user, refresh_token = await rotate_refresh_token(db, body.refresh_token)
+    except InvalidRefreshToken:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Invalid or expired refresh token",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
+    return _token_pair(user, refresh_token)
+
+@router.post("/logout")
+async def logout(body: RefreshRequest, db: AsyncSession = Depends(get_db)):
+    # Revokes the refresh token and every earlier/later one from the same login.
+    # Access tokens already issued run out on their own.
+    await revoke_refresh_token(db, body.refresh_token)
+    return {"message": "Logged out"}
+
+# --- ROLES (Admin Only) ---
+@router.put("/users/role", response_model=RoleChangeReport)
+async def change_roles(
+    body: RoleChange,
+    db: AsyncSession = Depends(get_db),
+    current_user: User = Depends(get_current_admin),
+):
+    # Bulk promote/demote, e.g. a store's staff list. Changed users' access
+    # tokens stop working on this worker straight away and on the others
+    # within AUTH_REVOCATION_POLL_SECONDS; the new role comes with their next
+    # login or refresh.
+    if body.role not in ROLES:
+        raise HTTPException(status_code=400, detail=f"Role must be one of: {', '.join(ROLES)}")
+    if body.role == "superadmin" and current_user.role != "superadmin":
+        raise HTTPException(status_code=403, detail="Only a superadmin can grant superadmin")
+    if current_user.username in body.usernames:
+        raise HTTPException(status_code=403, detail="You can't change your own role")
+    try:
+        return await set_roles(db, body.usernames, body.role, acting_role=current_user.role)
+    except SuperadminsProtected as exc:
+        raise HTTPException(status_code=403, detail=f"Only a superadmin can change a superadmin's role: {', '.join(exc.usernames)}")
@@ -0,0 +1,99 @@
+from datetime import datetime
+from fastapi import APIRouter, Depends, HTTPException
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import select
+from typing import List
+
+from app.api.v1.sweets import SWEET_COLUMNS, sell_basket
+from app.core.catalog_snapshot import catalog_snapshot
+from app.core.config import settings
+from app.core.database import get_db, get_write_db
+from app.core.inventory import OutOfStock
+from app.core.reservations import Hold, reservation_ledger
+from app.core.security import get_current_user
+from app.models.sweet import Sweet
+from app.models.user import User
+from app.schemas.reservation import Availability, ReservationConfirm, ReservationCreate, ReservationResponse
+from app.schemas.sweet import SweetResponse
+
+router = APIRouter()
+
+# A cart is the user's set of holds: units set aside for RESERVATION_TTL_SECONDS
+# that other shoppers' purchases can't take. Confirm buys them in one
+# transaction; release (or expiry) hands them back. Holds live in this
+# worker's memory (app/core/reservations.py).
+
+def _response(hold: Hold) -> dict:
+    return {"id": hold.id, "sweet_id": hold.sweet_id, "amount": hold.amount, "expires_at": datetime.utcfromtimestamp(hold.expires_at)}
+
+async def _known_to_snapshot(db: AsyncSession, sweet_id: int):
+    # Holds are checked against the snapshot's stock; sweets another worker
+    # created since its last refresh are added to it first
+    await catalog_snapshot.ensure_fresh()
+    if catalog_snapshot.quantity(sweet_id) is not None:
+        return
+    result = await db.execute(select(*SWEET_COLUMNS).where(Sweet.id == sweet_id))
+    sweet = result.mappings().first()
+    if sweet is None:
+        raise HTTPException(status_code=404, detail="Sweet not found")
+    catalog_snapshot.upsert(sweet["id"], sweet["name"], sweet["category"], sweet["price"], sweet["quantity"], sweet["is_veg"])
+
+@router.post("/", response_model=ReservationResponse)
+async def reserve(
+    body: ReservationCreate,
+    db: AsyncSession = Depends(get_db),
+    user: User = Depends(get_current_user)
+):
+    await _known_to_snapshot(db, body.sweet_id)
+    ttl = min(body.ttl_seconds or settings.RESERVATION_TTL_SECONDS, settings.RESERVATION_MAX_TTL_SECONDS)
+    try:
+        hold = reservation_ledger.hold(user.id, body.sweet_id, body.amount, ttl)
+    except OutOfStock:
+        raise HTTPException(status_code=400, detail="Not enough stock available")
+    return _response(hold)
+
+@router.get("/", response_model=List[ReservationResponse])
+async def my_reservations(user: User = Depends(get_current_user)):
+    return [_response(hold) for hold in reservation_ledger.for_user(user.id)]
+
+@router.get("/available/{sweet_id}", response_model=Availability)
+async def availability(sweet_id: int, db: AsyncSession = Depends(get_db)):
+    # Answered from memory unless the snapshot has never seen the sweet
+    await _known_to_snapshot(db, sweet_id)
+    quantity = catalog_snapshot.quantity(sweet_id)
+    return {"sweet_id": sweet_id, "quantity": quantity, "held": reservation_ledger.held(sweet_id), "available": reservation_ledger.available(sweet_id)}
+
+@router.post("/confirm", response_model=List[SweetResponse])
+async def confirm(
+    body: ReservationConfirm,
+    db: AsyncSession = Depends(get_write_db),
+    user: User = Depends(get_current_user)
+):
+    if body.ids is None:
+        holds = reservation_ledger.for_user(user.id)
+    else:
+        # Each hold once: taking one twice would sell its units twice
+        holds = [reservation_ledger.get(hold_id) for hold_id in dict.fromkeys(body.ids)]
+        if any(hold is None or hold.user_id != user.id for hold in holds):
+            raise HTTPException(status_code=404, detail="Reservation not found or expired")
+    if not holds:
+        raise HTTPException(status_code=404, detail="No reservations to confirm")
+
+    wanted: dict[int, int] = {}
+    for hold in holds:
+        wanted[hold.sweet_id] = wanted.get(hold.sweet_id, 0) + hold.amount
+    # The held units become this sale's; they are spent or, if the sale
+    # fails, handed back (reserve again to retry)
+    taken = [reservation_ledger.take(hold) for hold in holds]
+    try:
+        return await sell_basket(db, wanted, user.id)
+    finally:
+        reservation_ledger.release(*taken)
+
+@router.delete("/{hold_id}")
+async def release(hold_id: str, user: User = Depends(get_current_user)):
+    hold = reservation_ledger.get(hold_id)
+    if hold is None or hold.user_id != user.id:
+        raise HTTPException(status_code=404, detail="Reservation not found or expired")
+    reservation_ledger.release(hold)
+    return {"message": "Reservation released"}
@@ -1,49 +1,217 @@
-from fastapi import APIRouter, Depends, HTTPException, status, Query
+from fastapi import APIRouter, Depends, HTTPException, status, Query, UploadFile, File, Request, Response
+from fastapi.responses import StreamingResponse
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.future import select
-from sqlalchemy import and_ # <--- NEW IMPORT
+from sqlalchemy import and_, update # <--- NEW IMPORT
 from typing import List, Optional
+import hashlib
+import time
+from contextlib import contextmanager
+from email.utils import formatdate, parsedate_to_datetime
 
-from app.core.database import get_db
+from app.core.database import get_read_db, get_write_db, lock_for_write, read_sessionmaker
 from app.models.user import User
 from app.models.sweet import Sweet
-from app.schemas.sweet import SweetCreate, SweetResponse, SweetUpdate, SweetInventoryOp # <--- NEW IMPORT
+from app.models.inventory_event import InventoryEvent
+from app.schemas.sweet import SweetCreate, SweetResponse, SweetUpdate, SweetInventoryOp, SweetCheckout, ImportReport, SweetSuggestion, InventoryEventResponse, BrowsePage # <--- NEW IMPORT
 from app.core.security import get_current_user, get_current_admin
+from app.core.inventory_import import detect_format, import_sweets
+from app.core.search import apply_text_search
+from app.core.suggest import suggest_index
+from app.core.catalog_snapshot import catalog_snapshot
+from app.core.reservations import reservation_ledger
+from app.core.cache import cache_sweets, catalog_cache, catalog_key, catalog_version, sweet_key, invalidate_catalog
+from app.core.compression import choose_encoding, compress
+from app.core.config import settings
+from app.core.inventory import OutOfStock, SweetNotFound, event_row, inventory_writer, record_events
+from app.core.pubsub import broadcaster
+from app.core.responses import FastJSONResponse, dumps, plain_rows
 router = APIRouter()
 
+# --- LIVE UPDATES (pushed to /api/events and the browse snapshot) ---
+def _publish_sweet(sweet):
+    broadcaster.publish("sweet", SweetResponse.model_validate(sweet).model_dump())
+    catalog_snapshot.upsert(sweet.id, sweet.name, sweet.category, sweet.price, sweet.quantity, sweet.is_veg)
+
+def _alert_low_stock(sweet_id: int, name: str, quantity: int, before: int):
+    # Only for the change that takes the sweet below the threshold, not every sale after it
+    if quantity < settings.LOW_STOCK_THRESHOLD <= before:
+        broadcaster.publish("low_stock", {"id": sweet_id, "name": name, "quantity": quantity, "threshold": settings.LOW_STOCK_THRESHOLD})
+
+def _publish_stock(sweet_id: int, name: str, quantity: int, before: int):
+    # Compact delta for clients patching their list
+    broadcaster.publish("stock", {"id": sweet_id, "quantity": quantity})
+    catalog_snapshot.set_quantity(sweet_id, quantity)
+    _alert_low_stock(sweet_id, name, quantity, before)
+
 @router.post("/", response_model=SweetResponse)
 async def create_sweet(
     sweet_in: SweetCreate,
-    db: AsyncSession = Depends(get_db),
+    db: AsyncSession = Depends(get_write_db),
     current_admin: User = Depends(get_current_admin)  # Protect: Admin Only
 ):
     new_sweet = Sweet(**sweet_in.model_dump())
     db.add(new_sweet)
     await db.commit()
     await db.refresh(new_sweet)
+    await invalidate_catalog(new_sweet.id)
+    suggest_index.add(new_sweet.id, new_sweet.name, new_sweet.category)
+    _publish_sweet(new_sweet)
     return new_sweet
 
+# --- BULK IMPORT (CSV / NDJSON) ---
+@router.post("/import", response_model=ImportReport)
+async def import_inventory(
+    file: UploadFile = File(...),
+    mode: str = Query("upsert", pattern="^(upsert|restock)$"),
+    format: Optional[str] = Query(None, pattern="^(csv|ndjson)$"),
+    db: AsyncSession = Depends(get_write_db),
+    admin: User = Depends(get_current_admin) # Only Admin can import
+):
+    # upsert: create-or-update sweets by name (columns as in SweetCreate)
+    # restock: add `amount` to the stock of the sweet called `name`
+    fmt = format or detect_format(file.filename, file.content_type)
+    await lock_for_write(db)
+    report = await import_sweets(db, file.file, fmt, mode, user_id=admin.id)
+    await db.commit()
+    await invalidate_catalog(everything=True)
+    inventory_writer.forget_all()
+    if report.created:
+        suggest_index.invalidate()
+    catalog_snapshot.invalidate()
+    if report.created or report.updated or report.restocked:
+        broadcaster.publish("resync", {})  # too many rows to push one by one
+    return report
+
+# --- CACHED READS ---
+def _etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    if not if_none_match:
+        return False
+    candidates = [tag.strip().removeprefix("W/") for tag in if_none_match.split(",")]
+    return "*" in candidates or etag in candidates
+
+def _not_modified_since(if_modified_since: Optional[str], last_modified: str) -> bool:
+    if not if_modified_since:
+        return False
+    try:
+        return parsedate_to_datetime(last_modified) <= parsedate_to_datetime(if_modified_since)
+    except (TypeError, ValueError):
+        return False
+
+def _catalog_cache_control() -> str:
+    max_age = settings.CATALOG_MAX_AGE_SECONDS
+    return f"public, max-age={max_age}" if max_age > 0 else "no-cache"
+
+async def _cached_json(request: Request, name: str, load) -> Response:
+    # Read-through cache of the serialized body. Entries are keyed by catalog
+    # version (bumped by every write below), so they never serve stale stock.
+    # The ETag is a hash of the body, so it's stable across workers.
+    # Last-Modified is when the body was read from the database: the data
+    # can't be newer than that, whichever worker wrote it, so a client only
+    # gets a 304 for a body it already has. (A per-process "last write"
+    # stamp can't promise that: another worker's writes never move it.)
+    # Compressed copies are kept next to the body, made the first time a
+    # client asks for that encoding, so a hot page is compressed once per
+    # catalog version rather than once per request.
+    key = await catalog_key(name)
+    # Recent writers read from the primary; don't hand them a page a lagging replica filled
+    entry = None if request.state.sticky_primary else await catalog_cache.get(key)
+    if entry is None:
+        built = time.time()
+        rows, headers = await load()
+        body = dumps(rows)
+        headers = {
+            **headers,
+            "ETag": f'"{hashlib.blake2b(body, digest_size=12).hexdigest()}"',
+            "Last-Modified": formatdate(built, usegmt=True),
+            "Cache-Control": _catalog_cache_control(),
+            "Vary": "Accept-Encoding",
+        }
+        entry = (body, headers, {})
+        await catalog_cache.set(key, entry)
+
+    body, headers, encoded = entry
+    # If-None-Match wins when both are sent: Last-Modified only has 1s resolution
+    if_none_match = request.headers.get("if-none-match")
+    if _etag_matches(if_none_match, headers["ETag"]) or (
+        if_none_match is None and _not_modified_since(request.headers.get("if-modified-since"), headers["Last-Modified"])
+    ):
+        return Response(status_code=304, headers=headers)
+
+    encoding = choose_encoding(request.headers.get("accept-encoding")) if settings.COMPRESSION_ENABLED else None
+    if encoding is None or len(body) < settings.COMPRESSION_MIN_BYTES:
+        return Response(body, media_type="application/json", headers=headers)
+    if encoding not in encoded:
+        encoded[encoding] = compress(body, encoding)
+        await catalog_cache.set(key, entry)  # for backends that store a copy
+    return Response(encoded[encoding], media_type="application/json", headers={**headers, "Content-Encoding": encoding})
+
+# --- LIST SWEETS ---
+SWEET_COLUMNS = Sweet.__table__.c
+
+def _columns(fields: Optional[str]):
+    # `fields=name,price` selects just those columns (id is always included)
+    if not fields:
+        return list(SWEET_COLUMNS)
+    names = ["id"] + [f.strip() for f in fields.split(",") if f.strip() and f.strip() != "id"]
+    unknown = [name for name in names if name not in SWEET_COLUMNS]
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Unknown fields: {unknown}")
+    return [SWEET_COLUMNS[name] for name in dict.fromkeys(names)]
+
+async def _stream_ndjson(query, sessionmaker):
+    # Own session: the request's session is closed before the body is streamed
+    async with sessionmaker() as db:
+        result = await db.stream(query.execution_options(yield_per=500))
+        keys = list(result.keys())
+        # One chunk per fetched batch rather than one per row
+        async for rows in result.partitions():
+            yield b"".join(dumps(dict(zip(keys, row))) + b"\n" for row in rows)
+
 @router.get("/", response_model=list[SweetResponse])
-async def list_sweets(db: AsyncSession = Depends(get_db)):
-    result = await db.execute(select(Sweet))
-    return result.scalars().all()
+async def list_sweets(
+    request: Request,
+    limit: Optional[int] = Query(None, ge=1, le=1000),
+    after: Optional[int] = None, # Keyset cursor: only sweets with id > after
+    fields: Optional[str] = None,
+    format: str = Query("json", pattern="^(json|ndjson)$"),
+    db: AsyncSession = Depends(get_read_db)
+):
+    # Plain column rows, no ORM objects or per-row model validation
+    query = select(*_columns(fields)).order_by(Sweet.id)
+    if after is not None:
+        query = query.where(Sweet.id > after)
+    if limit is not None:
+        query = query.limit(limit)
+
+    if format == "ndjson":
+        return StreamingResponse(_stream_ndjson(query, await read_sessionmaker(request)), media_type="application/x-ndjson")
+
+    async def load():
+        result = await db.execute(query)
+        rows = plain_rows(result)
+        headers = {}
+        if limit is not None and len(rows) == limit:
+            headers["X-Next-After"] = str(rows[-1]["id"])
+        return rows, headers
+
+    return await _cached_json(request, f"list:{limit}:{after}:{fields}", load)
 
 # --- SEARCH SWEETS ---
 @router.get("/search", response_model=List[SweetResponse])
 async def search_sweets(
+    request: Request,
     name: Optional[str] = None,
     category: Optional[str] = None,
     min_price: Optional[float] = None,
     max_price: Optional[float] = None,
-    db: AsyncSession = Depends(get_db)
+    db: AsyncSession = Depends(get_read_db)
 ):
-    query = select(Sweet)
+    # Word-prefix matching on name/category through the full-text index,
+    # best matches first (see app/core/search.py)
+    query = apply_text_search(select(*SWEET_COLUMNS), db.bind.dialect.name, name, category)
+
     filters = []
-    
-    if name:
-        filters.append(Sweet.name.ilike(f"%{name}%")) # Case-insensitive search
-    if category:
-        filters.append(Sweet.category.ilike(f"%{category}%"))
     if min_price is not None:
         filters.append(Sweet.price >= min_price)
     if max_price is not None:
@@ -51,79 +219,315 @@ async def search_sweets(
     
     if filters:
         query = query.where(and_(*filters))
-    
-    result = await db.execute(query)
+
+    async def load():
+        result = await db.execute(query)
+        return plain_rows(result), {}
+
+    return await _cached_json(request, f"search:{name}:{category}:{min_price}:{max_price}", load)
+
+# --- BROWSE (Filters, sorting and facet counts) ---
+async def _hydrate(request: Request, db: AsyncSession, ids: List[int]) -> list:
+    # Rows for one page of ids, in that order: single-sweet cache first, one query for the rest
+    cached = {}
+    version = await catalog_version()
+    if not request.state.sticky_primary:
+        for sweet_id in ids:
+            sweet = await catalog_cache.get(sweet_key(sweet_id))
+            if sweet is not None:
+                cached[sweet_id] = sweet
+    missing = [sweet_id for sweet_id in ids if sweet_id not in cached]
+    if missing:
+        result = await db.execute(select(*SWEET_COLUMNS).where(Sweet.id.in_(missing)))
+        rows = plain_rows(result)
+        cached.update((sweet["id"], sweet) for sweet in rows)
+        await cache_sweets(rows, version)
+    return [cached[sweet_id] for sweet_id in ids if sweet_id in cached]  # deleted meanwhile: dropped
+
+@router.get("/browse", response_model=BrowsePage)
+async def browse_sweets(
+    request: Request,
+    category: Optional[List[str]] = Query(None), # repeat for several: ?category=Cake&category=Candy
+    is_veg: Optional[bool] = None,
+    min_price: Optional[float] = None,
+    max_price: Optional[float] = None,
+    in_stock: Optional[bool] = None,
+    sort: str = Query("id", pattern="^-?(id|price|name|quantity)$"), # "-price" for descending
+    offset: int = Query(0, ge=0),
+    limit: int = Query(50, ge=1, le=200),
+    db: AsyncSession = Depends(get_read_db)
+):
+    # Filtering, sorting and counting run over the in-memory column snapshot
+    # (app/core/catalog_snapshot.py); only the page's rows come from the cache/DB
+    await catalog_snapshot.ensure_fresh()
+    page = catalog_snapshot.query(
+        categories=category, is_veg=is_veg, min_price=min_price, max_price=max_price, in_stock=in_stock,
+        sort=sort, offset=offset, limit=limit, price_bands=tuple(settings.CATALOG_PRICE_BANDS),
+    )
+    items = await _hydrate(request, db, page["ids"])
+    return FastJSONResponse({"total": page["total"], "items": items, "facets": page["facets"]})
+
+# --- SUGGEST (Typeahead) ---
+@router.get("/suggest", response_model=List[SweetSuggestion])
+async def suggest_sweets(
+    q: str = Query(..., min_length=1),
+    limit: int = Query(10, ge=1, le=50)
+):
+    # Answered from the in-memory prefix index; no DB round trip after the first load
+    await suggest_index.ensure_fresh()
+    return suggest_index.lookup(q, limit)
+
+# --- CACHE STATS ---
+@router.get("/cache/stats")
+async def cache_stats(admin: User = Depends(get_current_admin)):
+    return catalog_cache.stats()
+
+# --- GET ONE SWEET ---
+@router.get("/{sweet_id}", response_model=SweetResponse)
+async def get_sweet(request: Request, sweet_id: int, db: AsyncSession = Depends(get_read_db)):
+    version = await catalog_version()
+    sweet = None if request.state.sticky_primary else await catalog_cache.get(sweet_key(sweet_id))
+    if sweet is None:
+        result = await db.execute(select(*SWEET_COLUMNS).where(Sweet.id == sweet_id))
+        rows = plain_rows(result)
+        if not rows:
+            raise HTTPException(status_code=404, detail="Sweet not found")
+        sweet = rows[0]
+        await cache_sweets(rows, version)
+    # Built from the table's own columns: no need for response_model to revalidate it
+    return FastJSONResponse(sweet)
+
+# --- INVENTORY EVENTS (Audit trail) ---
+@router.get("/{sweet_id}/events", response_model=List[InventoryEventResponse])
+async def sweet_events(
+    sweet_id: int,
+    limit: int = Query(100, ge=1, le=1000),
+    db: AsyncSession = Depends(get_read_db),
+    admin: User = Depends(get_current_admin)
+):
+    # Newest first; kept even after the sweet is deleted
+    result = await db.execute(
+        select(InventoryEvent).where(InventoryEvent.sweet_id == sweet_id).order_by(InventoryEvent.id.desc()).limit(limit)
+    )
     return result.scalars().all()
 
+async def _write_behind(db: AsyncSession, deltas: dict, kind: str, user_id: Optional[int], reserved: Optional[dict] = None) -> list:
+    # INVENTORY_WRITE_BEHIND: the stock check runs against the writer's counter
+    # and the sale commits with its batch (see app/core/inventory.py). The rest
+    # of the row is read back here, without the write lock.
+    try:
+        quantities = await inventory_writer.apply(deltas, kind, user_id, reserved)
+    except SweetNotFound as exc:
+        raise HTTPException(status_code=404, detail="Sweet not found" if len(deltas) == 1 else f"Sweet not found: {exc.sweet_ids}")
+    except OutOfStock as exc:
+        raise HTTPException(status_code=400, detail="Not enough stock available" if len(deltas) == 1 else f"Not enough stock available: {exc.sweet_ids}")
+    await invalidate_catalog(*deltas)
+
+    result = await db.execute(select(*SWEET_COLUMNS).where(Sweet.id.in_(quantities)))
+    rows = {row["id"]: {**row, "quantity": quantities[row["id"]]} for row in result.mappings()}
+    sweets = [rows[sweet_id] for sweet_id in quantities if sweet_id in rows]
+    for sweet in sweets:
+        _publish_stock(sweet["id"], sweet["name"], sweet["quantity"], sweet["quantity"] - deltas[sweet["id"]])
+    return sweets
+
 # --- PURCHASE SWEET (Decrease Stock) ---
+# Sales leave other carts' reserved units alone (app/core/reservations.py):
+# the guard is quantity - held >= amount, with `held` read from the ledger
+# right before the UPDATE.
+@contextmanager
+def _claimed(wanted: dict):
+    # Counts the sale's units in the ledger while it runs, so a new cart hold
+    # can't be promised them
+    claims = reservation_ledger.claim(wanted)
+    try:
+        yield
+    finally:
+        reservation_ledger.release(*claims)
+
+async def _decrement_stock(db: AsyncSession, sweet_id: int, amount: int, reserved: int = 0) -> Optional[Sweet]:
+    # Stock check and decrement happen in ONE conditional UPDATE, so two tills
+    # buying the same sweet at once can never oversell (no lost update).
+    # Callers take the write lock (lock_for_write) first.
+    stmt = (
+        update(Sweet)
+        .where(Sweet.id == sweet_id, Sweet.quantity >= amount + reserved)
+        .values(quantity=Sweet.quantity - amount)
+    )
+    if db.bind.dialect.update_returning:
+        result = await db.execute(stmt.returning(Sweet))
+        return result.scalars().first()
+
+    # Fallback for SQLite builds without RETURNING (< 3.35): same guarded UPDATE,
+    # then read the row back inside the same transaction.
+    result = await db.execute(stmt, execution_options={"synchronize_session": False})
+    if result.rowcount == 0:
+        return None
+    return await db.get(Sweet, sweet_id, populate_existing=True)
+
+async def _increment_stock(db: AsyncSession, sweet_id: int, amount: int) -> Optional[Sweet]:
+    # Restock counterpart of _decrement_stock; None if the sweet doesn't exist.
+    # Callers take the write lock first.
+    stmt = update(Sweet).where(Sweet.id == sweet_id).values(quantity=Sweet.quantity + amount)
+    if db.bind.dialect.update_returning:
+        result = await db.execute(stmt.returning(Sweet))
+        return result.scalars().first()
+
+    result = await db.execute(stmt, execution_options={"synchronize_session": False})
+    if result.rowcount == 0:
+        return None
+    return await db.get(Sweet, sweet_id, populate_existing=True)
+
 @router.post("/{sweet_id}/purchase", response_model=SweetResponse)
 async def purchase_sweet(
     sweet_id: int,
     operation: SweetInventoryOp,
-    db: AsyncSession = Depends(get_db),
+    db: AsyncSession = Depends(get_write_db),
     user: User = Depends(get_current_user) # Any logged-in user can buy
 ):
-    result = await db.execute(select(Sweet).where(Sweet.id == sweet_id))
-    sweet = result.scalars().first()
+    with _claimed({sweet_id: operation.amount}):
+        if settings.INVENTORY_WRITE_BEHIND:
+            reserved = {sweet_id: reservation_ledger.held(sweet_id)}
+            return (await _write_behind(db, {sweet_id: -operation.amount}, "purchase", user.id, reserved))[0]
 
-    if not sweet:
-        raise HTTPException(status_code=404, detail="Sweet not found")
-    
-    if sweet.quantity < operation.amount:
-        raise HTTPException(status_code=400, detail="Not enough stock available")
+        await lock_for_write(db)
+        sweet = await _decrement_stock(db, sweet_id, operation.amount, reservation_ledger.held(sweet_id))
+
+        if not sweet:
+            # Nothing was updated: find out whether the sweet is missing or just sold out
+            exists = await db.scalar(select(Sweet.id).where(Sweet.id == sweet_id))
+            await db.rollback()
+            if exists is None:
+                raise HTTPException(status_code=404, detail="Sweet not found")
+            raise HTTPException(status_code=400, detail="Not enough stock available")
 
-    sweet.quantity -= operation.amount
+        await record_events(db, [event_row(sweet_id, "purchase", -operation.amount, user.id)])
+        await db.commit()
+        await invalidate_catalog(sweet_id)
+        _publish_stock(sweet.id, sweet.name, sweet.quantity, sweet.quantity + operation.amount)
+        return sweet
+
+# --- CHECKOUT (Purchase a whole basket in one transaction) ---
+async def sell_basket(db: AsyncSession, wanted: dict, user_id: int) -> list:
+    # {sweet_id: amount} sold all-or-nothing. Shared with confirming a cart's
+    # reservations (app/api/v1/reservations.py); callers claim the units first.
+    if settings.INVENTORY_WRITE_BEHIND:
+        reserved = {sweet_id: reservation_ledger.held(sweet_id) for sweet_id in wanted}
+        return await _write_behind(db, {sweet_id: -amount for sweet_id, amount in wanted.items()}, "purchase", user_id, reserved)
+
+    await lock_for_write(db)
+
+    # Validate every line with ONE batched select before writing anything
+    result = await db.execute(select(Sweet.id, Sweet.quantity).where(Sweet.id.in_(wanted)))
+    stock = dict(result.all())
+
+    missing = [sweet_id for sweet_id in wanted if sweet_id not in stock]
+    if missing:
+        await db.rollback()
+        raise HTTPException(status_code=404, detail=f"Sweet not found: {missing}")
+
+    short = [sweet_id for sweet_id, amount in wanted.items() if stock[sweet_id] - reservation_ledger.held(sweet_id) < amount]
+    if short:
+        await db.rollback()
+        raise HTTPException(status_code=400, detail=f"Not enough stock available: {short}")
+
+    # All-or-nothing: the decrements stay guarded, so a concurrent sale between
+    # the select and here rolls the whole basket back instead of overselling
+    sweets = []
+    for sweet_id, amount in wanted.items():
+        sweet = await _decrement_stock(db, sweet_id, amount, reservation_ledger.held(sweet_id))
+        if not sweet:
+            await db.rollback()
+            raise HTTPException(status_code=400, detail=f"Not enough stock available: {[sweet_id]}")
+        sweets.append(sweet)
+
+    await record_events(db, [event_row(sweet_id, "purchase", -amount, user_id) for sweet_id, amount in wanted.items()])
     await db.commit()
-    await db.refresh(sweet)
-    return sweet
+    await invalidate_catalog(*wanted)
+    for sweet in sweets:
+        _publish_stock(sweet.id, sweet.name, sweet.quantity, sweet.quantity + wanted[sweet.id])
+    return sweets
+
+@router.post("/checkout", response_model=List[SweetResponse])
+async def checkout(
+    basket: SweetCheckout,
+    db: AsyncSession = Depends(get_write_db),
+    user: User = Depends(get_current_user) # Any logged-in user can buy
+):
+    # Merge repeated lines for the same sweet (dicts keep basket order)
+    wanted: dict[int, int] = {}
+    for line in basket.items:
+        wanted[line.sweet_id] = wanted.get(line.sweet_id, 0) + line.amount
+
+    with _claimed(wanted):
+        return await sell_basket(db, wanted, user.id)
 
 # --- RESTOCK SWEET (Increase Stock) ---
 @router.post("/{sweet_id}/restock", response_model=SweetResponse)
 async def restock_sweet(
     sweet_id: int,
     operation: SweetInventoryOp,
-    db: AsyncSession = Depends(get_db),
+    db: AsyncSession = Depends(get_write_db),
     admin: User = Depends(get_current_admin) # Only Admin can restock
 ):
-    result = await db.execute(select(Sweet).where(Sweet.id == sweet_id))
-    sweet = result.scalars().first()
+    if settings.INVENTORY_WRITE_BEHIND:
+        return (await _write_behind(db, {sweet_id: operation.amount}, "restock", admin.id))[0]
+
+    # Same shape as a sale: one atomic UPDATE under the write lock, so a
+    # restock racing purchases can't overwrite them
+    await lock_for_write(db)
+    sweet = await _increment_stock(db, sweet_id, operation.amount)
 
     if not sweet:
+        await db.rollback()
         raise HTTPException(status_code=404, detail="Sweet not found")
 
-    sweet.quantity += operation.amount
+    await record_events(db, [event_row(sweet_id, "restock", operation.amount, admin.id)])
     await db.commit()
-    await db.refresh(sweet)
+    await invalidate_catalog(sweet_id)
+    _publish_stock(sweet.id, sweet.name, sweet.quantity, sweet.quantity - operation.amount)
     return sweet
 
 @router.put("/{sweet_id}", response_model=SweetResponse)
 async def update_sweet(
     sweet_id: int,
     sweet_update: SweetUpdate,
-    db: AsyncSession = Depends(get_db),
+    db: AsyncSession = Depends(get_write_db),
     admin: User = Depends(get_current_admin) # Secure: Only Admin
 ):
+    # Lock before reading, so the "adjust" event is the difference from the
+    # quantity actually being replaced (no sale can land in between)
+    await lock_for_write(db)
     query = select(Sweet).where(Sweet.id == sweet_id)
     result = await db.execute(query)
     sweet = result.scalars().first()
 
     if not sweet:
+        await db.rollback()
         raise HTTPException(status_code=404, detail="Sweet not found")
 
     # Update only the fields provided
     update_data = sweet_update.dict(exclude_unset=True)
+    before = sweet.quantity
+    if update_data.get("quantity") is not None and update_data["quantity"] != sweet.quantity:
+        # Stock set by hand: log the difference so the event log still adds up
+        await record_events(db, [event_row(sweet_id, "adjust", update_data["quantity"] - sweet.quantity, admin.id)])
     for key, value in update_data.items():
         setattr(sweet, key, value)
 
     await db.commit()
     await db.refresh(sweet)
+    await invalidate_catalog(sweet_id)
+    inventory_writer.forget(sweet_id)
+    suggest_index.add(sweet.id, sweet.name, sweet.category)
+    _publish_sweet(sweet)
+    _alert_low_stock(sweet.id, sweet.name, sweet.quantity, before)
     return sweet
 
 # --- DELETE SWEET ---
 @router.delete("/{sweet_id}", status_code=status.HTTP_200_OK)
 async def delete_sweet(
     sweet_id: int,
-    db: AsyncSession = Depends(get_db),
+    db: AsyncSession = Depends(get_write_db),
     admin: User = Depends(get_current_admin) # Secure: Only Admin
 ):
     query = select(Sweet).where(Sweet.id == sweet_id)
@@ -135,5 +539,11 @@ async def delete_sweet(
 
     await db.delete(sweet)
     await db.commit()
+    await invalidate_catalog(sweet_id)
+    inventory_writer.forget(sweet_id)
+    suggest_index.remove(sweet_id)
+    catalog_snapshot.remove(sweet_id)
+    reservation_ledger.forget_sweet(sweet_id)
+    broadcaster.publish("delete", {"id": sweet_id})
     
     return {"message": "Sweet deleted successfully"}
\ No newline at end of file
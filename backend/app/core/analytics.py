@@ -0,0 +1,247 @@
+import asyncio
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+from sqlalchemy import delete, func, select, text, update
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.config import settings
+from app.core.database import SessionLocal, lock_for_write
+from app.models.inventory_event import InventoryEvent
+from app.models.sales_rollup import SalesByHour, SalesByMinute
+from app.models.sweet import Sweet
+
+ROLLUP_COLUMNS = ("units_sold", "revenue", "units_restocked")
+
+# Windows up to this many hours are answered from the per-minute table, so
+# "last hour" means the last 60 minutes rather than two partial hour buckets
+MINUTE_WINDOW_HOURS = 6
+
+def _minute(ts: datetime) -> datetime:
+    return ts.replace(second=0, microsecond=0)
+
+def _hour(ts: datetime) -> datetime:
+    return ts.replace(minute=0, second=0, microsecond=0)
+
+# --- ROLLUP MAINTENANCE ---
+# Sales only append inventory events. A background job folds new events into
+# the rollup tables afterwards, a batch per transaction, so a purchase holds
+# the write lock for its own statements and not for the rollup upserts.
+# Events are flagged rolled_up in the same transaction as the upserts, under
+# a lock every worker takes, so each is counted once: a per-event flag rather
+# than an id watermark, since ids can commit out of order (Postgres sequences).
+ROLLUP_BATCH_EVENTS = 5000
+MARK_CHUNK = 500  # ids per UPDATE ... IN (...), under SQLite's variable limit
+
+_pruned_hour: Optional[datetime] = None
+
+async def _upsert(db: AsyncSession, table, rows: List[dict]):
+    # Add to the bucket if it exists: ON CONFLICT DO UPDATE SET x = x + excluded.x
+    insert = sqlite_insert if db.bind.dialect.name == "sqlite" else pg_insert
+    stmt = insert(table)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[table.c.bucket, table.c.sweet_id],
+        set_={col: table.c[col] + stmt.excluded[col] for col in ROLLUP_COLUMNS},
+    )
+    await db.execute(stmt, rows)
+
+async def _lock_rollups(db: AsyncSession):
+    # Held until commit, so one worker at a time reads, aggregates and flags
+    # a batch (BEGIN IMMEDIATE alone means nothing to Postgres)
+    if db.bind.dialect.name == "sqlite":
+        await lock_for_write(db)
+    elif db.bind.dialect.name == "postgresql":
+        await db.execute(text("SELECT pg_advisory_xact_lock(7216151)"))  # any constant shared by all workers
+
+async def roll_up(db: AsyncSession, limit: int = ROLLUP_BATCH_EVENTS) -> int:
+    # Folds up to `limit` events not yet rolled up into the rollups, in its
+    # own transaction. Returns how many events it consumed.
+    global _pruned_hour
+    pending = (await db.execute(select(InventoryEvent.id).where(InventoryEvent.rolled_up.is_(None)).limit(1))).first()
+    await db.commit()  # the lock below has to open its own transaction
+    if pending is None:
+        return 0  # nothing new: no lock taken
+
+    await _lock_rollups(db)
+    # Read after the lock: another worker may have just flagged these. An
+    # event committed later (even with a lower id) waits for the next round.
+    # Price and category as of the roll-up, at most ANALYTICS_ROLLUP_SECONDS after the sale
+    events = (await db.execute(
+        select(InventoryEvent.id, InventoryEvent.sweet_id, InventoryEvent.kind, InventoryEvent.delta,
+               InventoryEvent.created_at, Sweet.id.label("known"), Sweet.category, Sweet.price)
+        .outerjoin(Sweet, Sweet.id == InventoryEvent.sweet_id)
+        .where(InventoryEvent.rolled_up.is_(None))
+        .order_by(InventoryEvent.id)
+        .limit(limit)
+    )).all()
+    if not events:
+        await db.rollback()
+        return 0
+
+    # Summed per bucket first: one upsert per (bucket, sweet) per table however many sales the batch holds
+    for model, truncate in ((SalesByMinute, _minute), (SalesByHour, _hour)):
+        buckets: Dict[Tuple[datetime, int], dict] = {}
+        for event in events:
+            if event.kind not in ("purchase", "restock") or event.known is None:
+                continue  # adjustments, and sweets deleted meanwhile (the event log still has them)
+            key = (truncate(event.created_at), event.sweet_id)
+            row = buckets.setdefault(key, {"bucket": key[0], "sweet_id": key[1], "category": event.category, **dict.fromkeys(ROLLUP_COLUMNS, 0)})
+            if event.kind == "purchase":
+                row["units_sold"] -= event.delta
+                row["revenue"] -= event.delta * (event.price or 0)
+            else:
+                row["units_restocked"] += event.delta
+        if buckets:
+            await _upsert(db, model.__table__, list(buckets.values()))
+
+    ids = [event.id for event in events]
+    for start in range(0, len(ids), MARK_CHUNK):
+        await db.execute(
+            update(InventoryEvent).where(InventoryEvent.id.in_(ids[start:start + MARK_CHUNK])).values(rolled_up=True)
+        )
+
+    # Once an hour (per worker), drop minute buckets past retention
+    hour = _hour(datetime.utcnow())
+    if _pruned_hour != hour:
+        cutoff = hour - timedelta(hours=settings.ANALYTICS_MINUTE_RETENTION_HOURS)
+        await db.execute(delete(SalesByMinute).where(SalesByMinute.bucket < cutoff))
+        _pruned_hour = hour
+    await db.commit()
+    return len(events)
+
+class RollupUpdater:
+    # Runs the roll-up every ANALYTICS_ROLLUP_SECONDS. Each worker runs one;
+    # they take turns on the lock, so whichever gets there first takes the
+    # batch and the others find it already flagged.
+
+    def __init__(self):
+        self._task: Optional[asyncio.Task] = None
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    def start(self):
+        if not self.running:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        # Folds in whatever is left before returning
+        if self.running:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+        self._task = None
+        await self.catch_up()
+
+    async def catch_up(self) -> int:
+        # Every event logged so far. The analytics endpoints call this first,
+        # so their answers include sales up to the request.
+        total = 0
+        async with SessionLocal() as db:
+            while True:
+                done = await roll_up(db)
+                total += done
+                if done < ROLLUP_BATCH_EVENTS:
+                    return total
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(settings.ANALYTICS_ROLLUP_SECONDS)
+            try:
+                await self.catch_up()
+            except Exception:
+                pass  # e.g. lock timeout; the events stay in the log for the next round
+
+rollup_updater = RollupUpdater()
+
+# --- QUERIES ---
+def rollup_for_window(hours: int):
+    now = datetime.utcnow()
+    if hours <= MINUTE_WINDOW_HOURS:
+        return SalesByMinute, _minute(now - timedelta(hours=hours))
+    return SalesByHour, _hour(now - timedelta(hours=hours))
+
+async def top_sellers(db: AsyncSession, hours: int, limit: int, category: Optional[str] = None) -> List[dict]:
+    model, since = rollup_for_window(hours)
+    units = func.sum(model.units_sold).label("units_sold")
+    query = (
+        select(model.sweet_id, Sweet.name, units, func.sum(model.revenue).label("revenue"))
+        .outerjoin(Sweet, Sweet.id == model.sweet_id)
+        .where(model.bucket >= since)
+        .group_by(model.sweet_id, Sweet.name)
+        .having(units > 0)
+        .order_by(units.desc(), model.sweet_id)
+        .limit(limit)
+    )
+    if category is not None:
+        query = query.where(model.category == category)
+    result = await db.execute(query)
+    return [dict(row) for row in result.mappings()]
+
+async def revenue_by_category(db: AsyncSession, hours: int) -> List[dict]:
+    model, since = rollup_for_window(hours)
+    revenue = func.sum(model.revenue).label("revenue")
+    result = await db.execute(
+        select(model.category, func.sum(model.units_sold).label("units_sold"), revenue)
+        .where(model.bucket >= since)
+        .group_by(model.category)
+        .order_by(revenue.desc())
+    )
+    return [dict(row) for row in result.mappings()]
+
+async def stock_forecast(
+    db: AsyncSession, hours: int, half_life_hours: float, limit: int, category: Optional[str] = None
+) -> List[dict]:
+    # Sales rate per sweet from the hourly rollups: an exponentially weighted
+    # mean of units per hour over the window, recent hours counting more. The
+    # current hour only counts for the fraction of it that has elapsed.
+    now = datetime.utcnow()
+    current = _hour(now)
+    since = current - timedelta(hours=hours - 1)
+    query = (
+        select(SalesByHour.sweet_id, SalesByHour.bucket, SalesByHour.units_sold)
+        .where(SalesByHour.bucket >= since, SalesByHour.units_sold > 0)
+    )
+    if category is not None:
+        query = query.where(SalesByHour.category == category)
+    rows = (await db.execute(query)).all()
+    if not rows:
+        return []
+
+    # sweets x hours matrix of units sold, column 0 = current hour
+    sweet_ids, row_index = np.unique(np.array([r.sweet_id for r in rows]), return_inverse=True)
+    ages = np.array([int((current - r.bucket).total_seconds() // 3600) for r in rows])
+    sold = np.zeros((len(sweet_ids), hours))
+    np.add.at(sold, (row_index, ages), np.array([r.units_sold for r in rows], dtype=float))
+
+    coverage = np.ones(hours)
+    coverage[0] = max((now - current).total_seconds() / 3600, 1 / 60)
+    weights = 0.5 ** (np.arange(hours) / half_life_hours)
+    rate = sold @ weights / (coverage @ weights)  # units per hour
+
+    result = await db.execute(select(Sweet.id, Sweet.name, Sweet.quantity).where(Sweet.id.in_(sweet_ids.tolist())))
+    stock = {sweet_id: (name, quantity) for sweet_id, name, quantity in result.all()}
+    quantity = np.array([stock.get(int(s), (None, 0))[1] or 0 for s in sweet_ids], dtype=float)
+    hours_left = quantity / rate
+
+    forecasts = []
+    deleted = np.array([int(s) not in stock for s in sweet_ids])
+    for i in np.argsort(np.where(deleted, np.inf, hours_left), kind="stable")[:limit]:
+        if deleted[i]:
+            break
+        sweet_id = int(sweet_ids[i])
+        forecasts.append({
+            "sweet_id": sweet_id,
+            "name": stock[sweet_id][0],
+            "quantity": int(quantity[i]),
+            "units_per_hour": round(float(rate[i]), 3),
+            "hours_to_stockout": round(float(hours_left[i]), 2),
+            "stockout_at": now + timedelta(hours=float(hours_left[i])),
+        })
+    return forecasts
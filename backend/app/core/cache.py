@@ -0,0 +1,142 @@
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from typing import Any, Hashable, Optional
+
+from app.core.config import settings
+
+class LRUCache:
+    # Bounded dict with per-entry TTL and least-recently-used eviction.
+    # Not thread-safe; meant for use from the event loop.
+
+    def __init__(self, max_entries: int, ttl: float):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._data: OrderedDict = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        item = self._data.get(key)
+        if item is None:
+            self.misses += 1
+            return default
+        expires_at, value = item
+        if expires_at < time.monotonic():
+            del self._data[key]
+            self.misses += 1
+            return default
+        self._data.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def set(self, key: Hashable, value: Any, ttl: Optional[float] = None):
+        self._data[key] = (time.monotonic() + (self.ttl if ttl is None else ttl), value)
+        self._data.move_to_end(key)
+        while len(self._data) > self.max_entries:
+            self._data.popitem(last=False)
+            self.evictions += 1
+
+    def delete(self, key: Hashable):
+        self._data.pop(key, None)
+
+    def clear(self):
+        self._data.clear()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def stats(self) -> dict:
+        return {"entries": len(self._data), "hits": self.hits, "misses": self.misses, "evictions": self.evictions}
+
+class CacheBackend(ABC):
+    # What the catalog cache needs from a store. Async so a networked store
+    # (e.g. a local Redis-compatible server shared by all workers) can
+    # implement it: get/set -> GET/SET EX, delete -> DEL, incr -> INCR,
+    # clear -> FLUSHDB on a dedicated database.
+
+    @abstractmethod
+    async def get(self, key: str) -> Any: ...
+
+    @abstractmethod
+    async def set(self, key: str, value: Any, ttl: Optional[float] = None): ...
+
+    @abstractmethod
+    async def delete(self, *keys: str): ...
+
+    @abstractmethod
+    async def incr(self, key: str) -> int: ...
+
+    @abstractmethod
+    async def counter(self, key: str) -> int: ...
+
+    @abstractmethod
+    async def clear(self): ...
+
+    @abstractmethod
+    def stats(self) -> dict: ...
+
+class MemoryCache(CacheBackend):
+    # Default backend: per-process LRU with TTL. Counters live outside the LRU
+    # so they are never evicted.
+
+    def __init__(self, max_entries: int, ttl: float):
+        self._lru = LRUCache(max_entries, ttl)
+        self._counters: dict = {}
+
+    async def get(self, key: str) -> Any:
+        return self._lru.get(key)
+
+    async def set(self, key: str, value: Any, ttl: Optional[float] = None):
+        self._lru.set(key, value, ttl)
+
+    async def delete(self, *keys: str):
+        for key in keys:
+            self._lru.delete(key)
+
+    async def incr(self, key: str) -> int:
+        self._counters[key] = self._counters.get(key, 0) + 1
+        return self._counters[key]
+
+    async def counter(self, key: str) -> int:
+        return self._counters.get(key, 0)
+
+    async def clear(self):
+        self._lru.clear()
+
+    def stats(self) -> dict:
+        return self._lru.stats()
+
+# --- CATALOG CACHE ---
+# List/search results are keyed under the current catalog version, so one INCR
+# on write retires all of them at once; single sweets are deleted by id.
+CATALOG_VERSION_KEY = "catalog:version"
+
+catalog_cache: CacheBackend = MemoryCache(settings.CACHE_MAX_ENTRIES, settings.CACHE_TTL_SECONDS)
+
+async def catalog_version() -> int:
+    return await catalog_cache.counter(CATALOG_VERSION_KEY)
+
+async def catalog_key(name: str) -> str:
+    return f"{name}@{await catalog_version()}"
+
+def sweet_key(sweet_id: int) -> str:
+    return f"sweet:{sweet_id}"
+
+async def cache_sweets(sweets: list, version: int):
+    # `version`: catalog_version() from before the rows were read. If it has
+    # moved on, a write committed meanwhile and its delete may already have
+    # run, so the rows could be stale and are not cached.
+    if await catalog_version() == version:
+        for sweet in sweets:
+            await catalog_cache.set(sweet_key(sweet["id"]), sweet)
+
+async def invalidate_catalog(*sweet_ids: int, everything: bool = False):
+    # Call after committing any write to the sweets table. `everything` is for
+    # bulk writes that don't track which rows they touched.
+    await catalog_cache.incr(CATALOG_VERSION_KEY)
+    if everything:
+        await catalog_cache.clear()
+    else:
+        await catalog_cache.delete(*(sweet_key(sweet_id) for sweet_id in sweet_ids))
@@ -0,0 +1,237 @@
+import asyncio
+import time
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+from sqlalchemy import select
+
+from app.core.config import settings
+from app.core.database import SessionLocal
+from app.models.sweet import Sweet
+
+SORT_KEYS = ("id", "price", "name", "quantity")
+
+class CatalogSnapshot:
+    # Column arrays of the sweets table, sorted by id: one numpy array per
+    # filterable column plus category codes. A browse query is a few boolean
+    # masks, facet counts are bincounts over them, and only the requested
+    # page of ids leaves here; the caller loads those rows.
+    #
+    # Like the typeahead index it lives in one worker: local writes patch it
+    # (set_quantity for sales, upsert/remove for edits), other workers'
+    # writes show up after CATALOG_SNAPSHOT_REFRESH_SECONDS.
+
+    def __init__(self):
+        self._ids = np.empty(0, dtype=np.int64)
+        self._prices = np.empty(0, dtype=np.float64)  # NaN when unset
+        self._quantities = np.empty(0, dtype=np.int64)
+        self._category_codes = np.empty(0, dtype=np.int32)
+        self._veg = np.empty(0, dtype=bool)
+        self._names = np.empty(0, dtype=object)
+        self._categories: List[Optional[str]] = []
+        self._codes: Dict[Optional[str], int] = {}
+        self._name_rank: Optional[np.ndarray] = None  # position in name order; rebuilt lazily
+        self._loaded_at: Optional[float] = None
+        self._refreshing: Optional[asyncio.Task] = None
+        self._generation = 0  # bumped by every local change; see load()
+
+    @property
+    def ready(self) -> bool:
+        return self._loaded_at is not None
+
+    def __len__(self) -> int:
+        return len(self._ids)
+
+    def _code(self, category: Optional[str]) -> int:
+        code = self._codes.get(category)
+        if code is None:
+            code = self._codes[category] = len(self._categories)
+            self._categories.append(category)
+        return code
+
+    def rebuild(self, rows):
+        # rows: (id, name, category, price, quantity, is_veg), any order
+        rows = sorted(rows, key=lambda row: row[0])
+        self._categories, self._codes = [], {}
+        self._ids = np.array([row[0] for row in rows], dtype=np.int64)
+        self._names = np.array([row[1] or "" for row in rows], dtype=object)
+        self._category_codes = np.array([self._code(row[2]) for row in rows], dtype=np.int32)
+        self._prices = np.array([np.nan if row[3] is None else row[3] for row in rows], dtype=np.float64)
+        self._quantities = np.array([row[4] or 0 for row in rows], dtype=np.int64)
+        self._veg = np.array([row[5] is not False for row in rows], dtype=bool)  # NULL counts as veg, like the column default
+        self._name_rank = None
+        self._loaded_at = time.monotonic()
+
+    async def load(self):
+        # As in PrefixIndex.load: rows read before a local change landed are
+        # dropped, and only a first load reads again
+        while True:
+            generation = self._generation
+            async with SessionLocal() as db:
+                result = await db.execute(select(Sweet.id, Sweet.name, Sweet.category, Sweet.price, Sweet.quantity, Sweet.is_veg))
+                rows = result.all()
+            if generation == self._generation:
+                self.rebuild(rows)
+                return
+            if self.ready:
+                return
+
+    def invalidate(self):
+        # Bulk changes: reload on next use
+        self._generation += 1
+        self._loaded_at = None
+
+    async def ensure_fresh(self):
+        if not self.ready:
+            await self.load()
+        elif time.monotonic() - self._loaded_at > settings.CATALOG_SNAPSHOT_REFRESH_SECONDS and not self._refreshing:
+            self._refreshing = asyncio.create_task(self.load())
+            self._refreshing.add_done_callback(lambda _: setattr(self, "_refreshing", None))
+
+    # --- INCREMENTAL UPDATES ---
+    def _position(self, sweet_id: int) -> Tuple[int, bool]:
+        i = int(np.searchsorted(self._ids, sweet_id))
+        return i, i < len(self._ids) and self._ids[i] == sweet_id
+
+    def quantity(self, sweet_id: int) -> Optional[int]:
+        # None if the sweet isn't in the snapshot (yet)
+        i, found = self._position(sweet_id)
+        return int(self._quantities[i]) if found else None
+
+    def set_quantity(self, sweet_id: int, quantity: int):
+        self._generation += 1
+        i, found = self._position(sweet_id)
+        if found:
+            self._quantities[i] = quantity
+
+    def upsert(self, sweet_id: int, name: str, category: Optional[str], price: Optional[float], quantity: int, is_veg: Optional[bool]):
+        self._generation += 1
+        if not self.ready:
+            return  # picked up by the first load (which starts over if it is already reading)
+        i, found = self._position(sweet_id)
+        values = (
+            (self._ids, "_ids", sweet_id),
+            (self._names, "_names", name or ""),
+            (self._category_codes, "_category_codes", self._code(category)),
+            (self._prices, "_prices", np.nan if price is None else price),
+            (self._quantities, "_quantities", quantity or 0),
+            (self._veg, "_veg", is_veg is not False),
+        )
+        for array, attr, value in values:
+            if found:
+                array[i] = value
+            else:
+                # New ids are normally the largest, so this is close to an append
+                setattr(self, attr, np.insert(array, i, value))
+        self._name_rank = None
+
+    def remove(self, sweet_id: int):
+        self._generation += 1
+        i, found = self._position(sweet_id)
+        if not found:
+            return
+        for attr in ("_ids", "_names", "_category_codes", "_prices", "_quantities", "_veg"):
+            setattr(self, attr, np.delete(getattr(self, attr), i))
+        self._name_rank = None
+
+    # --- QUERIES ---
+    def _names_in_order(self) -> np.ndarray:
+        if self._name_rank is None:
+            order = np.argsort(np.char.lower(self._names.astype(str)), kind="stable")
+            self._name_rank = np.empty(len(order), dtype=np.int64)
+            self._name_rank[order] = np.arange(len(order))
+        return self._name_rank
+
+    def _sort_key(self, sort: str) -> np.ndarray:
+        column = sort.lstrip("-")
+        if column == "price":
+            key = self._prices
+        elif column == "name":
+            key = self._names_in_order().astype(np.float64)
+        elif column == "quantity":
+            key = self._quantities.astype(np.float64)
+        else:
+            key = self._ids.astype(np.float64)
+        if sort.startswith("-"):
+            key = -key
+        return np.where(np.isnan(key), np.inf, key)  # unpriced sweets last either way
+
+    def _page(self, matches: np.ndarray, sort: str, offset: int, limit: int) -> np.ndarray:
+        key = self._sort_key(sort)[matches]
+        wanted = offset + limit
+        if wanted < len(matches):
+            # Only the first `wanted` need ordering: keep everything up to
+            # the wanted-th smallest key (ties included), then sort those
+            kth = np.partition(key, wanted - 1)[wanted - 1]
+            keep = key <= kth
+            matches, key = matches[keep], key[keep]
+        order = np.lexsort((self._ids[matches], key))  # ties broken by id
+        return self._ids[matches[order[offset:wanted]]]
+
+    def query(
+        self,
+        categories: Optional[List[str]] = None,
+        is_veg: Optional[bool] = None,
+        min_price: Optional[float] = None,
+        max_price: Optional[float] = None,
+        in_stock: Optional[bool] = None,
+        sort: str = "id",
+        offset: int = 0,
+        limit: int = 50,
+        price_bands: Tuple[float, ...] = (),
+    ) -> dict:
+        # Returns {"total", "ids", "facets"}. Each facet is counted under every
+        # filter except its own, so picking a category still shows how many
+        # sweets the other categories have.
+        filters: Dict[str, np.ndarray] = {}
+        if categories:
+            codes = [self._codes[c] for c in categories if c in self._codes]
+            filters["category"] = np.isin(self._category_codes, codes)
+        if is_veg is not None:
+            filters["is_veg"] = self._veg == is_veg
+        if min_price is not None or max_price is not None:
+            price = ~np.isnan(self._prices)
+            if min_price is not None:
+                price &= self._prices >= min_price
+            if max_price is not None:
+                price &= self._prices <= max_price
+            filters["price"] = price
+        if in_stock is not None:
+            filters["in_stock"] = (self._quantities > 0) == in_stock
+
+        everything = np.ones(len(self._ids), dtype=bool)
+
+        def all_but(name: Optional[str]) -> np.ndarray:
+            mask = everything
+            for other, condition in filters.items():
+                if other != name:
+                    mask = mask & condition
+            return mask
+
+        matches = np.flatnonzero(all_but(None))
+
+        category_counts = np.bincount(self._category_codes[all_but("category")], minlength=len(self._categories))
+        veg = self._veg[all_but("is_veg")]
+        stocked = self._quantities[all_but("in_stock")] > 0
+        prices = self._prices[all_but("price")]
+        prices = prices[~np.isnan(prices)]
+        band_counts = np.bincount(np.searchsorted(price_bands, prices, side="right"), minlength=len(price_bands) + 1)
+        edges = (0.0, *price_bands, None)
+
+        return {
+            "total": len(matches),
+            "ids": self._page(matches, sort, offset, limit).tolist(),
+            "facets": {
+                "category": sorted(
+                    ({"value": self._categories[code], "count": int(n)} for code, n in enumerate(category_counts) if n),
+                    key=lambda facet: -facet["count"],
+                ),
+                "is_veg": [{"value": True, "count": int(veg.sum())}, {"value": False, "count": int(len(veg) - veg.sum())}],
+                "in_stock": [{"value": True, "count": int(stocked.sum())}, {"value": False, "count": int(len(stocked) - stocked.sum())}],
+                "price": [
+                    {"min": edges[i], "max": edges[i + 1], "count": int(n)} for i, n in enumerate(band_counts)
+                ],
+            },
+        }
+
+catalog_snapshot = CatalogSnapshot()
@@ -0,0 +1,90 @@
+import gzip
+from typing import Optional
+
+from starlette.datastructures import Headers, MutableHeaders
+
+from app.core.config import settings
+
+try:
+    import brotli  # optional: smaller than gzip for JSON, offered first when installed
+except ImportError:
+    brotli = None
+
+# In order of preference
+ENCODINGS = ("br", "gzip") if brotli is not None else ("gzip",)
+
+COMPRESSIBLE_TYPES = ("application/json", "application/x-ndjson", "text/plain", "text/html", "text/csv")
+
+def choose_encoding(accept_encoding: Optional[str]) -> Optional[str]:
+    # Best encoding we support that the client accepts (q > 0), or None
+    accepted = {}
+    for part in (accept_encoding or "").split(","):
+        name, _, params = part.strip().partition(";")
+        q = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                q = float(params[2:])
+            except ValueError:
+                q = 0.0
+        accepted[name.strip().lower()] = q
+    for encoding in ENCODINGS:
+        if accepted.get(encoding, accepted.get("*", 0)) > 0:
+            return encoding
+    return None
+
+def compress(body: bytes, encoding: str) -> bytes:
+    if encoding == "br":
+        return brotli.compress(body, quality=settings.COMPRESSION_BROTLI_QUALITY)
+    # mtime=0: same input, same bytes
+    return gzip.compress(body, compresslevel=settings.COMPRESSION_GZIP_LEVEL, mtime=0)
+
+def compressible(content_type: Optional[str]) -> bool:
+    return (content_type or "").split(";")[0].strip() in COMPRESSIBLE_TYPES
+
+class CompressionMiddleware:
+    # Compresses whole responses of at least COMPRESSION_MIN_BYTES. Streamed
+    # bodies (NDJSON export, /api/events) go out as they are: compressing them
+    # would buffer the stream. Responses that already carry a Content-Encoding
+    # (the catalog cache's precompressed bodies) pass through untouched.
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        encoding = choose_encoding(Headers(scope=scope).get("accept-encoding"))
+        if encoding is None:
+            return await self.app(scope, receive, send)
+
+        start = None
+
+        async def send_compressed(message):
+            nonlocal start
+            if message["type"] == "http.response.start":
+                start = message  # held until we've seen the body
+                return
+            if message["type"] != "http.response.body" or start is None:
+                return await send(message)
+
+            held, start = start, None
+            headers = MutableHeaders(scope=held)
+            body = message.get("body", b"")
+            if (
+                message.get("more_body")
+                or "content-encoding" in headers
+                or len(body) < settings.COMPRESSION_MIN_BYTES
+                or not compressible(headers.get("content-type"))
+            ):
+                await send(held)
+                return await send(message)
+
+            compressed = compress(body, encoding)
+            headers["Content-Encoding"] = encoding
+            headers["Content-Length"] = str(len(compressed))
+            headers.add_vary_header("Accept-Encoding")
+            await send(held)
+            await send({"type": "http.response.body", "body": compressed})
+
+        await self.app(scope, receive, send_compressed)
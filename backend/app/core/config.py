@@ -1,4 +1,5 @@
 import os
+from typing import List, Optional
 from pydantic_settings import BaseSettings, SettingsConfigDict
 
 class Settings(BaseSettings):
@@ -6,6 +7,67 @@ class Settings(BaseSettings):
     SECRET_KEY: str
     ALGORITHM: str = "HS256"
     ACCESS_TOKEN_EXPIRE_MINUTES: int = 30
+    REFRESH_TOKEN_EXPIRE_DAYS: int = 14  # Refresh tokens rotate on every use; a login family lives at most this long idle
+
+    # Database engine
+    DATABASE_REPLICA_URLS: str = ""  # Comma-separated read replicas for catalog reads
+    READ_YOUR_WRITES_SECONDS: float = 5  # After a write, that client reads from the primary
+    DB_ECHO: bool = False  # Log every SQL statement (debugging only, slow)
+    DB_POOL_MODE: str = "queue"  # "queue" (pooled) or "null" (new connection per checkout, for tests)
+    DB_POOL_SIZE: int = 5
+    DB_MAX_OVERFLOW: int = 10
+    DB_POOL_TIMEOUT: float = 30  # Seconds to wait for a free connection
+    DB_POOL_PRE_PING: bool = True  # Detect connections dropped by the server before using them
+    DB_POOL_RECYCLE: int = 1800  # Seconds; replace connections older than this
+    SQLITE_JOURNAL_MODE: str = "WAL"
+    SQLITE_SYNCHRONOUS: str = "NORMAL"
+    SQLITE_BUSY_TIMEOUT_MS: int = 5000
+
+    # Argon2id cost parameters. Unset = whatever passlib takes from the installed
+    # argon2-cffi (t=3, 64 MiB, p=4 since 21.2), as before they were settings.
+    # Setting them rehashes passwords with other costs on next login.
+    ARGON2_TIME_COST: Optional[int] = None
+    ARGON2_MEMORY_COST: Optional[int] = None  # KiB
+    ARGON2_PARALLELISM: Optional[int] = None
+    PASSWORD_HASH_WORKERS: int = 2  # Threads dedicated to hashing
+    PASSWORD_HASH_NICE: int = 10  # Scheduling niceness of those threads (Linux)
+    PASSWORD_HASH_MAX_PENDING: int = 64  # Beyond this, register/login answer 503
+    AUTH_CACHE_MAX_ENTRIES: int = 10000  # Decoded access tokens kept in memory
+    AUTH_CACHE_TTL_SECONDS: float = 300
+    AUTH_REVOCATION_POLL_SECONDS: float = 5  # How soon other workers' role changes/deletes lock out old tokens here
+    CACHE_MAX_ENTRIES: int = 1024  # Catalog read cache (list/search pages and single sweets)
+    CACHE_TTL_SECONDS: float = 30
+    SUGGEST_REFRESH_SECONDS: int = 60  # Reload the typeahead index to pick up other workers' writes
+    INVENTORY_WRITE_BEHIND: bool = False  # Group-commit sales from an in-memory stock counter (single worker only)
+    INVENTORY_FLUSH_INTERVAL_MS: float = 5  # How long the writer waits to gather a batch
+    INVENTORY_FLUSH_MAX_EVENTS: int = 500  # Events per group commit
+    ANALYTICS_MINUTE_RETENTION_HOURS: int = 48  # Per-minute sales rollups older than this are dropped
+    ANALYTICS_ROLLUP_SECONDS: float = 5  # How often new sales are folded into the rollups
+    LOW_STOCK_THRESHOLD: int = 5  # A sale taking a sweet below this pushes a low_stock alert
+    EVENTS_HEARTBEAT_SECONDS: float = 15  # Comment line sent on idle /api/events streams
+    EVENTS_QUEUE_SIZE: int = 256  # Undelivered events per client before it is told to resync
+    EVENTS_HISTORY: int = 1000  # Recent events kept for replay on reconnect
+    IDEMPOTENCY_TTL_SECONDS: int = 86400  # How long a recorded Idempotency-Key response is replayed
+    IDEMPOTENCY_CACHE_ENTRIES: int = 10000  # Recorded responses also kept in memory
+    METRICS_ENABLED: bool = True  # /metrics, Server-Timing and the DB/pool/hashing timers; off = not installed at all
+    COMPRESSION_ENABLED: bool = True  # gzip (and brotli, if installed) for responses that ask for it
+    COMPRESSION_MIN_BYTES: int = 1024  # Smaller bodies go out as they are
+    COMPRESSION_GZIP_LEVEL: int = 6
+    COMPRESSION_BROTLI_QUALITY: int = 5
+    CATALOG_MAX_AGE_SECONDS: int = 0  # Cache-Control max-age for list/search; 0 = no-cache (revalidate every time)
+    RATE_LIMIT_ENABLED: bool = True  # Token buckets for login/register and catalog browsing; off = not installed
+    RATE_LIMIT_AUTH_PER_MINUTE: float = 20  # Login/register attempts per client IP
+    RATE_LIMIT_AUTH_BURST: float = 10
+    RATE_LIMIT_BROWSE_PER_MINUTE: float = 600  # List/search/suggest/browse per user (or IP when signed out)
+    RATE_LIMIT_BROWSE_BURST: float = 60
+    RATE_LIMIT_MAX_KEYS: int = 100000  # Buckets kept in memory
+    ADMISSION_MAX_IN_FLIGHT: int = 128  # Per worker; past it only purchases/checkout/restock are let in
+    ADMISSION_LOW_PRIORITY_IN_FLIGHT: int = 64  # List/search/analytics are shed (503) past this
+    CATALOG_SNAPSHOT_REFRESH_SECONDS: int = 60  # Reload /api/sweets/browse's in-memory columns to pick up other workers' writes
+    CATALOG_PRICE_BANDS: List[float] = [2, 5, 10, 20]  # Band edges for the browse price facet (JSON list in .env)
+    RESERVATION_TTL_SECONDS: int = 600  # How long a cart hold keeps stock aside by default
+    RESERVATION_MAX_TTL_SECONDS: int = 3600
+    RESERVATION_SWEEP_SECONDS: float = 30  # Longest the expiry sweeper sleeps (it also wakes at the next expiry)
 
     model_config = SettingsConfigDict(
         # This tells Pydantic to look for .env in the same directory as this file's parent
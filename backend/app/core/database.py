@@ -1,15 +1,57 @@
+from itertools import count
+from fastapi import Request
 from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker, AsyncSession
 from sqlalchemy.orm import DeclarativeBase
-from sqlalchemy.pool import NullPool  # <--- IMPORT THIS
+from sqlalchemy import event, make_url, text
+from sqlalchemy.pool import AsyncAdaptedQueuePool, NullPool
 from app.core.config import settings
+from app.core.cache import LRUCache
+from app.core.metrics import instrument_engine, timed_pool
 
-# Create the Async Engine
-# poolclass=NullPool is CRITICAL for tests to prevent "Event loop" errors
-engine = create_async_engine(
-    settings.DATABASE_URL, 
-    echo=True,
-    poolclass=NullPool
-)
+def engine_options(url: str) -> dict:
+    options = {"echo": settings.DB_ECHO}
+    parsed = make_url(url)
+    if settings.DB_POOL_MODE == "null":
+        # A fresh connection per checkout. Test mode: pooled connections are
+        # tied to the event loop that opened them.
+        options["poolclass"] = timed_pool(NullPool) if settings.METRICS_ENABLED else NullPool
+    elif parsed.get_backend_name() == "sqlite" and parsed.database in (None, "", ":memory:"):
+        pass  # In-memory SQLite: SQLAlchemy's single shared connection, nothing to size
+    else:
+        if settings.METRICS_ENABLED:
+            options["poolclass"] = timed_pool(AsyncAdaptedQueuePool)
+        options.update(
+            pool_size=settings.DB_POOL_SIZE,
+            max_overflow=settings.DB_MAX_OVERFLOW,
+            pool_timeout=settings.DB_POOL_TIMEOUT,
+            pool_pre_ping=settings.DB_POOL_PRE_PING,
+            pool_recycle=settings.DB_POOL_RECYCLE,
+        )
+    return options
+
+def instrument(engine):
+    if settings.METRICS_ENABLED:
+        instrument_engine(engine)
+
+def tune_sqlite(engine):
+    # Applied to every new DBAPI connection. WAL lets readers run alongside the
+    # writer, synchronous=NORMAL drops the fsync per commit (still safe in WAL),
+    # busy_timeout makes writers wait for the lock instead of failing.
+    if engine.dialect.name != "sqlite":
+        return
+
+    @event.listens_for(engine.sync_engine, "connect")
+    def _on_connect(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        cursor.execute(f"PRAGMA journal_mode={settings.SQLITE_JOURNAL_MODE}")
+        cursor.execute(f"PRAGMA synchronous={settings.SQLITE_SYNCHRONOUS}")
+        cursor.execute(f"PRAGMA busy_timeout={settings.SQLITE_BUSY_TIMEOUT_MS}")
+        cursor.close()
+
+# Create the Async Engine (pool and logging configured through Settings)
+engine = create_async_engine(settings.DATABASE_URL, **engine_options(settings.DATABASE_URL))
+tune_sqlite(engine)
+instrument(engine)
 
 # Create the Session Factory
 SessionLocal = async_sessionmaker(
@@ -18,9 +60,65 @@ SessionLocal = async_sessionmaker(
     expire_on_commit=False
 )
 
+# --- READ REPLICAS ---
+def make_replica_sessions(urls: list) -> list:
+    sessions = []
+    for url in urls:
+        replica = create_async_engine(url, **engine_options(url))
+        tune_sqlite(replica)
+        instrument(replica)
+        sessions.append(async_sessionmaker(bind=replica, class_=AsyncSession, expire_on_commit=False))
+    return sessions
+
+replica_sessions = make_replica_sessions(
+    [url.strip() for url in settings.DATABASE_REPLICA_URLS.split(",") if url.strip()]
+)
+_replica_turn = count()
+
+# Clients that wrote recently read from the primary, so they see their own
+# writes even if the replicas lag. Keyed by user id (any of the user's tokens,
+# e.g. after a refresh or from another tab), or IP if anonymous.
+_recent_writers = LRUCache(max_entries=10000, ttl=settings.READ_YOUR_WRITES_SECONDS)
+
+async def _client_key(request: Request) -> str:
+    # Imported here: security imports this module
+    from app.core.security import user_id_from_authorization
+    user_id = await user_id_from_authorization(request.headers.get("authorization", ""))
+    if user_id is not None:
+        return f"user:{user_id}"
+    return f"ip:{request.client.host if request.client else ''}"
+
+async def read_sessionmaker(request: Request) -> async_sessionmaker:
+    # sticky_primary tells handlers not to trust caches that replicas may have filled
+    request.state.sticky_primary = bool(replica_sessions) and bool(_recent_writers.get(await _client_key(request)))
+    if not replica_sessions or request.state.sticky_primary:
+        return SessionLocal
+    return replica_sessions[next(_replica_turn) % len(replica_sessions)]
+
 class Base(DeclarativeBase):
     pass
 
 async def get_db():
     async with SessionLocal() as session:
         yield session
+
+async def get_write_db(request: Request):
+    # Primary session for handlers that write; starts the client's
+    # read-your-writes window (only needed when there are replicas)
+    if replica_sessions:
+        _recent_writers.set(await _client_key(request), True)
+    async with SessionLocal() as session:
+        yield session
+
+async def get_read_db(request: Request):
+    # Catalog reads: replicas round-robin (primary if none are configured)
+    async with (await read_sessionmaker(request))() as session:
+        yield session
+
+async def lock_for_write(db: AsyncSession):
+    # SQLite takes a read lock first and upgrades it on the first write; two
+    # writers racing for that upgrade fail with "database is locked" instead of
+    # waiting. BEGIN IMMEDIATE grabs the write lock up front so they queue on
+    # the busy timeout. Must run before any other write in the transaction.
+    if db.bind.dialect.name == "sqlite":
+        await db.execute(text("BEGIN IMMEDIATE"))
@@ -0,0 +1,163 @@
+import hashlib
+import json
+import re
+from datetime import datetime, timedelta
+from typing import Optional, Tuple
+
+from sqlalchemy import delete, select, update
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+
+from app.core.cache import LRUCache
+from app.core.config import settings
+from app.core.database import SessionLocal, lock_for_write
+from app.core.security import user_id_from_authorization
+from app.models.idempotency_key import IdempotencyKey
+
+# POST routes that honour Idempotency-Key: create, purchase, restock, checkout,
+# reserving and confirming reservations
+IDEMPOTENT_ROUTES = re.compile(r"^/api/(?:sweets/(?:|checkout|\d+/purchase|\d+/restock)|reservations/(?:|confirm))$")
+
+Recorded = Tuple[str, int, Optional[str], bytes]  # fingerprint, status, content type, body
+
+# Status of a claimed key whose request hasn't finished (or never did)
+PENDING = 0
+
+# In-memory front of the idempotency_keys table (per worker); finished responses only
+_recorded = LRUCache(settings.IDEMPOTENCY_CACHE_ENTRIES, settings.IDEMPOTENCY_TTL_SECONDS)
+_pruned_at: Optional[datetime] = None
+
+class IdempotencyMiddleware:
+    # A retried write with the same Idempotency-Key gets the first attempt's
+    # recorded response, replayed from memory (or the idempotency_keys table)
+    # without running the handler, so stock isn't touched twice. Keys are per
+    # user. Reusing a key for a different request is a 422. 5xx responses
+    # aren't recorded, so those can be retried for real.
+    #
+    # The key is claimed in the table (a PENDING row) before the handler runs,
+    # so a retry on any worker sees it and gets a 409 while the first attempt
+    # is running. If a worker dies mid-request the claim stays: whether the
+    # write committed is unknown, so retries keep getting 409 until the key
+    # expires rather than risk running it twice.
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["method"] != "POST" or not IDEMPOTENT_ROUTES.match(scope["path"]):
+            return await self.app(scope, receive, send)
+        headers = dict(scope["headers"])
+        client_key = headers.get(b"idempotency-key", b"").decode()
+        user_id = await user_id_from_authorization(headers.get(b"authorization", b"").decode())
+        if not client_key or user_id is None:
+            # No key, or not signed in: the handler answers (401 for the latter)
+            return await self.app(scope, receive, send)
+
+        body = b""
+        while True:
+            message = await receive()
+            body += message.get("body", b"")
+            if not message.get("more_body"):
+                break
+
+        key = f"{user_id}:{client_key}"
+        fingerprint = hashlib.sha256(b"%s %s\n%s" % (scope["method"].encode(), scope["path"].encode(), body)).hexdigest()
+
+        recorded = _recorded.get(key) or await self._claim(key, fingerprint)
+        if recorded is not None:
+            if recorded[0] != fingerprint:
+                return await self._error(send, 422, "Idempotency-Key was already used for a different request")
+            if recorded[1] == PENDING:
+                return await self._error(send, 409, "A request with this Idempotency-Key is still in progress", {b"retry-after": b"1"})
+            return await self._replay(send, recorded)
+
+        sent = False
+        response = {"status": 500, "content_type": None, "body": b""}
+
+        async def replay_body():
+            nonlocal sent
+            if sent:
+                return await receive()  # after the body: wait for disconnect as usual
+            sent = True
+            return {"type": "http.request", "body": body, "more_body": False}
+
+        async def capture(message):
+            if message["type"] == "http.response.start":
+                response["status"] = message["status"]
+                response["content_type"] = dict(message.get("headers", [])).get(b"content-type", b"").decode() or None
+            elif message["type"] == "http.response.body":
+                response["body"] += message.get("body", b"")
+            await send(message)
+
+        recorded = None
+        try:
+            await self.app(scope, replay_body, capture)
+            if response["status"] < 500:
+                recorded = (fingerprint, response["status"], response["content_type"], response["body"])
+        finally:
+            await self._finish(key, recorded)
+
+    async def _claim(self, key: str, fingerprint: str) -> Optional[Recorded]:
+        # Inserts a PENDING row for `key`. Returns None if this request now
+        # owns the key, else the row already there (pending or finished).
+        global _pruned_at
+        now = datetime.utcnow()
+        async with SessionLocal() as db:
+            await lock_for_write(db)
+            if _pruned_at is None or now - _pruned_at > timedelta(hours=1):
+                # Expired keys are dropped here, at most once an hour per worker
+                await db.execute(delete(IdempotencyKey).where(IdempotencyKey.expires_at <= now))
+                _pruned_at = now
+            else:
+                await db.execute(delete(IdempotencyKey).where(IdempotencyKey.key == key, IdempotencyKey.expires_at <= now))
+            insert = sqlite_insert if db.bind.dialect.name == "sqlite" else pg_insert
+            claimed = await db.execute(
+                insert(IdempotencyKey)
+                .values(
+                    key=key, fingerprint=fingerprint, status_code=PENDING, content_type=None, body=b"",
+                    expires_at=now + timedelta(seconds=settings.IDEMPOTENCY_TTL_SECONDS),
+                )
+                .on_conflict_do_nothing(index_elements=[IdempotencyKey.key])
+            )
+            row = None
+            if claimed.rowcount == 0:
+                row = (await db.execute(select(IdempotencyKey).where(IdempotencyKey.key == key))).scalars().first()
+            await db.commit()
+        if row is None:
+            return None
+        recorded = (row.fingerprint, row.status_code, row.content_type, row.body)
+        if row.status_code != PENDING:
+            _recorded.set(key, recorded)
+        return recorded
+
+    async def _finish(self, key: str, recorded: Optional[Recorded]):
+        # Fills in the claim with the response, or gives the key back (5xx, or
+        # the handler raised) so a retry runs for real
+        async with SessionLocal() as db:
+            await lock_for_write(db)
+            if recorded is None:
+                await db.execute(delete(IdempotencyKey).where(IdempotencyKey.key == key))
+            else:
+                _, status_code, content_type, body = recorded
+                await db.execute(
+                    update(IdempotencyKey).where(IdempotencyKey.key == key)
+                    .values(status_code=status_code, content_type=content_type, body=body)
+                )
+            await db.commit()
+        if recorded is not None:
+            _recorded.set(key, recorded)
+
+    async def _replay(self, send, recorded: Recorded):
+        _, status_code, content_type, body = recorded
+        headers = [(b"content-length", str(len(body)).encode()), (b"idempotent-replayed", b"true")]
+        if content_type:
+            headers.append((b"content-type", content_type.encode()))
+        await send({"type": "http.response.start", "status": status_code, "headers": headers})
+        await send({"type": "http.response.body", "body": body})
+
+    async def _error(self, send, status_code: int, detail: str, extra_headers: Optional[dict] = None):
+        body = json.dumps({"detail": detail}).encode()
+        headers = [(b"content-type", b"application/json"), (b"content-length", str(len(body)).encode())]
+        headers += list((extra_headers or {}).items())
+        await send({"type": "http.response.start", "status": status_code, "headers": headers})
+        await send({"type": "http.response.body", "body": body})
@@ -0,0 +1,180 @@
+import asyncio
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy import bindparam, insert, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.config import settings
+from app.core.database import SessionLocal, lock_for_write
+from app.models.inventory_event import InventoryEvent
+from app.models.sweet import Sweet
+
+sweets_table = Sweet.__table__
+
+def event_row(sweet_id: int, kind: str, delta: int, user_id: Optional[int]) -> dict:
+    return {"sweet_id": sweet_id, "kind": kind, "delta": delta, "user_id": user_id, "created_at": datetime.utcnow()}
+
+async def record_events(db: AsyncSession, rows: List[dict]):
+    # The events go into the caller's transaction, next to the stock update
+    # they describe, so the log and the column never disagree. The sales
+    # rollups catch up from the log in the background (app/core/analytics.py).
+    if rows:
+        await db.execute(insert(InventoryEvent), rows)
+
+class SweetNotFound(Exception):
+    def __init__(self, sweet_ids: List[int]):
+        super().__init__(sweet_ids)
+        self.sweet_ids = sweet_ids
+
+class OutOfStock(Exception):
+    def __init__(self, sweet_ids: List[int]):
+        super().__init__(sweet_ids)
+        self.sweet_ids = sweet_ids
+
+class InventoryWriter:
+    # Write-behind mode (INVENTORY_WRITE_BEHIND). Stock checks happen against an
+    # in-memory counter per sweet, so a sale never waits on the sweets row lock;
+    # the events are then written by one background task in group commits: one
+    # transaction per batch that appends the events and applies each sweet's
+    # summed delta to sweets.quantity. Callers still await their batch, so a 200
+    # means the sale is durable.
+    #
+    # The counter is per process: run a single worker in this mode, or other
+    # workers' sales are invisible to it and can oversell.
+
+    def __init__(self):
+        self._available: Dict[int, int] = {}
+        # Deltas accepted but not yet in sweets.quantity; added to the column
+        # when a counter is (re)loaded
+        self._unflushed: Dict[int, int] = {}
+        self._pending: List[Tuple[List[dict], asyncio.Future]] = []
+        self._lock: Optional[asyncio.Lock] = None
+        self._wakeup: Optional[asyncio.Event] = None
+        self._task: Optional[asyncio.Task] = None
+        self._stopping = False
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    def start(self):
+        if not self.running:
+            self._stopping = False
+            self._lock = asyncio.Lock()
+            self._wakeup = asyncio.Event()
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        # Flushes whatever is still pending before returning
+        if not self.running:
+            return
+        self._stopping = True
+        self._wakeup.set()
+        await self._task
+        self._task = None
+        await self._flush_pending()  # sales that arrived during the last flush
+
+    def forget(self, *sweet_ids: int):
+        # Call after changing quantity outside the writer (edit, delete, import);
+        # the counter reloads from the column on next use
+        for sweet_id in sweet_ids:
+            self._available.pop(sweet_id, None)
+
+    def forget_all(self):
+        self._available.clear()
+
+    async def _load(self, sweet_ids: Iterable[int]):
+        missing = [sweet_id for sweet_id in sweet_ids if sweet_id not in self._available]
+        if not missing:
+            return
+        # Under the flush lock: a flush landing between reading the column and
+        # reading _unflushed would count its deltas twice
+        async with self._lock:
+            missing = [sweet_id for sweet_id in missing if sweet_id not in self._available]
+            async with SessionLocal() as db:
+                result = await db.execute(select(Sweet.id, Sweet.quantity).where(Sweet.id.in_(missing)))
+                for sweet_id, quantity in result.all():
+                    self._available[sweet_id] = quantity + self._unflushed.get(sweet_id, 0)
+
+    async def apply(
+        self, deltas: Dict[int, int], kind: str, user_id: Optional[int], reserved: Optional[Dict[int, int]] = None
+    ) -> Dict[int, int]:
+        # All-or-nothing across the sweets in `deltas`. Returns their new stock.
+        # `reserved`: units per sweet this change must leave in stock (other carts' holds).
+        self.start()
+        await self._load(deltas)
+
+        missing = [sweet_id for sweet_id in deltas if sweet_id not in self._available]
+        if missing:
+            raise SweetNotFound(missing)
+        reserved = reserved or {}
+        short = [sweet_id for sweet_id, delta in deltas.items() if self._available[sweet_id] + delta < reserved.get(sweet_id, 0)]
+        if short:
+            raise OutOfStock(short)
+
+        # No await between the check above and this point, so no other sale
+        # can slip in between
+        for sweet_id, delta in deltas.items():
+            self._available[sweet_id] += delta
+            self._unflushed[sweet_id] = self._unflushed.get(sweet_id, 0) + delta
+        quantities = {sweet_id: self._available[sweet_id] for sweet_id in deltas}
+
+        done = asyncio.get_running_loop().create_future()
+        self._pending.append(([event_row(sweet_id, kind, delta, user_id) for sweet_id, delta in deltas.items()], done))
+        self._wakeup.set()
+        await done
+        return quantities
+
+    async def _run(self):
+        while not self._stopping:
+            await self._wakeup.wait()
+            if not self._stopping:
+                # Let concurrent sales pile up so they share the commit
+                await asyncio.sleep(settings.INVENTORY_FLUSH_INTERVAL_MS / 1000)
+            self._wakeup.clear()
+            await self._flush_pending()
+
+    async def _flush_pending(self):
+        while self._pending:
+            batch = self._pending[:settings.INVENTORY_FLUSH_MAX_EVENTS]
+            del self._pending[:len(batch)]
+            await self._flush(batch)
+
+    async def _flush(self, batch: List[Tuple[List[dict], asyncio.Future]]):
+        events = [event for rows, _ in batch for event in rows]
+        totals: Dict[int, int] = {}
+        for event in events:
+            totals[event["sweet_id"]] = totals.get(event["sweet_id"], 0) + event["delta"]
+
+        try:
+            async with self._lock:
+                async with SessionLocal() as db:
+                    await lock_for_write(db)
+                    await record_events(db, events)
+                    # Compaction: one UPDATE per sweet per batch, however many sales it holds
+                    await db.execute(
+                        sweets_table.update()
+                        .where(sweets_table.c.id == bindparam("b_id"))
+                        .values(quantity=sweets_table.c.quantity + bindparam("b_delta")),
+                        [{"b_id": sweet_id, "b_delta": delta} for sweet_id, delta in totals.items()],
+                    )
+                    await db.commit()
+                for sweet_id, delta in totals.items():
+                    self._unflushed[sweet_id] -= delta
+        except Exception as exc:
+            # Nothing was written: give the stock back and fail every caller in the batch
+            for sweet_id, delta in totals.items():
+                self._unflushed[sweet_id] -= delta
+                if sweet_id in self._available:
+                    self._available[sweet_id] -= delta
+            for _, done in batch:
+                if not done.done():
+                    done.set_exception(exc)
+            return
+
+        for _, done in batch:
+            if not done.done():
+                done.set_result(None)
+
+inventory_writer = InventoryWriter()
@@ -0,0 +1,166 @@
+import csv
+import io
+import json
+from functools import partial
+from itertools import islice
+from typing import BinaryIO, Iterator, List, Optional, Tuple, Union
+
+from pydantic import ValidationError
+from sqlalchemy import bindparam, insert, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.inventory import event_row, record_events
+from app.models.sweet import Sweet
+from app.schemas.sweet import ImportReport, ImportRowResult, SweetCreate, SweetRestockRow
+
+# Rows per batched INSERT/UPDATE. Big enough to amortise round trips, small
+# enough that the IN (...) name lookup stays under SQLite's variable limit.
+BATCH_SIZE = 500
+
+sweets_table = Sweet.__table__
+
+def detect_format(filename: Optional[str], content_type: Optional[str]) -> str:
+    name = (filename or "").lower()
+    if name.endswith((".ndjson", ".jsonl")) or "ndjson" in (content_type or ""):
+        return "ndjson"
+    return "csv"
+
+def iter_rows(fileobj: BinaryIO, fmt: str) -> Iterator[Tuple[int, Union[dict, Exception]]]:
+    # Reads the (spooled) upload line by line, never the whole file at once.
+    # Yields (row number, parsed dict) or (row number, error) so one bad line
+    # doesn't abort the import.
+    text = io.TextIOWrapper(fileobj, encoding="utf-8-sig", newline="")
+    if fmt == "csv":
+        reader = csv.DictReader(text)
+        for row in reader:
+            # Empty cells mean "use the default", not an empty string
+            yield reader.line_num - 1, {k: v for k, v in row.items() if k and v not in ("", None)}
+        return
+
+    for row_no, line in enumerate(text, start=1):
+        if not line.strip():
+            continue
+        try:
+            data = json.loads(line)
+        except ValueError as exc:
+            yield row_no, exc
+            continue
+        yield row_no, data if isinstance(data, dict) else ValueError("Expected a JSON object")
+
+def _chunks(rows: Iterator, size: int) -> Iterator[list]:
+    while chunk := list(islice(rows, size)):
+        yield chunk
+
+def _error(row_no: int, exc: Exception, name: Optional[str] = None) -> ImportRowResult:
+    if isinstance(exc, ValidationError):
+        detail = "; ".join(f"{'.'.join(map(str, e['loc']))}: {e['msg']}" for e in exc.errors())
+    else:
+        detail = str(exc)
+    return ImportRowResult(row=row_no, name=name, status="error", detail=detail)
+
+def _validate(chunk: list, schema) -> Tuple[list, List[ImportRowResult]]:
+    valid, errors = [], []
+    for row_no, data in chunk:
+        if isinstance(data, Exception):
+            errors.append(_error(row_no, data))
+            continue
+        try:
+            valid.append((row_no, schema.model_validate(data)))
+        except ValidationError as exc:
+            errors.append(_error(row_no, exc, data.get("name")))
+    return valid, errors
+
+async def _existing_stock(db: AsyncSession, names: set) -> dict:
+    # name -> [(id, quantity)]; names aren't unique
+    result = await db.execute(select(Sweet.id, Sweet.name, Sweet.quantity).where(Sweet.name.in_(names)))
+    stock: dict = {}
+    for sweet_id, name, quantity in result.all():
+        stock.setdefault(name, []).append((sweet_id, quantity))
+    return stock
+
+async def _upsert_chunk(db: AsyncSession, rows: list, user_id: Optional[int] = None) -> List[ImportRowResult]:
+    existing = await _existing_stock(db, {sweet.name for _, sweet in rows})
+
+    # Later rows for the same name win column by column, like applying them
+    # one by one would. An update writes only the columns the row has: a file
+    # without image_url/is_veg leaves those alone.
+    creates, updates, results = {}, {}, []
+    for row_no, sweet in rows:
+        if sweet.name in existing:
+            updates[sweet.name] = {**updates.get(sweet.name, {}), **sweet.model_dump(exclude_unset=True)}
+            status = "updated"
+        elif sweet.name in creates:
+            creates[sweet.name].update(sweet.model_dump(exclude_unset=True))
+            status = "updated"
+        else:
+            creates[sweet.name] = sweet.model_dump()
+            status = "created"
+        results.append(ImportRowResult(row=row_no, name=sweet.name, status=status))
+
+    if creates:
+        # One multi-row INSERT for the whole chunk
+        await db.execute(insert(sweets_table), list(creates.values()))
+    if updates:
+        # One executemany UPDATE keyed on name per set of columns present
+        by_columns: dict = {}
+        for data in updates.values():
+            by_columns.setdefault(tuple(sorted(data)), []).append(data)
+        for columns, group in by_columns.items():
+            stmt = (
+                sweets_table.update()
+                .where(sweets_table.c.name == bindparam("b_name"))
+                .values({col: bindparam(f"b_{col}") for col in columns if col != "name"})
+            )
+            await db.execute(stmt, [{f"b_{k}": v for k, v in data.items()} for data in group])
+        # Stock set by the file: log the difference, as update_sweet does
+        await record_events(db, [
+            event_row(sweet_id, "adjust", data["quantity"] - (quantity or 0), user_id)
+            for name, data in updates.items() if "quantity" in data
+            for sweet_id, quantity in existing[name] if data["quantity"] != quantity
+        ])
+    return results
+
+async def _restock_chunk(db: AsyncSession, rows: list, user_id: Optional[int] = None) -> List[ImportRowResult]:
+    # Names aren't unique, so a row restocks (and logs an event for) every sweet with that name
+    result = await db.execute(select(Sweet.id, Sweet.name).where(Sweet.name.in_({row.name for _, row in rows})))
+    ids_by_name: dict = {}
+    for sweet_id, name in result.all():
+        ids_by_name.setdefault(name, []).append(sweet_id)
+
+    params, events, results = [], [], []
+    for row_no, row in rows:
+        if row.name not in ids_by_name:
+            results.append(ImportRowResult(row=row_no, name=row.name, status="error", detail="Sweet not found"))
+            continue
+        params.append({"b_name": row.name, "b_amount": row.amount})
+        events += [event_row(sweet_id, "restock", row.amount, user_id) for sweet_id in ids_by_name[row.name]]
+        results.append(ImportRowResult(row=row_no, name=row.name, status="restocked"))
+
+    if params:
+        stmt = (
+            sweets_table.update()
+            .where(sweets_table.c.name == bindparam("b_name"))
+            .values(quantity=sweets_table.c.quantity + bindparam("b_amount"))
+        )
+        await db.execute(stmt, params)
+        await record_events(db, events)
+    return results
+
+async def import_sweets(db: AsyncSession, fileobj: BinaryIO, fmt: str, mode: str, user_id: Optional[int] = None) -> ImportReport:
+    # Caller owns the transaction: everything here is flushed in batches and
+    # committed (or rolled back) once at the end.
+    if mode == "restock":
+        schema, apply_chunk = SweetRestockRow, partial(_restock_chunk, user_id=user_id)
+    else:
+        schema, apply_chunk = SweetCreate, partial(_upsert_chunk, user_id=user_id)
+
+    report = ImportReport()
+    for chunk in _chunks(iter_rows(fileobj, fmt), BATCH_SIZE):
+        valid, errors = _validate(chunk, schema)
+        results = errors + (await apply_chunk(db, valid) if valid else [])
+        results.sort(key=lambda r: r.row)
+        for result in results:
+            counter = "failed" if result.status == "error" else result.status
+            setattr(report, counter, getattr(report, counter) + 1)
+        report.rows.extend(results)
+    return report
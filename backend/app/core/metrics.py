@@ -0,0 +1,164 @@
+import time
+from bisect import bisect_left
+from contextvars import ContextVar
+from typing import Dict, Optional, Tuple
+
+from sqlalchemy import event
+
+# Small in-process registry rendered in the Prometheus text format; enough for
+# a handful of histograms without pulling in a client library. Per worker, like
+# the caches: scrape each worker (or run one) to see everything.
+
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+COUNT_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100)
+
+class Histogram:
+    def __init__(self, name: str, help: str, labels: Tuple[str, ...] = (), buckets: Tuple[float, ...] = LATENCY_BUCKETS):
+        self.name, self.help, self.labels, self.buckets = name, help, labels, buckets
+        self._series: Dict[tuple, list] = {}  # label values -> [bucket counts..., sum, count]
+
+    def observe(self, value: float, *label_values: str):
+        series = self._series.get(label_values)
+        if series is None:
+            series = self._series[label_values] = [0] * (len(self.buckets) + 2)
+        # Non-cumulative here; cumulated when rendered
+        i = bisect_left(self.buckets, value)
+        if i < len(self.buckets):
+            series[i] += 1
+        series[-2] += value
+        series[-1] += 1
+
+    def render(self) -> str:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        for label_values, series in sorted(self._series.items()):
+            labels = ",".join(f'{k}="{v}"' for k, v in zip(self.labels, label_values))
+            sep = "," if labels else ""
+            running = 0
+            for bound, n in zip(self.buckets, series):
+                running += n
+                lines.append(f'{self.name}_bucket{{{labels}{sep}le="{bound}"}} {running}')
+            lines.append(f'{self.name}_bucket{{{labels}{sep}le="+Inf"}} {series[-1]}')
+            braced = f"{{{labels}}}" if labels else ""
+            lines.append(f"{self.name}_sum{braced} {series[-2]}")
+            lines.append(f"{self.name}_count{braced} {series[-1]}")
+        return "\n".join(lines)
+
+REQUEST_SECONDS = Histogram("http_request_duration_seconds", "Request latency", ("method", "route", "status"))
+REQUEST_DB_QUERIES = Histogram("http_request_db_queries", "SQL statements per request", ("route",), COUNT_BUCKETS)
+REQUEST_DB_SECONDS = Histogram("http_request_db_seconds", "Time in SQL statements per request", ("route",))
+DB_QUERY_SECONDS = Histogram("db_query_duration_seconds", "SQL statement latency")
+POOL_WAIT_SECONDS = Histogram("db_pool_checkout_wait_seconds", "Time to get a connection from the pool")
+PASSWORD_HASH_SECONDS = Histogram("password_hash_duration_seconds", "Argon2 time on the hashing pool", ("operation",))
+
+REGISTRY = [REQUEST_SECONDS, REQUEST_DB_QUERIES, REQUEST_DB_SECONDS, DB_QUERY_SECONDS, POOL_WAIT_SECONDS, PASSWORD_HASH_SECONDS]
+
+def render() -> str:
+    return "\n".join(metric.render() for metric in REGISTRY) + "\n"
+
+# --- PER-REQUEST TIMINGS ---
+class RequestTimings:
+    __slots__ = ("db_queries", "db", "pool", "hash")
+
+    def __init__(self):
+        self.db_queries = 0
+        self.db = self.pool = self.hash = 0.0
+
+    def server_timing(self, total: float) -> bytes:
+        parts = [f"app;dur={total * 1000:.1f}", f'db;dur={self.db * 1000:.1f};desc="{self.db_queries} queries"']
+        if self.pool:
+            parts.append(f"pool;dur={self.pool * 1000:.1f}")
+        if self.hash:
+            parts.append(f"hash;dur={self.hash * 1000:.1f}")
+        return ", ".join(parts).encode()
+
+# Set by the middleware; SQLAlchemy's sync events run in the request's context
+_timings: ContextVar[Optional[RequestTimings]] = ContextVar("request_timings", default=None)
+
+def observe_hashing(operation: str, seconds: float):
+    PASSWORD_HASH_SECONDS.observe(seconds, operation)
+    timings = _timings.get()
+    if timings is not None:
+        timings.hash += seconds
+
+# --- SQLALCHEMY HOOKS ---
+def instrument_engine(engine):
+    # Statement count and time, via cursor events on the async engine's sync core
+    @event.listens_for(engine.sync_engine, "before_cursor_execute")
+    def _before(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("query_start", []).append(time.perf_counter())
+
+    @event.listens_for(engine.sync_engine, "after_cursor_execute")
+    def _after(conn, cursor, statement, parameters, context, executemany):
+        elapsed = time.perf_counter() - conn.info["query_start"].pop()
+        DB_QUERY_SECONDS.observe(elapsed)
+        timings = _timings.get()
+        if timings is not None:
+            timings.db_queries += 1
+            timings.db += elapsed
+
+def timed_pool(pool_class):
+    # Subclass of the engine's pool class that times checkouts: the wait for a
+    # free connection, or for a new one to be opened
+    class TimedPool(pool_class):
+        def _do_get(self):
+            start = time.perf_counter()
+            try:
+                return super()._do_get()
+            finally:
+                elapsed = time.perf_counter() - start
+                POOL_WAIT_SECONDS.observe(elapsed)
+                timings = _timings.get()
+                if timings is not None:
+                    timings.pool += elapsed
+
+    TimedPool.__name__ = f"Timed{pool_class.__name__}"
+    return TimedPool
+
+# --- MIDDLEWARE ---
+def route_template(scope) -> str:
+    # The matched route's path can be relative to its router's prefix, so put
+    # the prefix back from the request path: /api/sweets/1 + /{sweet_id}
+    # -> /api/sweets/{sweet_id}
+    route = getattr(scope.get("route"), "path", None)
+    if route is None:
+        return "unmatched"
+    rendered = route
+    for name, value in scope.get("path_params", {}).items():
+        rendered = rendered.replace("{" + name + "}", str(value))
+    path = scope["path"]
+    return path[:len(path) - len(rendered)] + route if path.endswith(rendered) else route
+
+class MetricsMiddleware:
+    # Latency per route template (not raw path, so /api/sweets/{sweet_id} is
+    # one series) and the request's DB/pool/hashing time, also sent back in a
+    # Server-Timing header. Only installed when METRICS_ENABLED.
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        timings = RequestTimings()
+        token = _timings.set(timings)
+        start = time.perf_counter()
+        status = 500
+
+        async def send_with_timing(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                message["headers"] = list(message.get("headers", [])) + [
+                    (b"server-timing", timings.server_timing(time.perf_counter() - start))
+                ]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            _timings.reset(token)
+            route = route_template(scope)
+            REQUEST_SECONDS.observe(time.perf_counter() - start, scope["method"], route, str(status))
+            REQUEST_DB_QUERIES.observe(timings.db_queries, route)
+            REQUEST_DB_SECONDS.observe(timings.db, route)
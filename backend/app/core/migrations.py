@@ -0,0 +1,155 @@
+from typing import Callable, List, Optional, Tuple
+
+from sqlalchemy import Column, Integer, MetaData, Table, delete, func, inspect, insert, select, update
+from sqlalchemy.engine import Connection
+from sqlalchemy.exc import DBAPIError
+from sqlalchemy.ext.asyncio import AsyncConnection, AsyncEngine
+from sqlalchemy.schema import CreateColumn
+
+from app.core.database import Base
+from app.core.search import install_search_index, uninstall_search_index
+# Every model, so create_all/drop_all see all the tables
+from app.models import idempotency_key, inventory_event, refresh_token, sales_rollup, sweet, token_revocation, user  # noqa: F401
+from app.models.inventory_event import InventoryEvent
+from app.models.schema_version import SchemaVersion
+from app.models.token_revocation import TokenRevocation
+
+# --- STEPS ---
+# Tables a later step drops, as they were; the models no longer have them
+_rollup_progress = Table("rollup_progress", MetaData(), Column("last_event_id", Integer, primary_key=True))
+
+def _add_rollup_progress(conn: Connection):
+    # Rollups used to be updated in the sale transaction, so every event
+    # already logged is counted; the background job starts after them
+    _rollup_progress.create(conn)
+    last = conn.execute(select(func.coalesce(func.max(InventoryEvent.id), 0))).scalar()
+    conn.execute(insert(_rollup_progress).values(last_event_id=last))
+
+def _add_token_revocations(conn: Connection):
+    TokenRevocation.__table__.create(conn)
+
+def _pending_index():
+    [index] = [i for i in InventoryEvent.__table__.indexes if i.name == "ix_inventory_events_pending"]
+    return index
+
+def _add_rolled_up(conn: Connection):
+    # Replaces the rollup_progress watermark: ids can commit out of order, so
+    # each event carries its own flag
+    events = InventoryEvent.__table__
+    conn.exec_driver_sql(f"ALTER TABLE inventory_events ADD COLUMN {CreateColumn(events.c.rolled_up).compile(dialect=conn.dialect)}")
+    conn.execute(
+        update(events)
+        .where(events.c.id <= select(_rollup_progress.c.last_event_id).scalar_subquery())
+        .values(rolled_up=True)
+    )
+    _pending_index().create(conn)
+    _rollup_progress.drop(conn)
+
+# Schema changes, in order: (version, description, fn(sync connection)).
+# Append only, and never edit one that has shipped. New databases are built
+# by create_all from the current models and stamped with the last version,
+# so a step only ever runs on a database at the version before it.
+MIGRATIONS: List[Tuple[int, str, Callable[[Connection], None]]] = [
+    (2, "rollup_progress", _add_rollup_progress),
+    (3, "token_revocations", _add_token_revocations),
+    (4, "inventory_events.rolled_up", _add_rolled_up),
+]
+
+# Version 1 is the schema as create_all built it when versioning started
+BASELINE = 1
+
+def latest_version() -> int:
+    return MIGRATIONS[-1][0] if MIGRATIONS else BASELINE
+
+# --- HELPERS ---
+def _stored_version(conn: Connection) -> Optional[int]:
+    return conn.execute(select(SchemaVersion.version)).scalar()
+
+def _stamp(conn: Connection, version: int):
+    conn.execute(delete(SchemaVersion))
+    conn.execute(insert(SchemaVersion).values(version=version))
+
+def _add_missing_columns(conn: Connection) -> List[str]:
+    # ALTER TABLE ... ADD COLUMN for model columns an existing table lacks,
+    # e.g. sweets.is_veg on a database from before it. Rows already there get
+    # the column's default.
+    added = []
+    inspector = inspect(conn)
+    for table in Base.metadata.sorted_tables:
+        if not inspector.has_table(table.name):
+            continue
+        present = {column["name"] for column in inspector.get_columns(table.name)}
+        for column in table.columns:
+            if column.name in present:
+                continue
+            if not column.nullable:
+                raise RuntimeError(f"{table.name}.{column.name} is NOT NULL: write a migration for it")
+            conn.exec_driver_sql(f"ALTER TABLE {table.name} ADD COLUMN {CreateColumn(column).compile(dialect=conn.dialect)}")
+            default = column.default.arg if column.default is not None and column.default.is_scalar else None
+            if default is not None:
+                conn.execute(table.update().values({column.name: default}))
+            added.append(f"{table.name}.{column.name}")
+    return added
+
+def _adopt(conn: Connection) -> str:
+    # No version stored: a new database, or one made by create_all before
+    # versioning. Either way, bring it up to the current models.
+    existing = inspect(conn).get_table_names()
+    Base.metadata.create_all(conn)
+    added = _add_missing_columns(conn) if existing else []
+    if "inventory_events" in existing:
+        _pending_index().create(conn, checkfirst=True)  # create_all skips tables that exist
+        if "sales_by_hour" in existing:
+            # Those rollups were kept in the sale transaction: they count every event already logged
+            conn.execute(update(InventoryEvent).where(InventoryEvent.rolled_up.is_(None)).values(rolled_up=True))
+    install_search_index(conn)
+    _stamp(conn, latest_version())
+    if not existing:
+        return "created"
+    return "adopted" + (f", added {', '.join(added)}" if added else "")
+
+async def _lock(conn: AsyncConnection):
+    # Held until commit, so only one worker migrates; the others wait here
+    # and then find nothing left to do
+    if conn.dialect.name == "sqlite":
+        await conn.exec_driver_sql("BEGIN IMMEDIATE")  # waits out SQLITE_BUSY_TIMEOUT_MS
+    elif conn.dialect.name == "postgresql":
+        await conn.exec_driver_sql("SELECT pg_advisory_xact_lock(7216150)")  # any constant shared by all workers
+
+# --- RUNNER ---
+async def current_version(engine: AsyncEngine) -> Optional[int]:
+    # None if the database has never been versioned
+    async with engine.connect() as conn:
+        try:
+            return await conn.run_sync(_stored_version)
+        except DBAPIError:  # no schema_version table yet
+            return None
+
+async def migrate(engine: AsyncEngine) -> List[str]:
+    # Brings the schema up to date and returns what was done (empty if
+    # nothing was). Called on every worker boot: once the database is
+    # current that's a single one-row read, with no DDL or reflection.
+    if await current_version(engine) == latest_version():
+        return []
+    done = []
+    async with engine.connect() as conn:
+        await _lock(conn)
+        version = await conn.run_sync(lambda sync: _stored_version(sync) if inspect(sync).has_table("schema_version") else None)
+        if version is None:
+            done.append(await conn.run_sync(_adopt))
+        else:
+            for step, description, fn in MIGRATIONS:
+                if step > version:
+                    await conn.run_sync(fn)
+                    done.append(f"{step}: {description}")
+            if done:
+                await conn.run_sync(_stamp, latest_version())
+        await conn.commit()
+    return done
+
+async def reset(engine: AsyncEngine) -> List[str]:
+    # Drops every table, then builds the current schema
+    async with engine.begin() as conn:
+        await conn.run_sync(uninstall_search_index)
+        await conn.run_sync(Base.metadata.drop_all)
+    return await migrate(engine)
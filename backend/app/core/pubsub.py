@@ -0,0 +1,102 @@
+import asyncio
+import json
+import secrets
+from collections import deque
+from itertools import count
+from typing import Optional, Set, Tuple
+
+from fastapi import Request
+
+from app.core.config import settings
+
+Event = Tuple[int, str, dict]  # (sequence number, type, data)
+
+class Broadcaster:
+    # In-process fan-out of inventory changes to live clients (/api/events).
+    # Every subscriber gets its own bounded queue; publish never blocks. A
+    # subscriber that falls too far behind (or reconnects after events have
+    # left the history) gets a "resync" event and should refetch the list.
+    # Per worker: with several workers, a client only sees the changes made
+    # through the worker it is connected to. Event ids are "<stream>.<n>",
+    # with a stream token drawn when the worker starts, so a Last-Event-ID
+    # from another worker (or from before a restart) is never mistaken for
+    # one of ours: that reconnect gets a resync instead of a wrong replay.
+
+    def __init__(self, history: int, queue_size: int):
+        self.queue_size = queue_size
+        self.stream = secrets.token_hex(4)
+        self._subscribers: Set[asyncio.Queue] = set()
+        self._history: deque = deque(maxlen=history)
+        self._ids = count(1)
+        self.last_id = 0
+
+    def publish(self, kind: str, data: dict):
+        self.last_id = next(self._ids)
+        event = (self.last_id, kind, data)
+        self._history.append(event)
+        for queue in self._subscribers:
+            self._put(queue, event)
+
+    def _put(self, queue: asyncio.Queue, event: Event):
+        try:
+            queue.put_nowait(event)
+        except asyncio.QueueFull:
+            # Slow consumer: drop its backlog, one resync replaces it
+            while not queue.empty():
+                queue.get_nowait()
+            queue.put_nowait((event[0], "resync", {}))
+
+    def event_id(self, seq: int) -> str:
+        return f"{self.stream}.{seq}"
+
+    def _seq(self, event_id: str) -> Optional[int]:
+        # Our sequence number, or None for an id this stream didn't issue
+        stream, _, seq = event_id.partition(".")
+        return int(seq) if stream == self.stream and seq.isdigit() else None
+
+    def subscribe(self, last_event_id: Optional[str] = None) -> asyncio.Queue:
+        queue: asyncio.Queue = asyncio.Queue(maxsize=self.queue_size)
+        seq = self._seq(last_event_id) if last_event_id else None
+        if last_event_id and seq != self.last_id:
+            # Reconnect (EventSource sends Last-Event-ID): replay what it missed
+            # if the id is ours and the history still has all of it
+            oldest = self._history[0][0] if self._history else self.last_id + 1
+            if seq is not None and oldest <= seq + 1 <= self.last_id:
+                for event in self._history:
+                    if event[0] > seq:
+                        self._put(queue, event)
+            else:
+                queue.put_nowait((self.last_id, "resync", {}))
+        self._subscribers.add(queue)
+        return queue
+
+    def unsubscribe(self, queue: asyncio.Queue):
+        self._subscribers.discard(queue)
+
+    @property
+    def subscribers(self) -> int:
+        return len(self._subscribers)
+
+broadcaster = Broadcaster(settings.EVENTS_HISTORY, settings.EVENTS_QUEUE_SIZE)
+
+# --- SERVER-SENT EVENTS ---
+def format_sse(event: Event) -> str:
+    seq, kind, data = event
+    return f"id: {broadcaster.event_id(seq)}\nevent: {kind}\ndata: {json.dumps(data, separators=(',', ':'))}\n\n"
+
+async def sse_stream(request: Request, last_event_id: Optional[str] = None):
+    # Subscribes when the body starts, so a client gone before that leaves nothing behind
+    queue = broadcaster.subscribe(last_event_id)
+    try:
+        yield "retry: 3000\n\n"  # browser reconnect delay (ms)
+        while True:
+            try:
+                event = await asyncio.wait_for(queue.get(), settings.EVENTS_HEARTBEAT_SECONDS)
+            except asyncio.TimeoutError:
+                if await request.is_disconnected():
+                    break
+                yield ": ping\n\n"  # keeps proxies from closing an idle stream
+                continue
+            yield format_sse(event)
+    finally:
+        broadcaster.unsubscribe(queue)
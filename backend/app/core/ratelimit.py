@@ -0,0 +1,160 @@
+import json
+import math
+import re
+import time
+from abc import ABC, abstractmethod
+from typing import Optional
+
+from starlette.datastructures import Headers
+
+from app.core.cache import LRUCache
+from app.core.config import settings
+from app.core.security import user_id_from_authorization
+
+async def _reject(send, status_code: int, detail: str, retry_after: float):
+    body = json.dumps({"detail": detail}).encode()
+    await send({"type": "http.response.start", "status": status_code, "headers": [
+        (b"content-type", b"application/json"),
+        (b"content-length", str(len(body)).encode()),
+        (b"retry-after", str(max(1, math.ceil(retry_after))).encode()),
+    ]})
+    await send({"type": "http.response.body", "body": body})
+
+# --- TOKEN BUCKETS ---
+class RateLimitBackend(ABC):
+    # Where the buckets live. Async so a store shared by all workers (e.g. a
+    # local Redis-compatible server, with take() as a small script) can
+    # implement it; the default keeps them per process.
+
+    @abstractmethod
+    async def take(self, key: str, rate: float, burst: float) -> float:
+        # Takes one token from `key`'s bucket (refilled at `rate`/s, holding
+        # at most `burst`). Returns 0 if it had one, else seconds until it will.
+        ...
+
+class MemoryRateLimitBackend(RateLimitBackend):
+    def __init__(self, max_keys: int):
+        # A bucket left alone until it's full again is the same as no bucket,
+        # so entries expire then; the LRU bound caps memory under many IPs
+        self._buckets = LRUCache(max_keys, ttl=0)
+
+    async def take(self, key: str, rate: float, burst: float) -> float:
+        now = time.monotonic()
+        tokens, updated = self._buckets.get(key) or (burst, now)
+        tokens = min(burst, tokens + (now - updated) * rate)
+        if tokens < 1:
+            self._buckets.set(key, (tokens, now), ttl=(burst - tokens) / rate)
+            return (1 - tokens) / rate
+        tokens -= 1
+        self._buckets.set(key, (tokens, now), ttl=(burst - tokens) / rate)
+        return 0.0
+
+rate_limit_backend: RateLimitBackend = MemoryRateLimitBackend(settings.RATE_LIMIT_MAX_KEYS)
+
+# Budgets per route group, from RATE_LIMIT_<NAME>_PER_MINUTE / _BURST.
+# auth is per client IP (there's no user yet, and Argon2 is the expensive
+# part); browse is per user when signed in, else per IP.
+RATE_LIMITS = (
+    ("auth", "POST", re.compile(r"^/api/auth/(?:login|register)$")),
+    ("browse", "GET", re.compile(r"^/api/sweets/(?:|search|suggest|browse)$")),
+)
+
+class RateLimitMiddleware:
+    # 429 with Retry-After once a client's bucket for the route is empty.
+    # Purchases, checkout and admin writes have no budget here.
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        for name, method, pattern in RATE_LIMITS:
+            if scope["method"] == method and pattern.match(scope["path"]):
+                break
+        else:
+            return await self.app(scope, receive, send)
+
+        identity = await self._identity(scope, by_user=name != "auth")
+        prefix = f"RATE_LIMIT_{name.upper()}"
+        rate = getattr(settings, f"{prefix}_PER_MINUTE") / 60
+        wait = await rate_limit_backend.take(f"{name}:{identity}", rate, getattr(settings, f"{prefix}_BURST"))
+        if wait:
+            return await _reject(send, 429, "Too many requests", wait)
+        await self.app(scope, receive, send)
+
+    async def _identity(self, scope, by_user: bool) -> str:
+        if by_user:
+            user_id = await user_id_from_authorization(Headers(scope=scope).get("authorization", ""))
+            if user_id is not None:
+                return f"user:{user_id}"
+        # Behind a proxy, run uvicorn with --proxy-headers so this is the real client
+        client = scope.get("client")
+        return f"ip:{client[0] if client else 'unknown'}"
+
+# --- ADMISSION CONTROL ---
+HIGH, NORMAL, LOW = "high", "normal", "low"
+
+HIGH_PRIORITY = re.compile(r"^/api/(?:sweets/(?:checkout|\d+/purchase|\d+/restock)|reservations/(?:|confirm))$")
+LOW_PRIORITY = re.compile(r"^/api/(?:sweets|analytics)/")
+# Long-lived streams would hold a slot for as long as the client stays
+EXEMPT = re.compile(r"^/(?:api/events|metrics)$")
+
+def priority(method: str, path: str) -> Optional[str]:
+    if EXEMPT.match(path):
+        return None
+    if method == "POST" and HIGH_PRIORITY.match(path):
+        return HIGH
+    if method == "GET" and LOW_PRIORITY.match(path):
+        return LOW
+    return NORMAL
+
+class AdmissionController:
+    # Requests in flight per worker, with a lower ceiling the lower the
+    # priority: reads (list, search, analytics) are shed first, at
+    # ADMISSION_LOW_PRIORITY_IN_FLIGHT; everything else but sales at
+    # ADMISSION_MAX_IN_FLIGHT. Sales are always let in, so the slots between
+    # the two ceilings are effectively theirs.
+
+    def __init__(self):
+        self.in_flight = 0
+        self.shed = {LOW: 0, NORMAL: 0}
+
+    def admit(self, level: str) -> bool:
+        if level == LOW:
+            ceiling = settings.ADMISSION_LOW_PRIORITY_IN_FLIGHT
+        elif level == NORMAL:
+            ceiling = settings.ADMISSION_MAX_IN_FLIGHT
+        else:
+            ceiling = math.inf
+        if self.in_flight >= ceiling:
+            self.shed[level] += 1
+            return False
+        self.in_flight += 1
+        return True
+
+    def release(self):
+        self.in_flight -= 1
+
+admission = AdmissionController()
+
+class AdmissionMiddleware:
+    # 503 with Retry-After for requests over their priority's ceiling, before
+    # they reach a DB connection. Streamed responses hold their slot until the
+    # stream ends.
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        level = priority(scope["method"], scope["path"])
+        if level is None:
+            return await self.app(scope, receive, send)
+        if not admission.admit(level):
+            return await _reject(send, 503, "Server busy, please retry", 1)
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            admission.release()
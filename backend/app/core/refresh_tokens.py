@@ -0,0 +1,98 @@
+import hashlib
+import secrets
+import uuid
+from datetime import datetime, timedelta
+from typing import Optional, Tuple
+
+from sqlalchemy import delete, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.cache import LRUCache
+from app.core.config import settings
+from app.core.database import lock_for_write
+from app.models.refresh_token import RefreshToken
+from app.models.user import User
+
+# A refresh token is "<family>.<256 random bits>". The random part leaves
+# nothing to brute-force, so a plain sha256 is enough to store it, and
+# checking one costs microseconds instead of an Argon2 run.
+
+# Families revoked by this worker (logout, reuse), checked before the DB so a
+# replayed token is turned away without a query. Other workers go by the
+# revoked_at column.
+_revoked_families = LRUCache(settings.AUTH_CACHE_MAX_ENTRIES, settings.REFRESH_TOKEN_EXPIRE_DAYS * 86400)
+_pruned_at: Optional[datetime] = None
+
+class InvalidRefreshToken(Exception):
+    pass
+
+def hash_token(token: str) -> str:
+    return hashlib.sha256(token.encode()).hexdigest()
+
+def issue_refresh_token(db: AsyncSession, user_id: int, family: Optional[str] = None) -> str:
+    # Adds the row to the session; the caller commits
+    family = family or uuid.uuid4().hex
+    token = f"{family}.{secrets.token_urlsafe(32)}"
+    now = datetime.utcnow()
+    db.add(RefreshToken(
+        token_hash=hash_token(token),
+        family=family,
+        user_id=user_id,
+        created_at=now,
+        expires_at=now + timedelta(days=settings.REFRESH_TOKEN_EXPIRE_DAYS),
+    ))
+    return token
+
+async def _revoke_family(db: AsyncSession, family: str, now: datetime):
+    await db.execute(
+        update(RefreshToken).where(RefreshToken.family == family, RefreshToken.revoked_at.is_(None)).values(revoked_at=now)
+    )
+    _revoked_families.set(family, True)
+
+async def rotate_refresh_token(db: AsyncSession, token: str) -> Tuple[User, str]:
+    # Spends `token` and returns its user (as stored now, so role changes
+    # apply) and the token that replaces it. Commits.
+    #
+    # A token that was already spent means two parties hold the family (or a
+    # client retried a refresh whose answer it lost): every token in the
+    # family is revoked and the user has to log in again.
+    global _pruned_at
+    if _revoked_families.get(token.partition(".")[0]):
+        raise InvalidRefreshToken()
+    await lock_for_write(db)
+    # One indexed lookup for the token and its user
+    row = (await db.execute(
+        select(RefreshToken.id, RefreshToken.family, RefreshToken.expires_at, RefreshToken.revoked_at, User.id.label("user_id"), User.username, User.role)
+        .join(User, User.id == RefreshToken.user_id)
+        .where(RefreshToken.token_hash == hash_token(token))
+    )).first()
+    now = datetime.utcnow()
+    if row is None or row.expires_at <= now:
+        await db.rollback()
+        raise InvalidRefreshToken()
+
+    # Conditional, so two refreshes racing with the same token can't both win
+    spent = await db.execute(
+        update(RefreshToken).where(RefreshToken.id == row.id, RefreshToken.revoked_at.is_(None)).values(revoked_at=now)
+    )
+    if row.revoked_at is not None or spent.rowcount == 0:
+        await _revoke_family(db, row.family, now)
+        await db.commit()
+        raise InvalidRefreshToken()
+
+    new_token = issue_refresh_token(db, row.user_id, row.family)
+    if _pruned_at is None or now - _pruned_at > timedelta(hours=1):
+        # Expired rows are dropped here, at most once an hour per worker
+        await db.execute(delete(RefreshToken).where(RefreshToken.expires_at <= now))
+        _pruned_at = now
+    await db.commit()
+    # Detached, like the principals built from access tokens
+    return User(id=row.user_id, username=row.username, role=row.role), new_token
+
+async def revoke_refresh_token(db: AsyncSession, token: str):
+    # Logout: ends the token's whole family. Unknown tokens are ignored.
+    await lock_for_write(db)
+    family = await db.scalar(select(RefreshToken.family).where(RefreshToken.token_hash == hash_token(token)))
+    if family is not None:
+        await _revoke_family(db, family, datetime.utcnow())
+    await db.commit()
@@ -0,0 +1,163 @@
+import asyncio
+import heapq
+import time
+import uuid
+from typing import Dict, List, Optional, Tuple
+
+from app.core.catalog_snapshot import catalog_snapshot
+from app.core.config import settings
+from app.core.inventory import OutOfStock
+
+class Hold:
+    __slots__ = ("id", "user_id", "sweet_id", "amount", "expires_at")
+
+    def __init__(self, user_id: Optional[int], sweet_id: int, amount: int, expires_at: Optional[float]):
+        self.id = uuid.uuid4().hex
+        self.user_id = user_id
+        self.sweet_id = sweet_id
+        self.amount = amount
+        self.expires_at = expires_at  # unix time; None for a sale in progress
+
+class ReservationLedger:
+    # Stock set aside per sweet, in memory. Two running totals per sweet:
+    #   held     units in cart holds (TTL'd), which sales by anyone else must
+    #            leave alone: the sale's guarded UPDATE requires
+    #            quantity - held >= amount
+    #   claimed  units of sales running right now, so a new hold can't be
+    #            promised stock one of them is about to take
+    # Available-to-sell for a new hold is the catalog snapshot's quantity
+    # minus both, a couple of lookups and no query. Expired holds sit in a
+    # heap and are dropped together by one background sweep.
+    #
+    # Per process, like the write-behind counter: with several workers a hold
+    # only binds sales on the worker that took it.
+
+    def __init__(self):
+        self._holds: Dict[str, Hold] = {}
+        self._held: Dict[int, int] = {}
+        self._claimed: Dict[int, int] = {}
+        self._expiry: List[Tuple[float, str]] = []  # heap of (expires_at, hold id); stale ids skipped
+        self._wakeup: Optional[asyncio.Event] = None
+        self._task: Optional[asyncio.Task] = None
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    def start(self):
+        if not self.running:
+            self._wakeup = asyncio.Event()
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self.running:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+        self._task = None
+
+    # --- QUERIES ---
+    def held(self, sweet_id: int) -> int:
+        return self._held.get(sweet_id, 0)
+
+    def available(self, sweet_id: int) -> Optional[int]:
+        # None when the snapshot doesn't know the sweet
+        quantity = catalog_snapshot.quantity(sweet_id)
+        if quantity is None:
+            return None
+        return max(0, quantity - self._held.get(sweet_id, 0) - self._claimed.get(sweet_id, 0))
+
+    def get(self, hold_id: str) -> Optional[Hold]:
+        hold = self._holds.get(hold_id)
+        if hold is None or hold.expires_at is None or hold.expires_at <= time.time():
+            return None  # claimed by a sale, or expired and not swept yet
+        return hold
+
+    def for_user(self, user_id: int) -> List[Hold]:
+        now = time.time()
+        return [
+            hold for hold in self._holds.values()
+            if hold.user_id == user_id and hold.expires_at is not None and hold.expires_at > now
+        ]
+
+    # --- CHANGES ---
+    @staticmethod
+    def _bump(totals: Dict[int, int], sweet_id: int, delta: int):
+        left = totals.get(sweet_id, 0) + delta
+        if left:
+            totals[sweet_id] = left
+        else:
+            del totals[sweet_id]
+
+    def hold(self, user_id: int, sweet_id: int, amount: int, ttl: float) -> Hold:
+        # Raises OutOfStock if fewer than `amount` units are available. No
+        # await in here, so nothing can slip in between check and bookkeeping.
+        self.expire()  # cheap when nothing is due
+        available = self.available(sweet_id)
+        if available is not None and available < amount:
+            raise OutOfStock([sweet_id])
+        hold = Hold(user_id, sweet_id, amount, time.time() + ttl)
+        self._holds[hold.id] = hold
+        self._bump(self._held, sweet_id, amount)
+
+        earliest = not self._expiry or hold.expires_at < self._expiry[0][0]
+        heapq.heappush(self._expiry, (hold.expires_at, hold.id))
+        self.start()
+        if earliest:
+            self._wakeup.set()  # the sweeper is sleeping until a later expiry
+        return hold
+
+    def claim(self, wanted: Dict[int, int]) -> List[Hold]:
+        # For a sale about to run: counts its units until release()
+        claims = []
+        for sweet_id, amount in wanted.items():
+            claim = Hold(None, sweet_id, amount, None)
+            self._holds[claim.id] = claim
+            self._bump(self._claimed, sweet_id, amount)
+            claims.append(claim)
+        return claims
+
+    def take(self, hold: Hold) -> Hold:
+        # A cart hold being confirmed becomes its sale's claim: the sale may
+        # use these units, and its heap entry is skipped from now on
+        self._bump(self._held, hold.sweet_id, -hold.amount)
+        self._bump(self._claimed, hold.sweet_id, hold.amount)
+        hold.expires_at = None
+        return hold
+
+    def release(self, *holds: Hold):
+        for hold in holds:
+            if self._holds.pop(hold.id, None) is not None:
+                self._bump(self._claimed if hold.expires_at is None else self._held, hold.sweet_id, -hold.amount)
+
+    def forget_sweet(self, sweet_id: int):
+        # Deleted sweet: its holds go with it
+        self.release(*[hold for hold in self._holds.values() if hold.sweet_id == sweet_id and hold.expires_at is not None])
+
+    def expire(self, now: Optional[float] = None) -> int:
+        # Drops every hold that has run out, in one pass over the heap's head
+        now = time.time() if now is None else now
+        expired = []
+        while self._expiry and self._expiry[0][0] <= now:
+            _, hold_id = heapq.heappop(self._expiry)
+            hold = self._holds.get(hold_id)
+            if hold is not None and hold.expires_at is not None:  # not released or taken meanwhile
+                expired.append(hold)
+        self.release(*expired)
+        return len(expired)
+
+    async def _run(self):
+        while True:
+            delay = settings.RESERVATION_SWEEP_SECONDS
+            if self._expiry:
+                delay = min(delay, max(0.0, self._expiry[0][0] - time.time()))
+            self._wakeup.clear()
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=delay)
+            except asyncio.TimeoutError:
+                pass
+            self.expire()
+
+reservation_ledger = ReservationLedger()
@@ -0,0 +1,35 @@
+import json
+from datetime import date, datetime, time
+from typing import Any
+
+from fastapi.responses import JSONResponse
+
+try:
+    import orjson
+except ImportError:  # optional speedup; the stdlib encoder gives the same JSON, slower
+    orjson = None
+
+def _isoformat(value: Any) -> str:
+    # orjson's (and FastAPI's) datetime format: "2024-05-01T12:30:00.250000", not str()'s space
+    if isinstance(value, (datetime, date, time)):
+        return value.isoformat()
+    raise TypeError(f"Type is not JSON serializable: {type(value).__name__}")
+
+def dumps(content: Any) -> bytes:
+    # Compact UTF-8 JSON. orjson is several times faster than json.dumps on
+    # large row lists and handles datetimes itself.
+    if orjson is not None:
+        return orjson.dumps(content)
+    return json.dumps(content, ensure_ascii=False, separators=(",", ":"), default=_isoformat).encode()
+
+def plain_rows(result) -> list:
+    # Dicts zipped straight from the row tuples: no ORM entities, no RowMapping
+    # per row, no model validation
+    keys = list(result.keys())
+    return [dict(zip(keys, row)) for row in result]  # Row is a tuple
+
+class FastJSONResponse(JSONResponse):
+    # For handlers that return plain dicts/lists they built themselves; skips
+    # FastAPI's response_model revalidation when returned directly
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
@@ -0,0 +1,93 @@
+import re
+from typing import Optional
+
+from sqlalchemy import Float, Integer, func, inspect, text
+from sqlalchemy.engine import Connection
+
+from app.models.sweet import Sweet
+
+# --- INDEX DDL ---
+# SQLite: external-content FTS5 table over sweets(name, category), kept in sync
+# by triggers. prefix='2 3' adds prefix indexes so "ch"/"cho" lookups don't
+# scan the whole term list. Quantity-only updates (purchases) don't touch it.
+SQLITE_FTS_TABLE = """
+CREATE VIRTUAL TABLE sweets_fts USING fts5(
+    name, category, content='sweets', content_rowid='id', prefix='2 3'
+)
+"""
+
+SQLITE_FTS_TRIGGERS = [
+    """
+    CREATE TRIGGER IF NOT EXISTS sweets_fts_ai AFTER INSERT ON sweets BEGIN
+        INSERT INTO sweets_fts(rowid, name, category) VALUES (new.id, new.name, new.category);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS sweets_fts_ad AFTER DELETE ON sweets BEGIN
+        INSERT INTO sweets_fts(sweets_fts, rowid, name, category) VALUES ('delete', old.id, old.name, old.category);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS sweets_fts_au AFTER UPDATE OF name, category ON sweets BEGIN
+        INSERT INTO sweets_fts(sweets_fts, rowid, name, category) VALUES ('delete', old.id, old.name, old.category);
+        INSERT INTO sweets_fts(rowid, name, category) VALUES (new.id, new.name, new.category);
+    END
+    """,
+]
+
+# Postgres: trigram GIN indexes make ILIKE '%...%' an index lookup
+POSTGRES_DDL = [
+    "CREATE EXTENSION IF NOT EXISTS pg_trgm",
+    "CREATE INDEX IF NOT EXISTS ix_sweets_name_trgm ON sweets USING gin (name gin_trgm_ops)",
+    "CREATE INDEX IF NOT EXISTS ix_sweets_category_trgm ON sweets USING gin (category gin_trgm_ops)",
+]
+
+def install_search_index(conn: Connection):
+    # Idempotent; run with `await conn.run_sync(install_search_index)` after create_all.
+    # Also covers databases whose sweets table predates these indexes.
+    for index in Sweet.__table__.indexes:
+        index.create(conn, checkfirst=True)
+
+    if conn.dialect.name == "sqlite":
+        if not inspect(conn).has_table("sweets_fts"):
+            conn.exec_driver_sql(SQLITE_FTS_TABLE)
+            # Index whatever is already in the table
+            conn.exec_driver_sql("INSERT INTO sweets_fts(sweets_fts) VALUES ('rebuild')")
+        for trigger in SQLITE_FTS_TRIGGERS:
+            conn.exec_driver_sql(trigger)
+    elif conn.dialect.name == "postgresql":
+        for statement in POSTGRES_DDL:
+            conn.exec_driver_sql(statement)
+
+def uninstall_search_index(conn: Connection):
+    # Before drop_all: the FTS table isn't in the metadata. Triggers and the
+    # Postgres indexes go with the sweets table.
+    if conn.dialect.name == "sqlite":
+        conn.exec_driver_sql("DROP TABLE IF EXISTS sweets_fts")
+
+# --- QUERIES ---
+def _fts_terms(column: str, value: str) -> list:
+    # "choc la" -> name : "choc"* AND name : "la"*  (every word, as a prefix)
+    return [f'{column} : "{token}"*' for token in re.findall(r"\w+", value.lower())]
+
+def apply_text_search(query, dialect: str, name: Optional[str], category: Optional[str]):
+    # Adds the name/category filters to a select(Sweet...) query, best match first
+    if dialect == "sqlite":
+        terms = _fts_terms("name", name or "") + _fts_terms("category", category or "")
+        if not terms:
+            return query
+        fts = (
+            text("SELECT rowid AS id, bm25(sweets_fts) AS rank FROM sweets_fts WHERE sweets_fts MATCH :match")
+            .bindparams(match=" AND ".join(terms))
+            .columns(id=Integer, rank=Float)
+            .subquery("fts")
+        )
+        return query.join(fts, fts.c.id == Sweet.id).order_by(fts.c.rank)
+
+    if name:
+        query = query.where(Sweet.name.ilike(f"%{name}%"))
+    if category:
+        query = query.where(Sweet.category.ilike(f"%{category}%"))
+    if dialect == "postgresql" and name:
+        query = query.order_by(func.similarity(Sweet.name, name).desc())
+    return query
@@ -1,17 +1,37 @@
+import asyncio
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
-from typing import Optional
+from typing import List, Optional, Tuple
 from jose import JWTError, jwt
 from passlib.context import CryptContext
 from fastapi import Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
+from sqlalchemy import delete, insert
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.future import select
-from app.core.database import get_db
+from app.core.database import SessionLocal, get_db
+from app.models.token_revocation import TokenRevocation
 from app.models.user import User
 from app.core.config import settings
+from app.core.cache import LRUCache
+from app.core.metrics import observe_hashing
 
-# Setup password hashing
-pwd_context = CryptContext(schemes=["argon2"], deprecated="auto")
+# Setup password hashing. Only the costs set in Settings are pinned; hashes
+# made with other values count as outdated, and login rehashes them (see
+# verify_password_async).
+_argon2_costs = {
+    "argon2__rounds": settings.ARGON2_TIME_COST,
+    "argon2__memory_cost": settings.ARGON2_MEMORY_COST,
+    "argon2__parallelism": settings.ARGON2_PARALLELISM,
+}
+pwd_context = CryptContext(
+    schemes=["argon2"],
+    deprecated="auto",
+    **{option: value for option, value in _argon2_costs.items() if value is not None},
+)
 
 # Setup OAuth2
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/api/auth/login")
@@ -22,6 +42,56 @@ def verify_password(plain_password, hashed_password):
 def get_password_hash(password):
     return pwd_context.hash(password)
 
+# --- ASYNC HASHING ---
+# Argon2 holds a core for tens of milliseconds (and releases the GIL), so
+# request handlers run it on a small dedicated pool instead of the event loop.
+# Past PASSWORD_HASH_MAX_PENDING queued jobs, new ones are refused with 503
+# rather than letting a login burst pile up behind the pool.
+def _lower_hashing_priority():
+    # On Linux threads have their own nice value: let request handling win the
+    # CPU over hashing when cores are scarce
+    try:
+        os.setpriority(os.PRIO_PROCESS, threading.get_native_id(), settings.PASSWORD_HASH_NICE)
+    except (AttributeError, OSError):
+        pass
+
+_hash_pool = ThreadPoolExecutor(
+    max_workers=settings.PASSWORD_HASH_WORKERS,
+    thread_name_prefix="argon2",
+    initializer=_lower_hashing_priority,
+)
+_hash_pending = 0
+
+def _timed(fn, *args):
+    # Runs on the pool thread: measures Argon2 alone, not the wait for a thread
+    start = time.perf_counter()
+    return fn(*args), time.perf_counter() - start
+
+async def _run_hashing(fn, *args):
+    global _hash_pending
+    if _hash_pending >= settings.PASSWORD_HASH_MAX_PENDING:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Server busy, please retry",
+            headers={"Retry-After": "1"},
+        )
+    _hash_pending += 1
+    try:
+        result, elapsed = await asyncio.get_running_loop().run_in_executor(_hash_pool, _timed, fn, *args)
+        if settings.METRICS_ENABLED:
+            observe_hashing(fn.__name__, elapsed)
+        return result
+    finally:
+        _hash_pending -= 1
+
+async def get_password_hash_async(password: str) -> str:
+    return await _run_hashing(pwd_context.hash, password)
+
+async def verify_password_async(plain_password: str, hashed_password: str) -> Tuple[bool, Optional[str]]:
+    # Returns (verified, new_hash). new_hash is set when the stored hash used
+    # different cost parameters; the caller should save it.
+    return await _run_hashing(pwd_context.verify_and_update, plain_password, hashed_password)
+
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     to_encode = data.copy()
     if expires_delta:
@@ -29,10 +99,76 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     else:
         expire = datetime.utcnow() + timedelta(minutes=settings.ACCESS_TOKEN_EXPIRE_MINUTES)
     
-    to_encode.update({"exp": expire})
+    # Sub-second iat (JWT allows fractional NumericDates) so invalidate_user
+    # can tell a token minted just before a role change from one just after
+    to_encode.update({"exp": expire, "iat": time.time()})
     encoded_jwt = jwt.encode(to_encode, settings.SECRET_KEY, algorithm=settings.ALGORITHM)
     return encoded_jwt
 
+# --- PRINCIPAL CACHE ---
+# Tokens are signed and carry sub/uid/role, so a verified token is enough to
+# build the principal: protected routes do no auth DB I/O. Decoded tokens are
+# cached to skip the signature check on repeat requests.
+_principals = LRUCache(settings.AUTH_CACHE_MAX_ENTRIES, settings.AUTH_CACHE_TTL_SECONDS)
+# username -> (id, role), only for older tokens minted without uid/role claims
+_user_records = LRUCache(settings.AUTH_CACHE_MAX_ENTRIES, settings.AUTH_CACHE_TTL_SECONDS)
+# username -> unix time; tokens issued before it must log in again
+_revoked_before: dict = {}
+
+def invalidate_user(username: str, revoked_at: Optional[float] = None):
+    # Call when a user's role (or anything else baked into tokens) changes.
+    # Their existing tokens stop working in this process straight away, so
+    # the next login picks up the new role; record_revocations tells the
+    # other workers.
+    now = time.time()
+    horizon = now - settings.ACCESS_TOKEN_EXPIRE_MINUTES * 60
+    for name, before in list(_revoked_before.items()):
+        if before < horizon:  # every token from before this has expired anyway
+            del _revoked_before[name]
+    _revoked_before[username] = max(_revoked_before.get(username, 0), revoked_at or now)
+    _user_records.delete(username)
+
+def _is_revoked(username: str, issued_at: float) -> bool:
+    return issued_at < _revoked_before.get(username, 0)
+
+# --- SHARED REVOCATIONS ---
+# invalidate_user only reaches this process. Writers also add a
+# token_revocations row in the transaction that makes the change, and every
+# worker pulls recent rows at most once per AUTH_REVOCATION_POLL_SECONDS (one
+# indexed query, triggered from get_current_user), so old tokens stop working
+# everywhere within that time. Requests in between still do no auth DB I/O.
+_revocations_polled = 0.0  # monotonic
+_revocations_since = 0.0  # the next poll reads rows newer than this; 0 = all of them
+# Rows are re-read for this long after they are written, so one committed
+# late (or stamped by a host with a slightly slow clock) isn't skipped
+REVOCATION_LOOKBACK_SECONDS = 60
+
+async def record_revocations(db: AsyncSession, usernames: List[str]) -> float:
+    # In the caller's transaction, after its lock_for_write; returns the
+    # revocation time to pass to invalidate_user once it has committed
+    now = time.time()
+    if usernames:
+        await db.execute(insert(TokenRevocation), [{"username": name, "revoked_at": now} for name in usernames])
+        await db.execute(delete(TokenRevocation).where(
+            TokenRevocation.revoked_at < now - settings.ACCESS_TOKEN_EXPIRE_MINUTES * 60 - REVOCATION_LOOKBACK_SECONDS
+        ))
+    return now
+
+async def _pull_revocations():
+    global _revocations_polled, _revocations_since
+    now = time.monotonic()
+    if now - _revocations_polled < settings.AUTH_REVOCATION_POLL_SECONDS:
+        return
+    _revocations_polled = now  # before the await: one poll at a time
+    since, _revocations_since = _revocations_since, time.time() - REVOCATION_LOOKBACK_SECONDS
+    async with SessionLocal() as db:
+        result = await db.execute(
+            select(TokenRevocation.username, TokenRevocation.revoked_at).where(TokenRevocation.revoked_at > since)
+        )
+        for username, revoked_at in result.all():
+            if revoked_at > _revoked_before.get(username, 0):
+                invalidate_user(username, revoked_at)
+
 # --- DEPENDENCIES ---
 
 async def get_current_user(token: str = Depends(oauth2_scheme), db: AsyncSession = Depends(get_db)) -> User:
@@ -41,6 +177,14 @@ async def get_current_user(token: str = Depends(oauth2_scheme), db: AsyncSession
         detail="Could not validate credentials",
         headers={"WWW-Authenticate": "Bearer"},
     )
+    await _pull_revocations()
+    cached = _principals.get(token)
+    if cached is not None:
+        user, issued_at = cached
+        if _is_revoked(user.username, issued_at):
+            raise credentials_exception
+        return user
+
     try:
         payload = jwt.decode(token, settings.SECRET_KEY, algorithms=[settings.ALGORITHM])
         username: str = payload.get("sub")
@@ -48,19 +192,46 @@ async def get_current_user(token: str = Depends(oauth2_scheme), db: AsyncSession
             raise credentials_exception
     except JWTError:
         raise credentials_exception
-    
-    # Use await db.execute(select(...)) for async query
-    result = await db.execute(select(User).where(User.username == username))
-    user = result.scalars().first()
-    
-    if user is None:
+
+    issued_at = payload.get("iat", 0)
+    if _is_revoked(username, issued_at):
         raise credentials_exception
+
+    user_id, role = payload.get("uid"), payload.get("role")
+    if user_id is None or role is None:
+        # Token predates the uid/role claims: look the user up (cached)
+        record = _user_records.get(username)
+        if record is None:
+            result = await db.execute(select(User.id, User.role).where(User.username == username))
+            record = result.first()
+            if record is None:
+                raise credentials_exception
+            _user_records.set(username, tuple(record))
+        user_id, role = record
+
+    # Detached principal built from the claims; never added to a session
+    user = User(id=user_id, username=username, role=role)
+    ttl = min(settings.AUTH_CACHE_TTL_SECONDS, payload["exp"] - time.time())
+    _principals.set(token, (user, issued_at), ttl=ttl)
     return user
 
 async def get_current_admin(current_user: User = Depends(get_current_user)) -> User:
-    if current_user.role != "admin":
+    if current_user.role not in ["admin", "superadmin"]:
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN, 
             detail="Admin privileges required"
         )
-    return current_user
\ No newline at end of file
+    return current_user
+
+async def user_id_from_authorization(authorization: str) -> Optional[int]:
+    # For middleware, which runs before dependencies: the signed-in user's id
+    # from an Authorization header, or None. Same check as the handlers (and
+    # the same principal cache).
+    scheme, _, token = authorization.partition(" ")
+    if scheme.lower() != "bearer" or not token:
+        return None
+    try:
+        async with SessionLocal() as db:
+            return (await get_current_user(token, db)).id
+    except HTTPException:
+        return None
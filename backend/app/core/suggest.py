@@ -0,0 +1,105 @@
+import asyncio
+import re
+import time
+from bisect import bisect_left, insort
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy import select
+
+from app.core.config import settings
+from app.core.database import SessionLocal
+from app.models.sweet import Sweet
+
+def _words(*values: Optional[str]) -> List[str]:
+    return [word for value in values if value for word in re.findall(r"\w+", value.lower())]
+
+class PrefixIndex:
+    # Sorted array of (word, sweet_id) for every word in each sweet's name and
+    # category. A prefix lookup is a bisect plus a short forward scan, no DB.
+    # Lives in one worker's memory: local writes update it immediately, writes
+    # made by other workers show up after SUGGEST_REFRESH_SECONDS.
+
+    def __init__(self):
+        self._keys: List[Tuple[str, int]] = []
+        self._sweets: Dict[int, Tuple[str, Optional[str]]] = {}
+        self._loaded_at: Optional[float] = None
+        self._refreshing: Optional[asyncio.Task] = None
+        self._generation = 0  # bumped by every local change; see load()
+
+    @property
+    def ready(self) -> bool:
+        return self._loaded_at is not None
+
+    def rebuild(self, rows):
+        sweets = {sweet_id: (name, category) for sweet_id, name, category in rows}
+        self._keys = sorted((word, sweet_id) for sweet_id, (name, category) in sweets.items() for word in set(_words(name, category)))
+        self._sweets = sweets
+        self._loaded_at = time.monotonic()
+
+    async def load(self):
+        # Rows read before a local add/remove/invalidate landed would undo it,
+        # so they are dropped: a background refresh keeps the patched index
+        # and tries again next time, a first load reads again
+        while True:
+            generation = self._generation
+            async with SessionLocal() as db:
+                rows = (await db.execute(select(Sweet.id, Sweet.name, Sweet.category))).all()
+            if generation == self._generation:
+                self.rebuild(rows)
+                return
+            if self.ready:
+                return
+
+    def invalidate(self):
+        # Bulk changes: cheaper to reload everything on next use than patch row by row
+        self._generation += 1
+        self._loaded_at = None
+
+    async def ensure_fresh(self):
+        if not self.ready:
+            await self.load()
+        elif time.monotonic() - self._loaded_at > settings.SUGGEST_REFRESH_SECONDS and not self._refreshing:
+            # Keep answering from the current index while a reload runs
+            self._refreshing = asyncio.create_task(self.load())
+            self._refreshing.add_done_callback(lambda _: setattr(self, "_refreshing", None))
+
+    def add(self, sweet_id: int, name: str, category: Optional[str]):
+        self.remove(sweet_id)  # bumps _generation
+        self._sweets[sweet_id] = (name, category)
+        for word in set(_words(name, category)):
+            insort(self._keys, (word, sweet_id))
+
+    def remove(self, sweet_id: int):
+        self._generation += 1
+        old = self._sweets.pop(sweet_id, None)
+        if old is None:
+            return
+        for word in set(_words(*old)):
+            i = bisect_left(self._keys, (word, sweet_id))
+            if i < len(self._keys) and self._keys[i] == (word, sweet_id):
+                del self._keys[i]
+
+    def lookup(self, query: str, limit: int = 10) -> List[dict]:
+        # Every query word must prefix some word of the sweet ("dark ch" ->
+        # "Dark Chocolate"). Scan on the first word, check the rest.
+        first, *rest = _words(query) or [""]
+        if not first:
+            return []
+
+        matches, seen = [], set()
+        i = bisect_left(self._keys, (first,))
+        while i < len(self._keys) and len(matches) < limit:
+            word, sweet_id = self._keys[i]
+            if not word.startswith(first):
+                break
+            i += 1
+            if sweet_id in seen:
+                continue
+            seen.add(sweet_id)
+            name, category = self._sweets[sweet_id]
+            words = _words(name, category)
+            if all(any(w.startswith(part) for w in words) for part in rest):
+                matches.append({"id": sweet_id, "name": name})
+        return matches
+
+suggest_index = PrefixIndex()
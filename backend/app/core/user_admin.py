@@ -0,0 +1,186 @@
+import os
+from concurrent.futures import Executor, ProcessPoolExecutor
+from itertools import islice
+from typing import BinaryIO, Callable, Dict, Iterable, List, Optional
+
+from sqlalchemy import delete, insert, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.database import lock_for_write
+from app.core.inventory_import import iter_rows
+from app.core.security import invalidate_user, pwd_context, record_revocations
+from app.models.refresh_token import RefreshToken
+from app.models.user import User
+
+# Bulk user administration, for manage.py and the role endpoint.
+
+ROLES = ("customer", "worker", "admin", "superadmin")
+
+# Rows per INSERT/UPDATE, and per IN (...) lookup (kept under SQLite's
+# variable limit)
+BATCH_SIZE = 500
+
+def _chunks(items: Iterable, size: int):
+    items = iter(items)
+    while chunk := list(islice(items, size)):
+        yield chunk
+
+# --- PROVISIONING ---
+class ProvisionReport:
+    __slots__ = ("read", "created", "skipped", "failed", "errors")
+
+    def __init__(self):
+        self.read = 0
+        self.created = 0  # or, on a dry run, would be created
+        self.skipped = 0  # already exists, or repeated in the file
+        self.failed = 0
+        self.errors: List[str] = []
+
+def _hash(password: str) -> str:
+    # Runs in the pool's processes. Argon2 releases the GIL, but a process
+    # pool also spreads passlib's own Python work over the cores.
+    return pwd_context.hash(password)
+
+def hashing_pool(workers: Optional[int] = None) -> Executor:
+    return ProcessPoolExecutor(max_workers=workers or os.cpu_count())
+
+async def _existing(db: AsyncSession, usernames: List[str]) -> set:
+    return set(await db.scalars(select(User.username).where(User.username.in_(usernames))))
+
+async def provision_users(
+    db: AsyncSession,
+    fileobj: BinaryIO,
+    fmt: str,
+    default_role: str = "worker",
+    pool: Optional[Executor] = None,
+    batch_size: int = BATCH_SIZE,
+    dry_run: bool = False,
+    progress: Optional[Callable[[ProvisionReport], None]] = None,
+) -> ProvisionReport:
+    # Creates the users in a CSV/NDJSON roster (username, password, optional
+    # role). Existing usernames are left alone, so a roster can be re-run
+    # after adding people to it. One commit per batch: a failure part way
+    # through keeps the batches before it.
+    #
+    # Each batch is looked up first so known users cost no hashing, hashed
+    # across `pool`, then inserted in one executemany under the write lock
+    # (taken after hashing, so it's held for milliseconds, not seconds).
+    # Without a pool, hashing runs inline: fine for a handful of users.
+    report = ProvisionReport()
+    seen = set()
+    for chunk in _chunks(iter_rows(fileobj, fmt), batch_size):
+        rows = []
+        for row_no, data in chunk:
+            report.read += 1
+            if isinstance(data, Exception):
+                report.failed += 1
+                report.errors.append(f"row {row_no}: {data}")
+                continue
+            username = str(data.get("username") or "").strip()
+            password = str(data.get("password") or "")
+            role = str(data.get("role") or default_role).strip()
+            if not username or not password:
+                problem = "username and password are required"
+            elif role not in ROLES:
+                problem = f"unknown role {role!r}"
+            else:
+                problem = None
+            if problem:
+                report.failed += 1
+                report.errors.append(f"row {row_no}: {problem}")
+            elif username in seen:
+                report.skipped += 1
+            else:
+                seen.add(username)
+                rows.append((username, password, role))
+
+        if rows:
+            existing = await _existing(db, [row[0] for row in rows])
+            await db.commit()  # end the read; the write below takes the lock
+            rows = [row for row in rows if row[0] not in existing]
+            report.skipped += len(existing)
+
+        if rows and not dry_run:
+            passwords = [row[1] for row in rows]
+            if pool is None:
+                hashes = [_hash(password) for password in passwords]
+            else:
+                hashes = list(pool.map(_hash, passwords, chunksize=max(1, len(rows) // 32)))
+            await lock_for_write(db)
+            # Someone may have registered meanwhile
+            taken = await _existing(db, [row[0] for row in rows])
+            values = [
+                {"username": username, "hashed_password": hashed, "role": role}
+                for (username, _, role), hashed in zip(rows, hashes) if username not in taken
+            ]
+            if values:
+                await db.execute(insert(User), values)
+            await db.commit()
+            report.skipped += len(taken)
+            report.created += len(values)
+        else:
+            report.created += len(rows)
+        if progress:
+            progress(report)
+    return report
+
+# --- ROLES ---
+class SuperadminsProtected(Exception):
+    def __init__(self, usernames: List[str]):
+        super().__init__(usernames)
+        self.usernames = usernames
+
+async def set_roles(
+    db: AsyncSession, usernames: List[str], role: str, dry_run: bool = False, acting_role: Optional[str] = None
+) -> Dict[str, List[str]]:
+    # One transaction for the lot. Users whose role changed have their access
+    # tokens revoked: here at once, on other workers within
+    # AUTH_REVOCATION_POLL_SECONDS (see record_revocations).
+    # `acting_role`: the caller's, for the API. Unless it is superadmin,
+    # touching a current superadmin raises SuperadminsProtected and nothing
+    # is changed. None (manage.py) skips the check.
+    await lock_for_write(db)
+    report = {"updated": [], "unchanged": [], "missing": []}
+    usernames = list(dict.fromkeys(usernames))
+    for chunk in _chunks(usernames, BATCH_SIZE):
+        current = dict((await db.execute(select(User.username, User.role).where(User.username.in_(chunk)))).all())
+        if acting_role not in (None, "superadmin"):
+            protected = [name for name in chunk if current.get(name) == "superadmin"]
+            if protected:
+                await db.rollback()
+                raise SuperadminsProtected(protected)
+        changed = [name for name in chunk if name in current and current[name] != role]
+        if changed:
+            await db.execute(update(User).where(User.username.in_(changed)).values(role=role))
+        for name in chunk:
+            key = "missing" if name not in current else "updated" if current[name] != role else "unchanged"
+            report[key].append(name)
+    if dry_run:
+        await db.rollback()
+        return report
+    revoked_at = await record_revocations(db, report["updated"])
+    await db.commit()
+    for name in report["updated"]:
+        invalidate_user(name, revoked_at)
+    return report
+
+async def delete_users(db: AsyncSession, usernames: List[str], dry_run: bool = False) -> List[str]:
+    # Returns the usernames that existed. Their refresh tokens go too, and
+    # their access tokens are revoked like on a role change.
+    await lock_for_write(db)
+    deleted = []
+    for chunk in _chunks(dict.fromkeys(usernames), BATCH_SIZE):
+        users = (await db.execute(select(User.id, User.username).where(User.username.in_(chunk)))).all()
+        if users:
+            ids = [user.id for user in users]
+            await db.execute(delete(RefreshToken).where(RefreshToken.user_id.in_(ids)))
+            await db.execute(delete(User).where(User.id.in_(ids)))
+            deleted += [user.username for user in users]
+    if dry_run:
+        await db.rollback()
+        return deleted
+    revoked_at = await record_revocations(db, deleted)
+    await db.commit()
+    for name in deleted:
+        invalidate_user(name, revoked_at)
+    return deleted
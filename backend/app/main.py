@@ -1,17 +1,59 @@
-from fastapi import FastAPI
+from fastapi import FastAPI, Request
+from fastapi.responses import StreamingResponse, PlainTextResponse
 from fastapi.middleware.cors import CORSMiddleware  # <--- Import this
 from contextlib import asynccontextmanager
-from app.core.database import engine, Base
-from app.api.v1 import auth, sweets
+from app.core.database import engine
+from app.core.migrations import migrate
+from app.core.suggest import suggest_index
+from app.core.catalog_snapshot import catalog_snapshot
+from app.core.config import settings
+from app.core.inventory import inventory_writer
+from app.core.reservations import reservation_ledger
+from app.core.analytics import rollup_updater
+from app.core.pubsub import sse_stream
+from app.core.idempotency import IdempotencyMiddleware
+from app.core.compression import CompressionMiddleware
+from app.core.ratelimit import AdmissionMiddleware, RateLimitMiddleware
+from app.core import metrics
+from app.api.v1 import auth, sweets, analytics, reservations
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
-    async with engine.begin() as conn:
-        await conn.run_sync(Base.metadata.create_all)
+    # One version read when the schema is current; otherwise the first worker
+    # to get the lock migrates and the rest wait for it, then carry on
+    await migrate(engine)
+    # Typeahead index for /api/sweets/suggest
+    await suggest_index.load()
+    # Column arrays behind /api/sweets/browse
+    await catalog_snapshot.load()
+    if settings.INVENTORY_WRITE_BEHIND:
+        # Group-commits purchases/restocks (see app/core/inventory.py)
+        inventory_writer.start()
+    # Releases expired cart holds
+    reservation_ledger.start()
+    # Folds new sales into the analytics rollups
+    rollup_updater.start()
     yield
+    await reservation_ledger.stop()
+    await inventory_writer.stop()  # flush sales still waiting for their batch
+    await rollup_updater.stop()  # after the writer, so its last batch is counted
 
 app = FastAPI(title="Sweet Shop Management System", lifespan=lifespan)
 
+# Replays retried writes sent with an Idempotency-Key (inside CORS, so replays get CORS headers too)
+app.add_middleware(IdempotencyMiddleware)
+
+if settings.COMPRESSION_ENABLED:
+    # Outside idempotency, so recorded responses are stored uncompressed and
+    # compressed per client on replay
+    app.add_middleware(CompressionMiddleware)
+
+# Sheds reads before they can crowd out sales (see app/core/ratelimit.py)
+app.add_middleware(AdmissionMiddleware)
+if settings.RATE_LIMIT_ENABLED:
+    # Outside admission control: a client over its budget shouldn't take a slot
+    app.add_middleware(RateLimitMiddleware)
+
 # --- ADD THIS BLOCK ---
 app.add_middleware(
     CORSMiddleware,
@@ -19,11 +61,44 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],  # Allow all methods (POST, GET, etc)
     allow_headers=["*"],  # Allow all headers
+    expose_headers=["X-Next-After", "ETag", "Idempotent-Replayed"],  # Pagination cursor and cache validator for GET /api/sweets/
 )
 # ----------------------
 
+if settings.METRICS_ENABLED:
+    # Outermost, so its latency covers CORS and idempotency replays too
+    app.add_middleware(metrics.MetricsMiddleware)
+
 app.include_router(auth.router, prefix="/api/auth", tags=["Auth"])
 app.include_router(sweets.router, prefix="/api/sweets", tags=["Sweets"])
+app.include_router(analytics.router, prefix="/api/analytics", tags=["Analytics"])
+app.include_router(reservations.router, prefix="/api/reservations", tags=["Reservations"])
+
+# --- LIVE INVENTORY (Server-Sent Events) ---
+@app.get("/api/events")
+async def inventory_events(request: Request):
+    # One long-lived stream per client instead of refetching the list after
+    # every change. Event types:
+    #   stock     {id, quantity}          after purchase/checkout/restock
+    #   sweet     full sweet              after create/edit
+    #   delete    {id}
+    #   low_stock {id, name, quantity, threshold}
+    #   resync    {}                      refetch /api/sweets/ (bulk import, lag, missed events)
+    # Public like GET /api/sweets/; EventSource can't send an Authorization header anyway.
+    # Replay on reconnect is per worker: a client whose reconnect lands on
+    # another worker, or on a restarted one, gets resync and refetches.
+    return StreamingResponse(
+        sse_stream(request, request.headers.get("last-event-id")),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+# --- METRICS (Prometheus text format) ---
+@app.get("/metrics", include_in_schema=False)
+async def prometheus_metrics():
+    if not settings.METRICS_ENABLED:
+        return PlainTextResponse("Metrics are disabled", status_code=404)
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
 
 @app.get("/")
 def read_root():
@@ -0,0 +1,14 @@
+from sqlalchemy import Column, Integer, String, DateTime, LargeBinary
+from app.core.database import Base
+
+class IdempotencyKey(Base):
+    # Recorded response of a write sent with an Idempotency-Key header, so a
+    # retry gets the same answer without running the write again.
+    __tablename__ = "idempotency_keys"
+
+    key = Column(String, primary_key=True)  # "<user id>:<client's key>"
+    fingerprint = Column(String, nullable=False)  # sha256 of method, path and body
+    status_code = Column(Integer, nullable=False)  # 0 while the first request is running
+    content_type = Column(String, nullable=True)
+    body = Column(LargeBinary, nullable=False)
+    expires_at = Column(DateTime, index=True, nullable=False)
@@ -0,0 +1,21 @@
+from datetime import datetime
+from sqlalchemy import Column, Integer, String, DateTime, Boolean, Index
+from app.core.database import Base
+
+class InventoryEvent(Base):
+    # Audit trail of stock changes, append-only apart from rolled_up. No FK on
+    # sweet_id so history survives deleting the sweet.
+    __tablename__ = "inventory_events"
+
+    id = Column(Integer, primary_key=True)
+    sweet_id = Column(Integer, index=True, nullable=False)
+    kind = Column(String, nullable=False)  # purchase, restock or adjust
+    delta = Column(Integer, nullable=False)  # signed change to quantity
+    user_id = Column(Integer, nullable=True)
+    created_at = Column(DateTime, default=datetime.utcnow, index=True, nullable=False)
+    rolled_up = Column(Boolean, nullable=True)  # set once the sales rollups count it (app/core/analytics.py)
+
+    __table_args__ = (
+        # Only the events still waiting for the rollups, so finding them stays cheap as the log grows
+        Index("ix_inventory_events_pending", "id", sqlite_where=rolled_up.is_(None), postgresql_where=rolled_up.is_(None)),
+    )
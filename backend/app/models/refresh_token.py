@@ -0,0 +1,17 @@
+from datetime import datetime
+from sqlalchemy import Column, Integer, String, DateTime
+from app.core.database import Base
+
+class RefreshToken(Base):
+    # One row per refresh token ever issued. Only a hash of the token is
+    # stored. Rotation revokes the row and issues its successor in the same
+    # family; presenting a revoked token again revokes the whole family.
+    __tablename__ = "refresh_tokens"
+
+    id = Column(Integer, primary_key=True)
+    token_hash = Column(String, unique=True, index=True, nullable=False)  # sha256 hex of the token
+    family = Column(String, index=True, nullable=False)  # shared by a login and all its rotations
+    user_id = Column(Integer, index=True, nullable=False)
+    created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+    expires_at = Column(DateTime, index=True, nullable=False)
+    revoked_at = Column(DateTime, nullable=True)  # set when rotated or logged out
@@ -0,0 +1,19 @@
+from sqlalchemy import Column, Integer, String, Float, DateTime
+from app.core.database import Base
+
+class SalesRollupMixin:
+    # Sales and restocks per sweet per time bucket, folded in from the
+    # inventory events by a background job (app/core/analytics.py). Category is
+    # copied at roll-up time so revenue by category needs no join.
+    bucket = Column(DateTime, primary_key=True)  # UTC, truncated to the table's granularity
+    sweet_id = Column(Integer, primary_key=True)
+    category = Column(String)
+    units_sold = Column(Integer, nullable=False, default=0)
+    revenue = Column(Float, nullable=False, default=0)
+    units_restocked = Column(Integer, nullable=False, default=0)
+
+class SalesByMinute(SalesRollupMixin, Base):
+    __tablename__ = "sales_by_minute"  # short windows; pruned after ANALYTICS_MINUTE_RETENTION_HOURS
+
+class SalesByHour(SalesRollupMixin, Base):
+    __tablename__ = "sales_by_hour"
@@ -0,0 +1,8 @@
+from sqlalchemy import Column, Integer
+from app.core.database import Base
+
+class SchemaVersion(Base):
+    # One row: the last migration applied (see app/core/migrations.py)
+    __tablename__ = "schema_version"
+
+    version = Column(Integer, primary_key=True)
@@ -1,8 +1,12 @@
-from sqlalchemy import Column, Integer, String, Float, Boolean
+from sqlalchemy import Column, Integer, String, Float, Boolean, Index
 from app.core.database import Base
 
 class Sweet(Base):
     __tablename__ = "sweets"
+    __table_args__ = (
+        # Category + price-range filters in /search
+        Index("ix_sweets_category_price", "category", "price"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     name = Column(String, index=True)
@@ -0,0 +1,12 @@
+from sqlalchemy import Column, Integer, String, Float
+from app.core.database import Base
+
+class TokenRevocation(Base):
+    # Access tokens for `username` issued before revoked_at stop working, on
+    # every worker (see app/core/security.py). Dropped once all the tokens
+    # it could match have expired.
+    __tablename__ = "token_revocations"
+
+    id = Column(Integer, primary_key=True)
+    username = Column(String, nullable=False)
+    revoked_at = Column(Float, index=True, nullable=False)  # unix time, comparable with a token's iat
@@ -0,0 +1,22 @@
+from datetime import datetime
+from pydantic import BaseModel
+from typing import Optional
+
+class TopSeller(BaseModel):
+    sweet_id: int
+    name: Optional[str] = None # None if the sweet was deleted since
+    units_sold: int
+    revenue: float
+
+class CategoryRevenue(BaseModel):
+    category: Optional[str] = None
+    units_sold: int
+    revenue: float
+
+class StockForecast(BaseModel):
+    sweet_id: int
+    name: str
+    quantity: int
+    units_per_hour: float
+    hours_to_stockout: float
+    stockout_at: datetime
@@ -0,0 +1,23 @@
+from datetime import datetime
+from pydantic import BaseModel, Field
+from typing import List, Optional
+
+class ReservationCreate(BaseModel):
+    sweet_id: int
+    amount: int = Field(default=1, gt=0)
+    ttl_seconds: Optional[int] = Field(default=None, gt=0) # Capped at RESERVATION_MAX_TTL_SECONDS
+
+class ReservationResponse(BaseModel):
+    id: str
+    sweet_id: int
+    amount: int
+    expires_at: datetime
+
+class ReservationConfirm(BaseModel):
+    ids: Optional[List[str]] = None # None: every hold in the cart
+
+class Availability(BaseModel):
+    sweet_id: int
+    quantity: int
+    held: int # In other carts
+    available: int
@@ -1,5 +1,6 @@
-from pydantic import BaseModel
-from typing import Optional
+from pydantic import BaseModel, Field
+from datetime import datetime
+from typing import List, Optional, Union
 
 class SweetBase(BaseModel):
     name: str
@@ -17,6 +18,30 @@ class SweetResponse(SweetBase):
     class Config:
         from_attributes = True
 
+class SweetSuggestion(BaseModel):
+    id: int
+    name: str
+
+class FacetCount(BaseModel):
+    value: Optional[Union[str, bool]] = None
+    count: int
+
+class PriceBandCount(BaseModel):
+    min: float
+    max: Optional[float] = None # None for the top band
+    count: int
+
+class BrowseFacets(BaseModel):
+    category: List[FacetCount]
+    is_veg: List[FacetCount]
+    in_stock: List[FacetCount]
+    price: List[PriceBandCount]
+
+class BrowsePage(BaseModel):
+    total: int
+    items: List[SweetResponse]
+    facets: BrowseFacets
+
 class SweetUpdate(BaseModel):
     name: Optional[str] = None
     category: Optional[str] = None
@@ -26,4 +51,38 @@ class SweetUpdate(BaseModel):
     is_veg: Optional[bool] = None # <--- NEW FIELD
     
 class SweetInventoryOp(BaseModel):
-    amount: int = 1
\ No newline at end of file
+    amount: int = Field(default=1, gt=0) # Negative amounts would invert purchase/restock
+
+class CheckoutLine(BaseModel):
+    sweet_id: int
+    amount: int = Field(default=1, gt=0)
+
+class SweetCheckout(BaseModel):
+    items: List[CheckoutLine] = Field(min_length=1)
+
+class SweetRestockRow(BaseModel):
+    name: str
+    amount: int = Field(gt=0)
+
+class ImportRowResult(BaseModel):
+    row: int
+    name: Optional[str] = None
+    status: str # created, updated, restocked or error
+    detail: Optional[str] = None
+
+class ImportReport(BaseModel):
+    created: int = 0
+    updated: int = 0
+    restocked: int = 0
+    failed: int = 0
+    rows: List[ImportRowResult] = []
+
+class InventoryEventResponse(BaseModel):
+    id: int
+    sweet_id: int
+    kind: str # purchase, restock or adjust
+    delta: int
+    user_id: Optional[int] = None
+    created_at: datetime
+    class Config:
+        from_attributes = True
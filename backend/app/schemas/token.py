@@ -1,5 +1,10 @@
 from pydantic import BaseModel
+from typing import Optional
 
 class Token(BaseModel):
     access_token: str
-    token_type: str
\ No newline at end of file
+    token_type: str
+    refresh_token: Optional[str] = None # Send to /api/auth/refresh for a new pair; single use
+
+class RefreshRequest(BaseModel):
+    refresh_token: str
\ No newline at end of file
@@ -1,16 +1,25 @@
 from pydantic import BaseModel
-from typing import Optional
+from typing import List, Optional
 
 class UserBase(BaseModel):
     username: str
 
 class UserCreate(UserBase):
     password: str
-    role: str = "customer" # <--- Allow role input (default to customer)
+    role: str = "customer" # Sign-up only accepts customer; see register_user
 
 class UserResponse(UserBase):
     id: int
     role: str
 
     class Config:
-        from_attributes = True
\ No newline at end of file
+        from_attributes = True
+
+class RoleChange(BaseModel):
+    usernames: List[str]
+    role: str
+
+class RoleChangeReport(BaseModel):
+    updated: List[str]
+    unchanged: List[str]
+    missing: List[str]
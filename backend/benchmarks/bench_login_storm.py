@@ -0,0 +1,97 @@
+"""
+Purchase latency during a login storm, in-process through httpx.ASGITransport.
+
+Runs the same purchase load three times: with no logins, during a login storm
+with Argon2 run inline on the event loop (the old behaviour), and during a
+storm with Argon2 on the hashing pool. Uses the production Argon2 settings.
+
+    python benchmarks/bench_login_storm.py [seconds] [tills] [concurrent_logins]
+"""
+import asyncio
+import os
+import sys
+import tempfile
+import time
+
+TMP = tempfile.mkdtemp()
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ["DATABASE_URL"] = f"sqlite+aiosqlite:///{TMP}/bench.db"
+os.environ.setdefault("SECRET_KEY", "benchmark")
+os.environ.setdefault("RATE_LIMIT_ENABLED", "false")  # one client IP; the storm is the point
+
+from httpx import ASGITransport, AsyncClient
+from sqlalchemy import text
+
+from app.core import security
+from app.core.database import engine
+from app.core.migrations import migrate
+from app.main import app
+
+def percentile(samples: list, pct: float) -> float:
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+async def login(client, username, password="password"):
+    response = await client.post("/api/auth/login", data={"username": username, "password": password})
+    return response.json().get("access_token")
+
+async def setup(client, storm_users: int):
+    await migrate(engine)
+    for i in range(storm_users + 1):
+        await client.post("/api/auth/register", json={"username": f"user{i}", "password": "password"})
+    async with engine.begin() as conn:
+        await conn.execute(text("UPDATE users SET role = 'admin' WHERE username = 'user0'"))
+    token = await login(client, "user0")
+    headers = {"Authorization": f"Bearer {token}"}
+    sweet = await client.post("/api/sweets/", json={"name": "Ladoo", "category": "Indian", "price": 1, "quantity": 10**9}, headers=headers)
+    return sweet.json()["id"], headers
+
+async def purchases(client, sweet_id, headers, deadline, samples, failures):
+    while time.perf_counter() < deadline:
+        start = time.perf_counter()
+        try:
+            response = await client.post(f"/api/sweets/{sweet_id}/purchase", json={"amount": 1}, headers=headers)
+            ok = response.status_code == 200
+        except Exception:
+            # e.g. "database is locked": a stalled event loop held the write lock too long
+            ok = False
+        samples.append((time.perf_counter() - start) * 1000)
+        if not ok:
+            failures.append(1)
+
+async def logins(client, user_index, deadline, counter):
+    while time.perf_counter() < deadline:
+        await login(client, f"user{user_index}")
+        counter.append(1)
+
+async def phase(client, name, sweet_id, headers, seconds, tills, storm):
+    samples, failures, done_logins = [], [], []
+    deadline = time.perf_counter() + seconds
+    tasks = [purchases(client, sweet_id, headers, deadline, samples, failures) for _ in range(tills)]
+    tasks += [logins(client, i + 1, deadline, done_logins) for i in range(storm)]
+    await asyncio.gather(*tasks)
+    print(
+        f"{name:<22} purchases {len(samples):>6}  p50 {percentile(samples, 50):7.2f}ms  "
+        f"p99 {percentile(samples, 99):8.2f}ms  failed {len(failures):>4}  logins {len(done_logins):>5}"
+    )
+
+async def inline_hashing(fn, *args):
+    # The old behaviour: hash on the event loop
+    return fn(*args)
+
+async def main(seconds: float, tills: int, storm: int):
+    async with AsyncClient(transport=ASGITransport(app=app), base_url="http://bench") as client:
+        sweet_id, headers = await setup(client, storm)
+        await phase(client, "no logins", sweet_id, headers, seconds, tills, 0)
+
+        pooled = security._run_hashing
+        security._run_hashing = inline_hashing
+        await phase(client, "storm, inline argon2", sweet_id, headers, seconds, tills, storm)
+        security._run_hashing = pooled
+        await phase(client, "storm, hashing pool", sweet_id, headers, seconds, tills, storm)
+    await engine.dispose()
+
+if __name__ == "__main__":
+    args = [float(arg) for arg in sys.argv[1:]]
+    seconds, tills, storm = (args + [10, 4, 16][len(args):])[:3]
+    asyncio.run(main(seconds, int(tills), int(storm)))
@@ -0,0 +1,96 @@
+"""
+Request throughput across engine/pool configurations, on a SQLite file.
+
+Each configuration runs in its own subprocess (the engine is built from
+Settings at import time) and drives the app in-process through
+httpx.ASGITransport: concurrent clients doing one purchase for every three
+catalog page reads. Purchases bump the catalog version, so reads mostly miss
+the cache and reach the database.
+
+    python benchmarks/bench_pool.py [seconds] [clients]
+"""
+import asyncio
+import json
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import time
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+ROLLBACK_JOURNAL = {"SQLITE_JOURNAL_MODE": "DELETE", "SQLITE_SYNCHRONOUS": "FULL"}
+
+CONFIGS = [
+    ("NullPool + echo, rollback (old)", {"DB_POOL_MODE": "null", "DB_ECHO": "true", **ROLLBACK_JOURNAL}),
+    ("NullPool, WAL", {"DB_POOL_MODE": "null"}),
+    ("QueuePool, rollback journal", {"DB_POOL_MODE": "queue", **ROLLBACK_JOURNAL}),
+    ("QueuePool, WAL (new default)", {"DB_POOL_MODE": "queue"}),
+]
+
+async def worker(seconds: float, clients: int):
+    sys.path.append(BACKEND_DIR)
+    from httpx import ASGITransport, AsyncClient
+    from sqlalchemy import text
+    from app.core.database import engine
+    from app.core.migrations import migrate
+    from app.main import app
+
+    await migrate(engine)
+    async with engine.begin() as conn:
+        await conn.execute(
+            text("INSERT INTO sweets (name, category, price, quantity, is_veg) VALUES (:n, 'Candy', 1.0, 1000000000, 1)"),
+            [{"n": f"Sweet {i}"} for i in range(2000)],
+        )
+        await conn.execute(text("INSERT INTO users (username, hashed_password, role) VALUES ('till', '-', 'worker')"))
+
+    from app.core.security import create_access_token
+    headers = {"Authorization": f"Bearer {create_access_token({'sub': 'till', 'uid': 1, 'role': 'worker'})}"}
+
+    completed, errors = [], []
+    deadline = time.perf_counter() + seconds
+
+    async def client_loop(client, rng):
+        while time.perf_counter() < deadline:
+            try:
+                if rng.random() < 0.25:
+                    response = await client.post(f"/api/sweets/{rng.randint(1, 2000)}/purchase", json={"amount": 1}, headers=headers)
+                else:
+                    response = await client.get("/api/sweets/", params={"limit": 50, "after": rng.randint(0, 1950)})
+                (completed if response.status_code == 200 else errors).append(1)
+            except Exception:
+                errors.append(1)
+
+    start = time.perf_counter()
+    async with AsyncClient(transport=ASGITransport(app=app), base_url="http://bench") as client:
+        await asyncio.gather(*[client_loop(client, random.Random(i)) for i in range(clients)])
+    elapsed = time.perf_counter() - start
+    await engine.dispose()
+    return {"requests": len(completed), "errors": len(errors), "rps": len(completed) / elapsed}
+
+def main(seconds: float, clients: int):
+    for name, overrides in CONFIGS:
+        with tempfile.TemporaryDirectory() as tmp:
+            env = {
+                **os.environ,
+                "DATABASE_URL": f"sqlite+aiosqlite:///{tmp}/bench.db",
+                "SECRET_KEY": "benchmark",
+                "RATE_LIMIT_ENABLED": "false",  # every client shares one IP
+                **overrides,
+            }
+            output = subprocess.run(
+                [sys.executable, __file__, "--worker", str(seconds), str(clients)],
+                env=env, capture_output=True, text=True, check=True,
+            ).stdout
+            result = json.loads(output.strip().splitlines()[-1])
+        print(f"{name:<32} {result['rps']:8.1f} req/s  ({result['requests']} ok, {result['errors']} errors)")
+
+if __name__ == "__main__":
+    if sys.argv[1:2] == ["--worker"]:
+        result = asyncio.run(worker(float(sys.argv[2]), int(sys.argv[3])))
+        print(json.dumps(result))
+    else:
+        args = [float(arg) for arg in sys.argv[1:]]
+        seconds, clients = (args + [10, 8][len(args):])[:2]
+        main(seconds, int(clients))
@@ -0,0 +1,90 @@
+"""
+Purchase throughput on one hot sweet: synchronous commits vs write-behind
+group commits, on a SQLite file.
+
+Each mode runs in its own subprocess and drives the app in-process through
+httpx.ASGITransport with concurrent tills all buying the same sweet.
+
+    python benchmarks/bench_purchases.py [seconds] [tills]
+"""
+import asyncio
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+CONFIGS = [
+    ("sync commit per purchase", {"INVENTORY_WRITE_BEHIND": "false"}),
+    ("write-behind group commit", {"INVENTORY_WRITE_BEHIND": "true"}),
+]
+
+async def worker(seconds: float, tills: int):
+    sys.path.append(BACKEND_DIR)
+    from httpx import ASGITransport, AsyncClient
+    from sqlalchemy import text
+    from app.core.database import engine
+    from app.core.inventory import inventory_writer
+    from app.core.migrations import migrate
+    from app.core.security import create_access_token
+    from app.main import app
+
+    await migrate(engine)
+    async with engine.begin() as conn:
+        await conn.execute(text("INSERT INTO sweets (name, category, price, quantity, is_veg) VALUES ('Ladoo', 'Indian', 1.0, 1000000000, 1)"))
+    headers = {"Authorization": f"Bearer {create_access_token({'sub': 'till', 'uid': 1, 'role': 'worker'})}"}
+
+    latencies, errors = [], []
+    deadline = time.perf_counter() + seconds
+
+    async def till(client):
+        while time.perf_counter() < deadline:
+            start = time.perf_counter()
+            try:
+                response = await client.post("/api/sweets/1/purchase", json={"amount": 1}, headers=headers)
+                ok = response.status_code == 200
+            except Exception:
+                ok = False
+            (latencies if ok else errors).append((time.perf_counter() - start) * 1000)
+
+    start = time.perf_counter()
+    async with AsyncClient(transport=ASGITransport(app=app), base_url="http://bench") as client:
+        await asyncio.gather(*[till(client) for _ in range(tills)])
+    await inventory_writer.stop()
+    elapsed = time.perf_counter() - start
+
+    async with engine.connect() as conn:
+        sold = 1000000000 - await conn.scalar(text("SELECT quantity FROM sweets WHERE id = 1"))
+        logged = await conn.scalar(text("SELECT COUNT(*) FROM inventory_events"))
+    await engine.dispose()
+    latencies.sort()
+    return {
+        "purchases": len(latencies), "errors": len(errors), "rps": len(latencies) / elapsed,
+        "p50": latencies[len(latencies) // 2], "p99": latencies[int(len(latencies) * 0.99)],
+        "sold": sold, "logged": logged,
+    }
+
+def main(seconds: float, tills: int):
+    for name, overrides in CONFIGS:
+        with tempfile.TemporaryDirectory() as tmp:
+            env = {**os.environ, "DATABASE_URL": f"sqlite+aiosqlite:///{tmp}/bench.db", "SECRET_KEY": "benchmark", **overrides}
+            output = subprocess.run(
+                [sys.executable, __file__, "--worker", str(seconds), str(tills)],
+                env=env, capture_output=True, text=True, check=True,
+            ).stdout
+            r = json.loads(output.strip().splitlines()[-1])
+        print(
+            f"{name:<28} {r['rps']:8.1f} purchases/s  p50 {r['p50']:6.2f}ms  p99 {r['p99']:7.2f}ms  "
+            f"errors {r['errors']}  (sold {r['sold']}, events {r['logged']})"
+        )
+
+if __name__ == "__main__":
+    if sys.argv[1:2] == ["--worker"]:
+        print(json.dumps(asyncio.run(worker(float(sys.argv[2]), int(sys.argv[3])))))
+    else:
+        args = [float(arg) for arg in sys.argv[1:]]
+        seconds, tills = (args + [10, 16][len(args):])[:2]
+        main(seconds, int(tills))
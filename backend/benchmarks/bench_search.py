@@ -0,0 +1,120 @@
+"""
+Search latency before/after the full-text index, on SQLite.
+
+"before" is the old /search query (ILIKE '%...%' scan), "after" is
+apply_text_search() from app/core/search.py plus the (category, price) index.
+
+    python benchmarks/bench_search.py                  # 10k, 100k, 1M sweets
+    python benchmarks/bench_search.py 10000 100000     # custom sizes
+"""
+import asyncio
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("DATABASE_URL", "sqlite+aiosqlite:///:memory:")
+os.environ.setdefault("SECRET_KEY", "benchmark")
+
+from sqlalchemy import and_, insert, select
+from sqlalchemy.ext.asyncio import create_async_engine
+
+from app.core.database import Base
+from app.core.search import apply_text_search, install_search_index
+from app.models.sweet import Sweet
+
+QUERIES_PER_SIZE = 200
+CATEGORIES = ["Cake", "Candy", "Chocolate", "Indian", "Pastry", "Cookie", "Toffee", "Fudge"]
+
+def make_vocabulary(size: int, rng: random.Random) -> list:
+    syllables = ["ba", "ka", "la", "ma", "ra", "su", "ji", "lo", "pe", "to", "ni", "de", "fu", "go", "ch", "sh"]
+    return list({"".join(rng.choices(syllables, k=rng.randint(2, 4))) for _ in range(size)})
+
+def percentile(samples: list, pct: float) -> float:
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+async def seed(conn, size: int, vocabulary: list, rng: random.Random):
+    batch = []
+    for i in range(size):
+        batch.append({
+            "name": f"{rng.choice(vocabulary).title()} {rng.choice(vocabulary).title()} {i}",
+            "category": rng.choice(CATEGORIES),
+            "price": round(rng.uniform(0.5, 50), 2),
+            "quantity": rng.randint(0, 100),
+            "is_veg": rng.random() < 0.8,
+        })
+        if len(batch) == 10_000:
+            await conn.execute(insert(Sweet.__table__), batch)
+            batch = []
+    if batch:
+        await conn.execute(insert(Sweet.__table__), batch)
+
+def make_queries(vocabulary: list, rng: random.Random) -> list:
+    # What the Dashboard sends while typing: name prefixes, sometimes narrowed
+    # by category and a price band
+    queries = []
+    for _ in range(QUERIES_PER_SIZE):
+        word = rng.choice(vocabulary)
+        name = word[:rng.randint(3, len(word))]
+        if rng.random() < 0.3:
+            low = rng.choice([0, 5, 10, 20])
+            queries.append((name, rng.choice(CATEGORIES), low, low + 10))
+        else:
+            queries.append((name, None, None, None))
+    return queries
+
+def before_query(name, category, min_price, max_price):
+    filters = [Sweet.name.ilike(f"%{name}%")]
+    if category:
+        filters.append(Sweet.category.ilike(f"%{category}%"))
+    if min_price is not None:
+        filters += [Sweet.price >= min_price, Sweet.price <= max_price]
+    return select(Sweet.__table__).where(and_(*filters))
+
+def after_query(name, category, min_price, max_price):
+    query = apply_text_search(select(Sweet.__table__), "sqlite", name, category)
+    if min_price is not None:
+        query = query.where(Sweet.price >= min_price, Sweet.price <= max_price)
+    return query
+
+async def measure(conn, build, queries) -> list:
+    samples = []
+    for params in queries:
+        start = time.perf_counter()
+        result = await conn.execute(build(*params))
+        result.fetchall()
+        samples.append((time.perf_counter() - start) * 1000)
+    return samples
+
+async def run(size: int):
+    rng = random.Random(size)
+    vocabulary = make_vocabulary(5000, rng)
+    with tempfile.TemporaryDirectory() as tmp:
+        engine = create_async_engine(f"sqlite+aiosqlite:///{tmp}/bench.db")
+        async with engine.begin() as conn:
+            await conn.run_sync(Base.metadata.create_all)
+            await conn.run_sync(install_search_index)
+            await seed(conn, size, vocabulary, rng)
+
+        queries = make_queries(vocabulary, rng)
+        async with engine.connect() as conn:
+            before = await measure(conn, before_query, queries)
+            after = await measure(conn, after_query, queries)
+        await engine.dispose()
+
+    print(
+        f"{size:>9,}  "
+        f"before p50 {percentile(before, 50):8.2f}ms  p99 {percentile(before, 99):8.2f}ms  |  "
+        f"after p50 {percentile(after, 50):8.2f}ms  p99 {percentile(after, 99):8.2f}ms"
+    )
+
+async def main(sizes: list):
+    for size in sizes:
+        await run(size)
+
+if __name__ == "__main__":
+    sizes = [int(arg) for arg in sys.argv[1:]] or [10_000, 100_000, 1_000_000]
+    asyncio.run(main(sizes))
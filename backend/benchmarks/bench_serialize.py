@@ -0,0 +1,89 @@
+"""
+Per-row cost of turning catalog rows into a JSON body, on SQLite.
+
+  orm + model   select(Sweet) entities, SweetResponse.model_validate per row,
+                jsonable_encoder, stdlib json (what FastAPI did for the old list)
+  mappings      select(columns), dict(row) per RowMapping, stdlib json (before)
+  tuples        select(columns), dicts zipped from row tuples, stdlib json
+  fast path     tuples + app.core.responses.dumps (orjson when installed)
+
+Fetch and encode are timed together: the ORM path pays most in the fetch.
+
+    python benchmarks/bench_serialize.py               # 1k, 10k, 50k rows
+    python benchmarks/bench_serialize.py 100000
+"""
+import asyncio
+import json
+import os
+import sys
+import tempfile
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("DATABASE_URL", "sqlite+aiosqlite:///:memory:")
+os.environ.setdefault("SECRET_KEY", "benchmark")
+
+from fastapi.encoders import jsonable_encoder
+from sqlalchemy import insert, select
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+
+from app.core.database import Base
+from app.core.responses import dumps, orjson, plain_rows
+from app.models.sweet import Sweet
+from app.schemas.sweet import SweetResponse
+
+REPEATS = 5
+COLUMNS = Sweet.__table__.c
+
+def stdlib(rows) -> bytes:
+    return json.dumps(rows, ensure_ascii=False, separators=(",", ":")).encode()
+
+async def orm_and_model(db, limit):
+    result = await db.execute(select(Sweet).order_by(Sweet.id).limit(limit))
+    models = [SweetResponse.model_validate(sweet) for sweet in result.scalars().all()]
+    return stdlib(jsonable_encoder(models))
+
+async def mappings(db, limit):
+    result = await db.execute(select(*COLUMNS).order_by(Sweet.id).limit(limit))
+    return stdlib([dict(row) for row in result.mappings()])
+
+async def tuples(db, limit):
+    result = await db.execute(select(*COLUMNS).order_by(Sweet.id).limit(limit))
+    return stdlib(plain_rows(result))
+
+async def fast_path(db, limit):
+    result = await db.execute(select(*COLUMNS).order_by(Sweet.id).limit(limit))
+    return dumps(plain_rows(result))
+
+PATHS = [("orm + model", orm_and_model), ("mappings", mappings), ("tuples", tuples), ("fast path", fast_path)]
+
+async def main(sizes):
+    with tempfile.TemporaryDirectory() as tmp:
+        engine = create_async_engine(f"sqlite+aiosqlite:///{tmp}/bench.db")
+        async with engine.begin() as conn:
+            await conn.run_sync(Base.metadata.create_all)
+            await conn.execute(insert(Sweet), [
+                {"name": f"Sweet number {i}", "category": "Candy", "price": 1.25 + i % 50, "quantity": i % 100,
+                 "image_url": None, "is_veg": i % 3 == 0}
+                for i in range(max(sizes))
+            ])
+        Session = async_sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
+
+        print(f"encoder for the fast path: {'orjson ' + orjson.__version__ if orjson else 'stdlib json (orjson not installed)'}")
+        for size in sizes:
+            print(f"\n{size} rows")
+            baseline = None
+            for name, path in PATHS:
+                best = float("inf")
+                for _ in range(REPEATS):
+                    async with Session() as db:
+                        start = time.perf_counter()
+                        body = await path(db, size)
+                        best = min(best, time.perf_counter() - start)
+                per_row = best / size * 1e6
+                baseline = baseline or per_row
+                print(f"  {name:<12} {best * 1000:8.1f} ms  {per_row:6.2f} us/row  {baseline / per_row:5.1f}x  ({len(body) // 1024} KiB)")
+        await engine.dispose()
+
+if __name__ == "__main__":
+    asyncio.run(main([int(arg) for arg in sys.argv[1:]] or [1000, 10000, 50000]))
@@ -0,0 +1,108 @@
+"""
+Worker startup cost: importing the app package, and the schema step of the
+lifespan hook (the old create_all + search index DDL on every boot, against
+the migration runner's version check).
+
+Each boot is a fresh interpreter, like a uvicorn worker. "together" starts
+that many workers at once on one database, as on a cold autoscaled host.
+
+    python benchmarks/bench_startup.py [workers] [runs]
+"""
+import asyncio
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+async def _schema_step(mode: str):
+    from app.core.database import Base, engine
+    if mode == "migrate":
+        from app.core.migrations import migrate
+        await migrate(engine)
+    else:
+        from app.core.search import install_search_index
+        async with engine.begin() as conn:
+            await conn.run_sync(Base.metadata.create_all)
+            await conn.run_sync(install_search_index)
+    await engine.dispose()
+
+def child(mode: str):
+    # One worker boot; prints its timings as JSON
+    start = time.perf_counter()
+    sys.path.append(BACKEND_DIR)
+    import app.main  # noqa: F401
+    imported = time.perf_counter()
+    if mode != "import":
+        asyncio.run(_schema_step(mode))
+    done = time.perf_counter()
+    print(json.dumps({"import_ms": (imported - start) * 1000, "schema_ms": (done - imported) * 1000}))
+
+def boot(mode: str, db: str, workers: int = 1):
+    # Starts `workers` boots at once; returns (wall ms until all exit, timings
+    # of the boots that succeeded, how many failed)
+    env = {
+        **os.environ,
+        "DATABASE_URL": f"sqlite+aiosqlite:///{db}",
+        "SECRET_KEY": "benchmark",
+        "DB_POOL_MODE": "null",
+    }
+    start = time.perf_counter()
+    procs = [
+        subprocess.Popen(
+            [sys.executable, __file__, "--child", mode], env=env,
+            stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, text=True,
+        )
+        for _ in range(workers)
+    ]
+    results, failed = [], 0
+    for proc in procs:
+        out, _ = proc.communicate()
+        if proc.returncode:
+            failed += 1  # e.g. create_all racing another worker: "table ... already exists"
+        else:
+            results.append(json.loads(out))
+    return (time.perf_counter() - start) * 1000, results, failed
+
+def median(values):
+    return statistics.median(values)
+
+def main(workers: int, runs: int):
+    print(f"{runs} runs each, {os.cpu_count()} CPUs\n")
+
+    imports = [boot("import", os.path.join(tempfile.mkdtemp(), "unused.db"))[1][0]["import_ms"] for _ in range(runs)]
+    print(f"import app.main          median {median(imports):7.1f}ms  min {min(imports):7.1f}ms")
+
+    for mode, label in (("create_all", "create_all + FTS DDL"), ("migrate", "migration runner")):
+        # Schema step alone, one worker, database already current
+        db = os.path.join(tempfile.mkdtemp(), "bench.db")
+        boot(mode, db)  # first boot builds the schema
+        warm = [boot(mode, db)[1][0]["schema_ms"] for _ in range(runs)]
+
+        # `workers` booting together, on a new database and on a current one
+        cold_walls, cold_steps, warm_walls, warm_steps, cold_failed = [], [], [], [], 0
+        for _ in range(runs):
+            wall, results, failed = boot(mode, os.path.join(tempfile.mkdtemp(), "bench.db"), workers)
+            cold_walls.append(wall)
+            cold_steps.append(max((r["schema_ms"] for r in results), default=0))
+            cold_failed += failed
+            wall, results, _ = boot(mode, db, workers)
+            warm_walls.append(wall)
+            warm_steps.append(max(r["schema_ms"] for r in results))
+        print(f"\n{label}")
+        print(f"  schema step, current db       median {median(warm):7.1f}ms")
+        print(
+            f"  {workers} workers, new db         wall {median(cold_walls):7.1f}ms  slowest schema step {median(cold_steps):7.1f}ms"
+            f"  failed boots {cold_failed}/{workers * runs}"
+        )
+        print(f"  {workers} workers, current db     wall {median(warm_walls):7.1f}ms  slowest schema step {median(warm_steps):7.1f}ms")
+
+if __name__ == "__main__":
+    if sys.argv[1:2] == ["--child"]:
+        child(sys.argv[2])
+    else:
+        main(int(sys.argv[1]) if len(sys.argv) > 1 else 4, int(sys.argv[2]) if len(sys.argv) > 2 else 5)
@@ -0,0 +1,307 @@
+"""
+Load test for the API: seeds a catalog, drives a weighted mix of requests
+with concurrent clients and writes latency percentiles, throughput and
+memory as JSON, so runs can be compared between commits.
+
+    python benchmarks/loadtest.py --sweets 100000 --clients 16 --duration 30 -o after.json
+    python benchmarks/loadtest.py --mode uvicorn --mix rush -o after.json --compare before.json
+
+--mode inprocess (default) calls the app through httpx.ASGITransport like the
+tests do; --mode uvicorn starts a real server and talks HTTP to it. The
+database is a fresh SQLite file unless --database-url is given. Mixes are a
+preset name or weights such as "list=6,search=2,purchase=2".
+"""
+import argparse
+import asyncio
+import datetime
+import json
+import os
+import platform
+import random
+import subprocess
+import sys
+import tempfile
+import time
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(BACKEND_DIR)
+
+MIXES = {
+    "browse": {"list": 50, "get": 20, "search": 25, "suggest": 5},
+    "rush": {"purchase": 60, "get": 20, "list": 15, "restock": 5},
+    "mixed": {"list": 35, "get": 15, "search": 15, "purchase": 25, "restock": 3, "login": 2, "checkout": 5},
+}
+CATEGORIES = ["Indian", "Cake", "Candy", "Chocolate", "Cookie", "Pastry", "Ice Cream", "Toffee"]
+WORDS = ["Ladoo", "Barfi", "Jalebi", "Fudge", "Truffle", "Brownie", "Macaron", "Halwa", "Peda", "Tart", "Mousse", "Praline"]
+PASSWORD = "password"
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sweets", type=int, default=10000, help="catalog size (1k-1M)")
+    parser.add_argument("--users", type=int, default=20)
+    parser.add_argument("--clients", type=int, default=16, help="concurrent clients")
+    parser.add_argument("--duration", type=float, default=20, help="measured seconds")
+    parser.add_argument("--warmup", type=float, default=3, help="seconds before measuring")
+    parser.add_argument("--mix", default="mixed", help=f"{', '.join(MIXES)} or op=weight,...")
+    parser.add_argument("--mode", choices=["inprocess", "uvicorn"], default="inprocess")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--database-url", help="default: a new SQLite file")
+    parser.add_argument("--seed", type=int, default=1, help="random seed for data and request choice")
+    parser.add_argument("-o", "--output", help="write the JSON result here (default: stdout)")
+    parser.add_argument("--compare", help="earlier result JSON to print a comparison against")
+    return parser.parse_args(argv)
+
+def parse_mix(mix: str) -> dict:
+    if mix in MIXES:
+        return MIXES[mix]
+    weights = {}
+    for part in mix.split(","):
+        op, _, weight = part.partition("=")
+        if op not in OPERATIONS:
+            raise SystemExit(f"Unknown operation {op!r}; choose from {', '.join(OPERATIONS)}")
+        weights[op] = float(weight or 1)
+    return weights
+
+# --- SEEDING ---
+async def seed(sweets: int, users: int, rng: random.Random):
+    from sqlalchemy import insert
+    from app.core.database import engine
+    from app.core.migrations import migrate
+    from app.core.security import get_password_hash
+    from app.models.sweet import Sweet
+    from app.models.user import User
+
+    await migrate(engine)
+    async with engine.begin() as conn:
+        for start in range(0, sweets, 10000):
+            await conn.execute(insert(Sweet), [
+                {
+                    "name": f"{rng.choice(WORDS)} {rng.choice(WORDS)} {i}",
+                    "category": rng.choice(CATEGORIES),
+                    "price": round(rng.uniform(0.5, 20), 2),
+                    "quantity": 10**9,  # purchases measure the write path, not sold-out errors
+                    "is_veg": rng.random() < 0.8,
+                }
+                for i in range(start, min(start + 10000, sweets))
+            ])
+        # One hash for everyone: seeding 1000 users shouldn't take 1000 Argon2 runs
+        hashed = get_password_hash(PASSWORD)
+        await conn.execute(insert(User), [
+            {"username": f"bench{i}", "hashed_password": hashed, "role": "admin" if i == 0 else "worker"}
+            for i in range(users)
+        ])
+    await engine.dispose()
+
+def tokens(users: int) -> tuple:
+    from app.core.security import create_access_token
+    def token(i, role):
+        return {"Authorization": f"Bearer {create_access_token({'sub': f'bench{i}', 'uid': i + 1, 'role': role})}"}
+    return token(0, "admin"), [token(i, "worker") for i in range(1, max(users, 2))]
+
+# --- OPERATIONS ---
+# Each takes (client, ctx, rng) and returns the response
+def _any_sweet(ctx, rng):
+    return rng.randint(1, ctx["sweets"])
+
+async def op_list(client, ctx, rng):
+    return await client.get("/api/sweets/", params={"limit": 50, "after": rng.randint(0, max(ctx["sweets"] - 50, 0))})
+
+async def op_get(client, ctx, rng):
+    return await client.get(f"/api/sweets/{_any_sweet(ctx, rng)}")
+
+async def op_search(client, ctx, rng):
+    word = rng.choice(WORDS)
+    params = {"name": word[:rng.randint(3, len(word))]}
+    if rng.random() < 0.5:
+        params["max_price"] = rng.choice([5, 10])
+    return await client.get("/api/sweets/search", params=params)
+
+async def op_suggest(client, ctx, rng):
+    word = rng.choice(WORDS)
+    return await client.get("/api/sweets/suggest", params={"q": word[:rng.randint(2, 4)]})
+
+async def op_purchase(client, ctx, rng):
+    return await client.post(f"/api/sweets/{_any_sweet(ctx, rng)}/purchase", json={"amount": 1}, headers=rng.choice(ctx["workers"]))
+
+async def op_checkout(client, ctx, rng):
+    items = [{"sweet_id": _any_sweet(ctx, rng), "amount": rng.randint(1, 3)} for _ in range(rng.randint(2, 5))]
+    return await client.post("/api/sweets/checkout", json={"items": items}, headers=rng.choice(ctx["workers"]))
+
+async def op_restock(client, ctx, rng):
+    return await client.post(f"/api/sweets/{_any_sweet(ctx, rng)}/restock", json={"amount": 5}, headers=ctx["admin"])
+
+async def op_login(client, ctx, rng):
+    return await client.post("/api/auth/login", data={"username": f"bench{rng.randint(1, ctx['users'] - 1)}", "password": PASSWORD})
+
+OPERATIONS = {
+    "list": op_list, "get": op_get, "search": op_search, "suggest": op_suggest,
+    "purchase": op_purchase, "checkout": op_checkout, "restock": op_restock, "login": op_login,
+}
+
+# --- MEMORY ---
+def rss_mb(pid: str = "self") -> dict:
+    # Current and peak resident set size from /proc (Linux)
+    fields = {}
+    try:
+        with open(f"/proc/{pid}/status") as status:
+            for line in status:
+                key, _, value = line.partition(":")
+                if key in ("VmRSS", "VmHWM"):
+                    fields[key] = round(int(value.split()[0]) / 1024, 1)
+    except OSError:
+        pass
+    return {"rss_mb": fields.get("VmRSS"), "peak_rss_mb": fields.get("VmHWM")}
+
+# --- DRIVER ---
+def percentile(ordered: list, pct: float) -> float:
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))] if ordered else None
+
+async def drive(client, ctx, weights: dict, clients: int, warmup: float, duration: float, seed: int) -> dict:
+    names, weight_values = list(weights), list(weights.values())
+    samples = {name: [] for name in names}
+    errors = {name: {} for name in names}
+    start = time.perf_counter()
+    measure_from, deadline = start + warmup, start + warmup + duration
+
+    async def run_client(rng):
+        while (now := time.perf_counter()) < deadline:
+            name = rng.choices(names, weight_values)[0]
+            try:
+                response = await OPERATIONS[name](client, ctx, rng)
+                failure = None if response.status_code < 400 else str(response.status_code)
+            except Exception as exc:
+                failure = type(exc).__name__
+            elapsed = time.perf_counter() - now
+            if now >= measure_from:
+                if failure:
+                    errors[name][failure] = errors[name].get(failure, 0) + 1
+                else:
+                    samples[name].append(elapsed * 1000)
+
+    await asyncio.gather(*[run_client(random.Random(seed * 1000 + i)) for i in range(clients)])
+
+    ops = {}
+    for name in names:
+        ordered = sorted(samples[name])
+        ops[name] = {
+            "requests": len(ordered),
+            "errors": errors[name],
+            "rps": round(len(ordered) / duration, 1),
+            "mean_ms": round(sum(ordered) / len(ordered), 2) if ordered else None,
+            **{f"p{p}_ms": round(percentile(ordered, p), 2) if ordered else None for p in (50, 95, 99)},
+            "max_ms": round(ordered[-1], 2) if ordered else None,
+        }
+    every = sorted(x for name in names for x in samples[name])
+    total = {
+        "requests": len(every),
+        "errors": sum(n for name in names for n in errors[name].values()),
+        "rps": round(len(every) / duration, 1),
+        **{f"p{p}_ms": round(percentile(every, p), 2) if every else None for p in (50, 95, 99)},
+    }
+    return {"total": total, "operations": ops}
+
+async def run_inprocess(args, ctx, weights):
+    from httpx import ASGITransport, AsyncClient
+    from app.main import app
+
+    # ASGITransport doesn't run lifespan; start it by hand like a server would
+    async with app.router.lifespan_context(app):
+        memory_before = rss_mb()
+        async with AsyncClient(transport=ASGITransport(app=app), base_url="http://bench", timeout=60) as client:
+            result = await drive(client, ctx, weights, args.clients, args.warmup, args.duration, args.seed)
+    return result, {"before": memory_before, "after": rss_mb()}
+
+async def run_uvicorn(args, ctx, weights):
+    from httpx import AsyncClient, Limits
+
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app.main:app", "--port", str(args.port), "--log-level", "warning"],
+        cwd=BACKEND_DIR, env=os.environ.copy(),
+    )
+    base_url = f"http://127.0.0.1:{args.port}"
+    try:
+        async with AsyncClient(base_url=base_url, timeout=60, limits=Limits(max_connections=args.clients)) as client:
+            for _ in range(300):  # up to 30 s for startup (lifespan loads the catalog)
+                try:
+                    await client.get("/")
+                    break
+                except Exception:
+                    await asyncio.sleep(0.1)
+            else:
+                raise SystemExit("uvicorn did not start")
+            memory_before = rss_mb(str(server.pid))
+            result = await drive(client, ctx, weights, args.clients, args.warmup, args.duration, args.seed)
+            return result, {"before": memory_before, "after": rss_mb(str(server.pid)), "process": "server"}
+    finally:
+        server.terminate()
+        server.wait(timeout=30)
+
+def git_commit() -> str:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=BACKEND_DIR, capture_output=True, text=True).stdout.strip() or None
+    except OSError:
+        return None
+
+def compare(current: dict, baseline: dict) -> str:
+    def change(new, old):
+        if new is None or not old:
+            return "      n/a"
+        return f"{(new - old) / old * 100:+8.1f}%"
+
+    lines = [f"vs {baseline['meta'].get('commit')} ({baseline['meta'].get('timestamp')}):"]
+    rows = [("total", current["total"], baseline["total"])]
+    rows += [(name, ops, baseline["operations"].get(name, {})) for name, ops in current["operations"].items()]
+    for name, new, old in rows:
+        lines.append(
+            f"  {name:<10} rps {new['rps']:>8} {change(new['rps'], old.get('rps'))}"
+            f"   p50 {change(new['p50_ms'], old.get('p50_ms'))}   p99 {change(new['p99_ms'], old.get('p99_ms'))}"
+        )
+    return "\n".join(lines)
+
+def main(argv=None):
+    args = parse_args(argv)
+    weights = parse_mix(args.mix)
+    tmp = tempfile.TemporaryDirectory()
+    os.environ["DATABASE_URL"] = args.database_url or f"sqlite+aiosqlite:///{tmp.name}/loadtest.db"
+    os.environ.setdefault("SECRET_KEY", "loadtest")
+    # All simulated clients share one IP; set RATE_LIMIT_ENABLED=true to measure with limits
+    os.environ.setdefault("RATE_LIMIT_ENABLED", "false")
+
+    rng = random.Random(args.seed)
+    started = time.perf_counter()
+    asyncio.run(seed(args.sweets, args.users, rng))
+    seed_seconds = time.perf_counter() - started
+
+    admin, workers = tokens(args.users)
+    ctx = {"sweets": args.sweets, "users": max(args.users, 2), "admin": admin, "workers": workers}
+    runner = run_inprocess if args.mode == "inprocess" else run_uvicorn
+    result, memory = asyncio.run(runner(args, ctx, weights))
+
+    output = {
+        "meta": {
+            "commit": git_commit(),
+            "timestamp": datetime.datetime.now(datetime.timezone.utc).isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "cpus": os.cpu_count(),
+            "mode": args.mode,
+            "database": "sqlite" if not args.database_url else args.database_url.split(":")[0],
+            "sweets": args.sweets, "users": args.users, "clients": args.clients,
+            "duration": args.duration, "warmup": args.warmup, "mix": weights, "seed": args.seed,
+            "seed_seconds": round(seed_seconds, 2),
+        },
+        **result,
+        "memory": memory,
+    }
+    text = json.dumps(output, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(text + "\n")
+    else:
+        print(text)
+    if args.compare:
+        with open(args.compare) as f:
+            print(compare(output, json.load(f)), file=sys.stderr)
+    tmp.cleanup()
+
+if __name__ == "__main__":
+    main()
@@ -6,19 +6,30 @@ from httpx import AsyncClient, ASGITransport
 # 1. Force Python to see the 'app' folder
 sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 
+# Fresh connection per checkout: pooled connections would outlive the test's event loop
+os.environ.setdefault("DB_POOL_MODE", "null")
+
+# Cheap Argon2 for tests: every test registers and logs in users
+os.environ.setdefault("ARGON2_TIME_COST", "1")
+os.environ.setdefault("ARGON2_MEMORY_COST", "1024")
+os.environ.setdefault("ARGON2_PARALLELISM", "1")
+
+# Every test logs in from the same address; tests of the limiter lower these
+os.environ.setdefault("RATE_LIMIT_AUTH_BURST", "100000")
+os.environ.setdefault("RATE_LIMIT_BROWSE_BURST", "100000")
+
 from app.main import app
-from app.core.database import engine, Base
-# Import models so SQLAlchemy knows they exist before creating tables
-from app.models.user import User 
+from app.core.database import engine
+from app.core.migrations import migrate
 
 # 2. Database Setup Fixture (Runs before every test)
 @pytest.fixture(scope="function", autouse=True)
 async def setup_db():
     """
-    Creates tables before each test and (optionally) drops them after.
+    Migrates the schema before each test (just a version check after the
+    first) and (optionally) drops the tables after.
     """
-    async with engine.begin() as conn:
-        await conn.run_sync(Base.metadata.create_all)
+    await migrate(engine)
     yield
     # Uncomment the next lines if you want a fresh DB for every single test (slower but cleaner)
     # async with engine.begin() as conn:
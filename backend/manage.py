@@ -0,0 +1,153 @@
+"""
+Admin commands. Run from the backend directory:
+
+    python manage.py users import staff.csv [--role worker] [--workers 8] [--dry-run]
+    python manage.py users set-role admin alice bob [--file more.csv] [--dry-run]
+    python manage.py users delete alice bob [--dry-run]
+    python manage.py db migrate
+    python manage.py db reset --yes
+
+Rosters are CSV (header: username,password[,role]) or NDJSON (.ndjson/.jsonl),
+one user per row. set-role and delete also take --file, using its username
+column.
+"""
+import argparse
+import asyncio
+import os
+import sys
+import time
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from app.core import migrations
+from app.core.config import settings
+from app.core.database import SessionLocal, engine
+from app.core.inventory_import import detect_format, iter_rows
+from app.core.user_admin import BATCH_SIZE, ROLES, delete_users, hashing_pool, provision_users, set_roles
+
+def _usernames(args) -> list:
+    names = list(args.usernames)
+    if args.file:
+        with open(args.file, "rb") as f:
+            for row_no, data in iter_rows(f, detect_format(args.file, None)):
+                if isinstance(data, Exception) or not data.get("username"):
+                    sys.exit(f"{args.file} row {row_no}: no username")
+                names.append(str(data["username"]).strip())
+    if not names:
+        sys.exit("No usernames given")
+    return names
+
+def _dry(args) -> str:
+    return " (dry run, nothing written)" if args.dry_run else ""
+
+async def import_users(args):
+    started = time.perf_counter()
+
+    def progress(report):
+        rate = report.read / max(time.perf_counter() - started, 1e-9)
+        print(
+            f"\rread {report.read}  created {report.created}  skipped {report.skipped}  "
+            f"failed {report.failed}  ({rate:.0f} rows/s)",
+            end="", file=sys.stderr, flush=True,
+        )
+
+    pool = None if args.dry_run else hashing_pool(args.workers)
+    try:
+        with open(args.file, "rb") as f:
+            async with SessionLocal() as db:
+                report = await provision_users(
+                    db, f, args.format or detect_format(args.file, None),
+                    default_role=args.role, pool=pool, batch_size=args.batch_size,
+                    dry_run=args.dry_run, progress=progress,
+                )
+    finally:
+        if pool is not None:
+            pool.shutdown()
+    print(file=sys.stderr)
+    for error in report.errors:
+        print(f"  {error}", file=sys.stderr)
+    verb = "would create" if args.dry_run else "created"
+    print(f"{verb} {report.created}, skipped {report.skipped} existing/duplicate, failed {report.failed}{_dry(args)}")
+    return 1 if report.failed else 0
+
+async def change_roles(args):
+    async with SessionLocal() as db:
+        report = await set_roles(db, _usernames(args), args.role, dry_run=args.dry_run)
+    print(f"{len(report['updated'])} now {args.role}, {len(report['unchanged'])} already were{_dry(args)}")
+    if report["missing"]:
+        print(f"no such users: {', '.join(report['missing'])}", file=sys.stderr)
+    if report["updated"] and not args.dry_run:
+        # Running servers see the revocation at their next poll
+        print(f"Changed users' old tokens stop working within {settings.AUTH_REVOCATION_POLL_SECONDS:g}s; they get the new role at their next login or token refresh.")
+    return 1 if report["missing"] else 0
+
+async def remove_users(args):
+    async with SessionLocal() as db:
+        deleted = await delete_users(db, _usernames(args), dry_run=args.dry_run)
+    print(f"deleted {len(deleted)} users{_dry(args)}")
+    return 0
+
+async def migrate_db(args):
+    # Workers do this at startup too; running it first means none of them waits
+    done = await migrations.migrate(engine)
+    for step in done:
+        print(step)
+    print(f"Schema at version {await migrations.current_version(engine)}" + ("" if done else ", nothing to do"))
+    return 0
+
+async def show_version(args):
+    current, latest = await migrations.current_version(engine), migrations.latest_version()
+    print(f"database {current if current is not None else 'unversioned'}, code {latest}")
+    return 0 if current == latest else 1
+
+async def reset_db(args):
+    if not args.yes:
+        sys.exit("This drops every table. Re-run with --yes to go ahead.")
+    await migrations.reset(engine)
+    print("Database reset.")
+    return 0
+
+def parser() -> argparse.ArgumentParser:
+    root = argparse.ArgumentParser(prog="manage.py", description="Sweet Shop admin commands")
+    groups = root.add_subparsers(dest="group", required=True)
+
+    users = groups.add_parser("users").add_subparsers(dest="command", required=True)
+    cmd = users.add_parser("import", help="create users from a CSV/NDJSON roster")
+    cmd.add_argument("file")
+    cmd.add_argument("--format", choices=("csv", "ndjson"), help="default: from the file extension")
+    cmd.add_argument("--role", choices=ROLES, default="worker", help="for rows without a role")
+    cmd.add_argument("--workers", type=int, help="hashing processes (default: one per CPU)")
+    cmd.add_argument("--batch-size", type=int, default=BATCH_SIZE)
+    cmd.add_argument("--dry-run", action="store_true")
+    cmd.set_defaults(run=import_users)
+
+    cmd = users.add_parser("set-role", help="give users a role")
+    cmd.add_argument("role", choices=ROLES)
+    cmd.add_argument("usernames", nargs="*")
+    cmd.add_argument("--file")
+    cmd.add_argument("--dry-run", action="store_true")
+    cmd.set_defaults(run=change_roles)
+
+    cmd = users.add_parser("delete", help="delete users and their refresh tokens")
+    cmd.add_argument("usernames", nargs="*")
+    cmd.add_argument("--file")
+    cmd.add_argument("--dry-run", action="store_true")
+    cmd.set_defaults(run=remove_users)
+
+    db = groups.add_parser("db").add_subparsers(dest="command", required=True)
+    db.add_parser("migrate", help="apply pending schema migrations").set_defaults(run=migrate_db)
+    db.add_parser("version", help="schema version of the database and of the code").set_defaults(run=show_version)
+    cmd = db.add_parser("reset", help="drop and recreate every table")
+    cmd.add_argument("--yes", action="store_true")
+    cmd.set_defaults(run=reset_db)
+    return root
+
+async def run(argv=None) -> int:
+    args = parser().parse_args(argv)
+    try:
+        return await args.run(args)
+    finally:
+        await engine.dispose()
+
+if __name__ == "__main__":
+    sys.exit(asyncio.run(run()))
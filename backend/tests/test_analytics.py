@@ -0,0 +1,95 @@
+import asyncio
+import pytest
+import uuid
+from sqlalchemy import func, select, text
+from app.core.analytics import rollup_updater
+from app.core.database import SessionLocal
+from app.models.inventory_event import InventoryEvent
+from app.models.sales_rollup import SalesByHour
+from tests.test_sweets import get_token, create_sweet
+
+@pytest.mark.asyncio
+async def test_sales_analytics(client):
+    admin = {"Authorization": f"Bearer {await get_token(client, role='admin')}"}
+    worker = {"Authorization": f"Bearer {await get_token(client)}"}
+    category = f"Cat {uuid.uuid4().hex[:8]}"
+    ladoo = await create_sweet(client, admin["Authorization"][7:], category=category, price=2.0, quantity=100)
+    barfi = await create_sweet(client, admin["Authorization"][7:], category=category, price=5.0, quantity=1000)
+
+    await client.post(f"/api/sweets/{ladoo['id']}/purchase", json={"amount": 30}, headers=worker)
+    await client.post("/api/sweets/checkout", json={"items": [
+        {"sweet_id": ladoo["id"], "amount": 10},
+        {"sweet_id": barfi["id"], "amount": 4},
+    ]}, headers=worker)
+    await client.post(f"/api/sweets/{barfi['id']}/restock", json={"amount": 50}, headers=admin)
+
+    for hours in (1, 24):  # per-minute and per-hour rollups agree
+        response = await client.get("/api/analytics/top-sellers", params={"hours": hours, "category": category}, headers=admin)
+        assert response.status_code == 200
+        assert [(s["sweet_id"], s["units_sold"], s["revenue"]) for s in response.json()] == [
+            (ladoo["id"], 40, 80.0), (barfi["id"], 4, 20.0),
+        ]
+
+    response = await client.get("/api/analytics/revenue-by-category", headers=admin)
+    [mine] = [c for c in response.json() if c["category"] == category]
+    assert (mine["units_sold"], mine["revenue"]) == (44, 100.0)
+
+    # Ladoo: 60 left and selling ten times faster, so it runs out first
+    response = await client.get("/api/analytics/stock-forecast", params={"category": category}, headers=admin)
+    forecast = response.json()
+    assert [f["sweet_id"] for f in forecast] == [ladoo["id"], barfi["id"]]
+    assert forecast[0]["quantity"] == 60
+    # Both rates come back rounded to 3 places: off by up to 0.0005 each, 0.005 once barfi's is scaled by 10
+    assert forecast[0]["units_per_hour"] == pytest.approx(10 * forecast[1]["units_per_hour"], abs=0.0056)
+
+    response = await client.get("/api/analytics/top-sellers", headers=worker)
+    assert response.status_code == 403
+
+@pytest.mark.asyncio
+async def test_rollups_catch_up_after_the_sale(client):
+    admin = {"Authorization": f"Bearer {await get_token(client, role='admin')}"}
+    worker = {"Authorization": f"Bearer {await get_token(client)}"}
+    sweet = await create_sweet(client, admin["Authorization"][7:], price=3.0, quantity=100)
+    await rollup_updater.catch_up()  # whatever earlier tests left
+
+    for _ in range(3):
+        await client.post(f"/api/sweets/{sweet['id']}/purchase", json={"amount": 2}, headers=worker)
+
+    async def sold():
+        async with SessionLocal() as db:
+            return (await db.execute(
+                select(func.sum(SalesByHour.units_sold), func.sum(SalesByHour.revenue)).where(SalesByHour.sweet_id == sweet["id"])
+            )).one()
+
+    # The sales only wrote their events
+    assert await sold() == (None, None)
+
+    # Several workers catching up at once count each event once
+    assert sorted(await asyncio.gather(*(rollup_updater.catch_up() for _ in range(3)))) == [0, 0, 3]
+    assert await sold() == (6, 18.0)
+
+@pytest.mark.asyncio
+async def test_rollups_count_events_committed_out_of_order(client):
+    admin_token = await get_token(client, role="admin")
+    sweet = await create_sweet(client, admin_token, price=1.0, quantity=100)
+    await rollup_updater.catch_up()
+
+    async def log_sale(event_id, amount):
+        async with SessionLocal() as db:
+            await db.execute(text(
+                "INSERT INTO inventory_events (id, sweet_id, kind, delta, created_at) "
+                f"VALUES ({event_id}, {sweet['id']}, 'purchase', {-amount}, CURRENT_TIMESTAMP)"
+            ))
+            await db.commit()
+
+    # Like a Postgres sequence: id n+5 commits and is rolled up before n+2 commits
+    async with SessionLocal() as db:
+        newest = (await db.execute(select(func.max(InventoryEvent.id)))).scalar()
+    await log_sale(newest + 5, 1)
+    assert await rollup_updater.catch_up() == 1
+    await log_sale(newest + 2, 10)
+    assert await rollup_updater.catch_up() == 1
+
+    async with SessionLocal() as db:
+        sold = (await db.execute(select(func.sum(SalesByHour.units_sold)).where(SalesByHour.sweet_id == sweet["id"]))).scalar()
+    assert sold == 11
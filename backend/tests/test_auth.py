@@ -1,5 +1,13 @@
 import pytest
+import time
 import uuid
+from sqlalchemy import event, text
+from app.core.database import SessionLocal, engine, lock_for_write
+from passlib.context import CryptContext
+from app.core.config import settings
+from app.core.security import invalidate_user
+from app.core import refresh_tokens, security
+from app.api.v1 import auth
 
 # Helper to generate unique usernames
 def random_user():
@@ -19,7 +27,16 @@ async def test_register_user(client):
     data = response.json()
     assert data["username"] == username
     assert "id" in data
-    assert data["role"] == "worker"
+    assert data["role"] == "customer"
+
+@pytest.mark.asyncio
+async def test_register_refuses_privileged_roles(client):
+    for role, code in (("admin", 403), ("superadmin", 403), ("worker", 403), ("boss", 400)):
+        response = await client.post("/api/auth/register", json={"username": random_user(), "password": "pw", "role": role})
+        assert response.status_code == code
+
+    response = await client.post("/api/auth/register", json={"username": random_user(), "password": "pw", "role": "customer"})
+    assert response.json()["role"] == "customer"
 
 @pytest.mark.asyncio
 async def test_login_user(client):
@@ -44,4 +61,150 @@ async def test_login_user(client):
     assert response.status_code == 200
     data = response.json()
     assert "access_token" in data
-    assert data["token_type"] == "bearer"
\ No newline at end of file
+    assert data["token_type"] == "bearer"
+
+async def register_and_login(client, role="worker"):
+    username = random_user()
+    password = "mypassword"
+    await client.post("/api/auth/register", json={"username": username, "password": password})
+    if role != "worker":
+        async with engine.begin() as conn:
+            await conn.execute(text(f"UPDATE users SET role = '{role}' WHERE username = '{username}'"))
+    response = await client.post(
+        "/api/auth/login",
+        data={"username": username, "password": password},
+        headers={"Content-Type": "application/x-www-form-urlencoded"}
+    )
+    return username, response.json()["access_token"]
+
+@pytest.mark.asyncio
+async def test_authenticated_requests_skip_user_lookup(client, monkeypatch):
+    _, token = await register_and_login(client, role="admin")
+    headers = {"Authorization": f"Bearer {token}"}
+    monkeypatch.setattr(security, "_revocations_polled", time.monotonic())  # between revocation polls
+
+    statements = []
+    def record(conn, cursor, statement, *args):
+        statements.append(statement)
+
+    # Admin-only endpoint that itself doesn't touch the DB
+    event.listen(engine.sync_engine, "before_cursor_execute", record)
+    try:
+        for _ in range(3):
+            response = await client.get("/api/sweets/cache/stats", headers=headers)
+            assert response.status_code == 200
+    finally:
+        event.remove(engine.sync_engine, "before_cursor_execute", record)
+    assert statements == []
+
+@pytest.mark.asyncio
+async def test_invalidate_user_revokes_existing_tokens(client):
+    username, token = await register_and_login(client, role="admin")
+    headers = {"Authorization": f"Bearer {token}"}
+    assert (await client.get("/api/sweets/cache/stats", headers=headers)).status_code == 200
+
+    # Role changed: old token (and its cached principal) no longer accepted
+    async with engine.begin() as conn:
+        await conn.execute(text(f"UPDATE users SET role = 'worker' WHERE username = '{username}'"))
+    invalidate_user(username)
+    assert (await client.get("/api/sweets/cache/stats", headers=headers)).status_code == 401
+
+    # Fresh login carries the new role
+    response = await client.post(
+        "/api/auth/login",
+        data={"username": username, "password": "mypassword"},
+        headers={"Content-Type": "application/x-www-form-urlencoded"}
+    )
+    headers = {"Authorization": f"Bearer {response.json()['access_token']}"}
+    assert (await client.get("/api/sweets/cache/stats", headers=headers)).status_code == 403
+
+@pytest.mark.asyncio
+async def test_revocations_reach_other_workers(client, monkeypatch):
+    username, token = await register_and_login(client, role="admin")
+    headers = {"Authorization": f"Bearer {token}"}
+    assert (await client.get("/api/sweets/cache/stats", headers=headers)).status_code == 200
+
+    # Another worker demotes the user: it records the revocation, but this
+    # process's invalidate_user is never called
+    async with SessionLocal() as db:
+        await lock_for_write(db)
+        await db.execute(text(f"UPDATE users SET role = 'worker' WHERE username = '{username}'"))
+        await security.record_revocations(db, [username])
+        await db.commit()
+
+    # Until the next poll the cached principal still answers...
+    monkeypatch.setattr(security, "_revocations_polled", time.monotonic())
+    assert (await client.get("/api/sweets/cache/stats", headers=headers)).status_code == 200
+    # ...and after it the old token is refused
+    monkeypatch.setattr(settings, "AUTH_REVOCATION_POLL_SECONDS", 0)
+    assert (await client.get("/api/sweets/cache/stats", headers=headers)).status_code == 401
+
+
+@pytest.mark.asyncio
+async def test_login_rehashes_outdated_password(client):
+    username = random_user()
+    await client.post("/api/auth/register", json={"username": username, "password": "mypassword"})
+
+    # Pretend the stored hash was made with older, different cost parameters
+    old_hash = CryptContext(schemes=["argon2"], argon2__rounds=settings.ARGON2_TIME_COST + 1).hash("mypassword")
+    async with engine.begin() as conn:
+        await conn.execute(text("UPDATE users SET hashed_password = :h WHERE username = :u"), {"h": old_hash, "u": username})
+
+    response = await client.post(
+        "/api/auth/login",
+        data={"username": username, "password": "mypassword"},
+        headers={"Content-Type": "application/x-www-form-urlencoded"}
+    )
+    assert response.status_code == 200
+
+    async with engine.connect() as conn:
+        new_hash = await conn.scalar(text("SELECT hashed_password FROM users WHERE username = :u"), {"u": username})
+    assert new_hash != old_hash
+    assert f"t={settings.ARGON2_TIME_COST}," in new_hash
+
+@pytest.mark.asyncio
+async def test_register_sheds_load_when_hash_pool_saturated(client, monkeypatch):
+    monkeypatch.setattr(settings, "PASSWORD_HASH_MAX_PENDING", 0)
+    response = await client.post("/api/auth/register", json={"username": random_user(), "password": "pw"})
+    assert response.status_code == 503
+    assert response.headers["Retry-After"] == "1"
+
+@pytest.mark.asyncio
+async def test_refresh_token_rotation(client, monkeypatch):
+    username = random_user()
+    await client.post("/api/auth/register", json={"username": username, "password": "mypassword"})
+    login = (await client.post("/api/auth/login", data={"username": username, "password": "mypassword"})).json()
+    first = login["refresh_token"]
+
+    # No password check on refresh, and the role comes from the user row as it is now
+    async def no_argon2(*args):
+        raise AssertionError("refresh must not hash")
+    monkeypatch.setattr(auth, "verify_password_async", no_argon2)
+    async with engine.begin() as conn:
+        await conn.execute(text("UPDATE users SET role = 'admin' WHERE username = :u"), {"u": username})
+    response = await client.post("/api/auth/refresh", json={"refresh_token": first})
+    assert response.status_code == 200
+    pair = response.json()
+    assert pair["refresh_token"] != first
+    headers = {"Authorization": f"Bearer {pair['access_token']}"}
+    assert (await client.get("/api/sweets/cache/stats", headers=headers)).status_code == 200
+
+    second = (await client.post("/api/auth/refresh", json={"refresh_token": pair["refresh_token"]})).json()["refresh_token"]
+
+    # Replaying a spent token revokes the whole family, including the latest one
+    assert (await client.post("/api/auth/refresh", json={"refresh_token": first})).status_code == 401
+    assert (await client.post("/api/auth/refresh", json={"refresh_token": second})).status_code == 401
+    assert (await client.post("/api/auth/refresh", json={"refresh_token": "nope.nope"})).status_code == 401
+
+@pytest.mark.asyncio
+async def test_logout_revokes_refresh_token(client):
+    username = random_user()
+    await client.post("/api/auth/register", json={"username": username, "password": "mypassword"})
+    token = (await client.post("/api/auth/login", data={"username": username, "password": "mypassword"})).json()["refresh_token"]
+
+    assert (await client.post("/api/auth/logout", json={"refresh_token": token})).status_code == 200
+    assert (await client.post("/api/auth/refresh", json={"refresh_token": token})).status_code == 401
+
+    # Other workers only see the column: still refused without this one's memory
+    refresh_tokens._revoked_families.clear()
+    assert (await client.post("/api/auth/refresh", json={"refresh_token": token})).status_code == 401
@@ -0,0 +1,31 @@
+import pytest
+from app.core.metrics import Histogram
+from tests.test_sweets import get_token, create_sweet
+
+@pytest.mark.asyncio
+async def test_server_timing_and_metrics(client):
+    token = await get_token(client, role="admin")  # logs in: Argon2 verify
+    sweet = await create_sweet(client, token)
+
+    response = await client.post(f"/api/sweets/{sweet['id']}/purchase", json={"amount": 1}, headers={"Authorization": f"Bearer {token}"})
+    timing = response.headers["server-timing"]
+    assert timing.startswith("app;dur=") and "db;dur=" in timing and "queries" in timing
+
+    body = (await client.get("/metrics")).text
+    assert 'http_request_duration_seconds_count{method="POST",route="/api/sweets/{sweet_id}/purchase",status="200"}' in body
+    assert 'http_request_db_queries_bucket{route="/api/sweets/{sweet_id}/purchase",le="+Inf"}' in body
+    assert 'password_hash_duration_seconds_count{operation="verify_and_update"}' in body
+    assert "db_query_duration_seconds_count" in body
+    assert "db_pool_checkout_wait_seconds_count" in body
+
+def test_histogram_render():
+    h = Histogram("demo_seconds", "Demo", ("route",), buckets=(0.1, 1))
+    for value in (0.05, 0.5, 5):
+        h.observe(value, "/x")
+    assert h.render().splitlines()[2:] == [
+        'demo_seconds_bucket{route="/x",le="0.1"} 1',
+        'demo_seconds_bucket{route="/x",le="1"} 2',
+        'demo_seconds_bucket{route="/x",le="+Inf"} 3',
+        'demo_seconds_sum{route="/x"} 5.55',
+        'demo_seconds_count{route="/x"} 3',
+    ]
@@ -0,0 +1,83 @@
+import asyncio
+import pytest
+from sqlalchemy import event, inspect, text
+from sqlalchemy.ext.asyncio import create_async_engine
+from sqlalchemy.pool import NullPool
+from app.core import migrations
+from app.core.database import tune_sqlite
+
+def sqlite_engine(path):
+    engine = create_async_engine(f"sqlite+aiosqlite:///{path}", poolclass=NullPool)
+    tune_sqlite(engine)
+    return engine
+
+@pytest.mark.asyncio
+async def test_adopts_unversioned_database(tmp_path):
+    # A database create_all made before sweets.is_veg and before versioning
+    engine = sqlite_engine(tmp_path / "old.db")
+    async with engine.begin() as conn:
+        await conn.execute(text("CREATE TABLE sweets (id INTEGER PRIMARY KEY, name VARCHAR, category VARCHAR, price FLOAT, quantity INTEGER, image_url VARCHAR)"))
+        await conn.execute(text("INSERT INTO sweets (name, category, price, quantity) VALUES ('Ladoo', 'Indian', 1, 5)"))
+
+    assert await migrations.current_version(engine) is None
+    assert await migrations.migrate(engine) == ["adopted, added sweets.is_veg"]
+    assert await migrations.current_version(engine) == migrations.latest_version()
+    async with engine.connect() as conn:
+        assert (await conn.execute(text("SELECT name, is_veg FROM sweets"))).all() == [("Ladoo", 1)]
+        # Existing rows made it into the search index, and the newer tables exist
+        assert (await conn.execute(text("SELECT rowid FROM sweets_fts WHERE sweets_fts MATCH 'ladoo'"))).all() == [(1,)]
+        assert (await conn.execute(text("SELECT count(*) FROM refresh_tokens"))).scalar() == 0
+
+    assert await migrations.migrate(engine) == []
+    await engine.dispose()
+
+@pytest.mark.asyncio
+async def test_pending_migrations_run_once(tmp_path, monkeypatch):
+    engine = sqlite_engine(tmp_path / "app.db")
+    assert await migrations.migrate(engine) == ["created"]
+
+    calls = []
+    def add_note(conn):
+        calls.append(1)
+        conn.exec_driver_sql("ALTER TABLE sweets ADD COLUMN note VARCHAR")
+    step = migrations.latest_version() + 1
+    monkeypatch.setattr(migrations, "MIGRATIONS", [*migrations.MIGRATIONS, (step, "sweets.note", add_note)])
+
+    # Three workers booting at once: one migrates, the others find it done
+    workers = [sqlite_engine(tmp_path / "app.db") for _ in range(3)]
+    results = await asyncio.gather(*(migrations.migrate(worker) for worker in workers))
+    assert sorted(results) == [[], [], [f"{step}: sweets.note"]]
+    assert calls == [1]
+    assert await migrations.current_version(engine) == step
+
+    # A current database costs one query and no DDL
+    statements = []
+    event.listen(engine.sync_engine, "before_cursor_execute", lambda *args: statements.append(args[2]))
+    assert await migrations.migrate(engine) == []
+    assert len(statements) == 1 and "schema_version" in statements[0]
+
+    for e in (engine, *workers):
+        await e.dispose()
+
+@pytest.mark.asyncio
+async def test_existing_events_count_as_rolled_up(tmp_path):
+    # A version 1 database: its rollups already count every logged event
+    engine = sqlite_engine(tmp_path / "v1.db")
+    await migrations.migrate(engine)
+    async with engine.begin() as conn:
+        await conn.execute(text("DROP INDEX ix_inventory_events_pending"))
+        await conn.execute(text("ALTER TABLE inventory_events DROP COLUMN rolled_up"))
+        await conn.execute(text("DROP TABLE token_revocations"))
+        await conn.execute(text("UPDATE schema_version SET version = 1"))
+        await conn.execute(text("INSERT INTO inventory_events (sweet_id, kind, delta, created_at) VALUES (1, 'purchase', -2, '2026-01-01'), (1, 'restock', 5, '2026-01-01')"))
+
+    assert await migrations.migrate(engine) == ["2: rollup_progress", "3: token_revocations", "4: inventory_events.rolled_up"]
+    async with engine.connect() as conn:
+        assert (await conn.execute(text("SELECT id, rolled_up FROM inventory_events"))).all() == [(1, 1), (2, 1)]
+        await conn.execute(text("INSERT INTO inventory_events (sweet_id, kind, delta, created_at) VALUES (1, 'purchase', -1, '2026-01-02')"))
+        # Only the new one is pending, and that lookup uses the partial index
+        plan = (await conn.execute(text("EXPLAIN QUERY PLAN SELECT id FROM inventory_events WHERE rolled_up IS NULL"))).all()
+        assert "ix_inventory_events_pending" in str(plan)
+        assert (await conn.execute(text("SELECT id FROM inventory_events WHERE rolled_up IS NULL"))).all() == [(3,)]
+        assert not (await conn.run_sync(lambda sync: inspect(sync).has_table("rollup_progress")))
+    await engine.dispose()
@@ -0,0 +1,69 @@
+import uuid
+import pytest
+from httpx import AsyncClient, ASGITransport
+from app.main import app
+from app.core.config import settings
+from app.core.ratelimit import HIGH, LOW, NORMAL, AdmissionController, MemoryRateLimitBackend, priority
+from tests.test_sweets import get_token, create_sweet
+
+def client_from(ip):
+    return AsyncClient(transport=ASGITransport(app=app, client=(ip, 1234)), base_url="http://test")
+
+@pytest.mark.asyncio
+async def test_login_rate_limited_per_ip(monkeypatch):
+    monkeypatch.setattr(settings, "RATE_LIMIT_AUTH_BURST", 2)
+    credentials = {"username": f"nobody_{uuid.uuid4().hex[:8]}", "password": "wrong"}
+    async with client_from("10.1.0.1") as client:
+        statuses = [(await client.post("/api/auth/login", data=credentials)).status_code for _ in range(3)]
+        assert statuses == [401, 401, 429]
+        limited = await client.post("/api/auth/login", data=credentials)
+        assert int(limited.headers["Retry-After"]) >= 1
+    # Someone else's budget is untouched
+    async with client_from("10.1.0.2") as client:
+        assert (await client.post("/api/auth/login", data=credentials)).status_code == 401
+
+@pytest.mark.asyncio
+async def test_browse_budget_is_per_user(client, monkeypatch):
+    first, second = await get_token(client), await get_token(client)
+    monkeypatch.setattr(settings, "RATE_LIMIT_BROWSE_BURST", 1)
+    async with client_from("10.1.0.3") as shared_ip:
+        for token in (first, second):
+            response = await shared_ip.get("/api/sweets/suggest", params={"q": "x"}, headers={"Authorization": f"Bearer {token}"})
+            assert response.status_code == 200
+        response = await shared_ip.get("/api/sweets/suggest", params={"q": "x"}, headers={"Authorization": f"Bearer {first}"})
+        assert response.status_code == 429
+
+@pytest.mark.asyncio
+async def test_token_bucket_refills():
+    backend = MemoryRateLimitBackend(100)
+    assert await backend.take("k", rate=1000, burst=1) == 0
+    wait = await backend.take("k", rate=1000, burst=1)
+    assert 0 < wait <= 0.001
+
+def test_admission_sheds_low_priority_first(monkeypatch):
+    monkeypatch.setattr(settings, "ADMISSION_LOW_PRIORITY_IN_FLIGHT", 1)
+    monkeypatch.setattr(settings, "ADMISSION_MAX_IN_FLIGHT", 2)
+    controller = AdmissionController()
+    assert controller.admit(LOW)
+    assert not controller.admit(LOW)
+    assert controller.admit(NORMAL)
+    assert not controller.admit(NORMAL)
+    assert controller.admit(HIGH)  # sales always get in
+    assert controller.shed == {LOW: 1, NORMAL: 1}
+
+    assert priority("POST", "/api/sweets/7/purchase") == HIGH
+    assert priority("GET", "/api/sweets/search") == LOW
+    assert priority("POST", "/api/auth/login") == NORMAL
+    assert priority("GET", "/api/events") is None
+
+@pytest.mark.asyncio
+async def test_overloaded_reads_get_503_but_sales_go_through(client, monkeypatch):
+    token = await get_token(client, role="admin")
+    sweet = await create_sweet(client, token)
+    monkeypatch.setattr(settings, "ADMISSION_LOW_PRIORITY_IN_FLIGHT", 0)
+
+    shed = await client.get("/api/sweets/")
+    assert shed.status_code == 503
+    assert shed.headers["Retry-After"] == "1"
+    purchase = await client.post(f"/api/sweets/{sweet['id']}/purchase", json={"amount": 1}, headers={"Authorization": f"Bearer {token}"})
+    assert purchase.status_code == 200
@@ -0,0 +1,90 @@
+import time
+import pytest
+from app.core.config import settings
+from app.core.inventory import inventory_writer
+from app.core.reservations import reservation_ledger
+from tests.test_sweets import get_token, create_sweet
+
+def auth(token):
+    return {"Authorization": f"Bearer {token}"}
+
+@pytest.mark.asyncio
+async def test_held_stock_is_kept_from_other_buyers(client):
+    admin = await get_token(client, role="admin")
+    sweet = await create_sweet(client, admin, quantity=5)
+    alice, bob = await get_token(client), await get_token(client)
+
+    hold = await client.post("/api/reservations/", json={"sweet_id": sweet["id"], "amount": 4}, headers=auth(alice))
+    assert hold.status_code == 200
+    assert (await client.post("/api/reservations/", json={"sweet_id": sweet["id"], "amount": 2}, headers=auth(bob))).status_code == 400
+
+    # Bob can only buy what nobody holds
+    assert (await client.post(f"/api/sweets/{sweet['id']}/purchase", json={"amount": 2}, headers=auth(bob))).status_code == 400
+    assert (await client.post(f"/api/sweets/{sweet['id']}/purchase", json={"amount": 1}, headers=auth(bob))).status_code == 200
+    checkout = await client.post("/api/sweets/checkout", json={"items": [{"sweet_id": sweet["id"]}]}, headers=auth(bob))
+    assert checkout.status_code == 400
+    available = (await client.get(f"/api/reservations/available/{sweet['id']}")).json()
+    assert available == {"sweet_id": sweet["id"], "quantity": 4, "held": 4, "available": 0}
+
+    # Alice's hold is still there to buy
+    assert [h["id"] for h in (await client.get("/api/reservations/", headers=auth(alice))).json()] == [hold.json()["id"]]
+    assert (await client.post("/api/reservations/confirm", json={}, headers=auth(bob))).status_code == 404
+    confirmed = await client.post("/api/reservations/confirm", json={"ids": [hold.json()["id"]]}, headers=auth(alice))
+    assert confirmed.status_code == 200
+    assert confirmed.json()[0]["quantity"] == 0
+    assert reservation_ledger.held(sweet["id"]) == 0
+    assert (await client.get("/api/reservations/", headers=auth(alice))).json() == []
+    await reservation_ledger.stop()
+
+@pytest.mark.asyncio
+async def test_released_and_expired_holds_free_stock(client):
+    admin = await get_token(client, role="admin")
+    sweet = await create_sweet(client, admin, quantity=3)
+    alice, bob = await get_token(client), await get_token(client)
+
+    hold = (await client.post("/api/reservations/", json={"sweet_id": sweet["id"], "amount": 3}, headers=auth(alice))).json()
+    assert (await client.delete(f"/api/reservations/{hold['id']}", headers=auth(bob))).status_code == 404
+    assert (await client.delete(f"/api/reservations/{hold['id']}", headers=auth(alice))).status_code == 200
+    assert reservation_ledger.held(sweet["id"]) == 0
+
+    for _ in range(3):
+        await client.post("/api/reservations/", json={"sweet_id": sweet["id"], "amount": 1, "ttl_seconds": 60}, headers=auth(alice))
+    assert reservation_ledger.held(sweet["id"]) == 3
+    # All three run out together and go in one sweep
+    assert reservation_ledger.expire(time.time() + 61) >= 3
+    assert reservation_ledger.held(sweet["id"]) == 0
+    assert (await client.post(f"/api/sweets/{sweet['id']}/purchase", json={"amount": 3}, headers=auth(bob))).status_code == 200
+    assert (await client.post("/api/reservations/", json={"sweet_id": 999999999}, headers=auth(alice))).status_code == 404
+    await reservation_ledger.stop()
+
+@pytest.mark.asyncio
+async def test_confirm_takes_each_hold_once(client):
+    admin = await get_token(client, role="admin")
+    sweet = await create_sweet(client, admin, quantity=10)
+    alice, bob = await get_token(client), await get_token(client)
+
+    await client.post("/api/reservations/", json={"sweet_id": sweet["id"], "amount": 5}, headers=auth(bob))
+    hold = (await client.post("/api/reservations/", json={"sweet_id": sweet["id"], "amount": 1}, headers=auth(alice))).json()
+    confirmed = await client.post("/api/reservations/confirm", json={"ids": [hold["id"], hold["id"]]}, headers=auth(alice))
+    assert confirmed.status_code == 200
+    assert confirmed.json()[0]["quantity"] == 9
+    # Bob's hold is intact and nothing is left claimed
+    assert reservation_ledger.held(sweet["id"]) == 5
+    assert reservation_ledger.available(sweet["id"]) == 4
+    await reservation_ledger.stop()
+
+@pytest.mark.asyncio
+async def test_holds_bind_write_behind_sales(client, monkeypatch):
+    monkeypatch.setattr(settings, "INVENTORY_WRITE_BEHIND", True)
+    admin = await get_token(client, role="admin")
+    sweet = await create_sweet(client, admin, quantity=2)
+    alice, bob = await get_token(client), await get_token(client)
+
+    hold = (await client.post("/api/reservations/", json={"sweet_id": sweet["id"], "amount": 1}, headers=auth(alice))).json()
+    assert (await client.post(f"/api/sweets/{sweet['id']}/purchase", json={"amount": 2}, headers=auth(bob))).status_code == 400
+    assert (await client.post(f"/api/sweets/{sweet['id']}/purchase", json={"amount": 1}, headers=auth(bob))).status_code == 200
+    confirmed = await client.post("/api/reservations/confirm", json={"ids": [hold["id"]]}, headers=auth(alice))
+    assert confirmed.status_code == 200
+    assert confirmed.json()[0]["quantity"] == 0
+    await inventory_writer.stop()
+    await reservation_ledger.stop()
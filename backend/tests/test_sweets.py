@@ -1,11 +1,58 @@
+import asyncio
+import hashlib
+import json
 import pytest
+import time
 import uuid
-from sqlalchemy import text
-from app.core.database import engine
+import warnings
+from datetime import datetime
+from types import SimpleNamespace
+from fastapi import HTTPException
+from jose import jwt
+from sqlalchemy import create_engine, text
+from app.core import catalog_snapshot, database, idempotency, responses, suggest
+from app.core.database import engine, Base
+from app.core.search import install_search_index
+from app.core.config import settings
+from app.core.inventory import inventory_writer
+from app.core.pubsub import Broadcaster, broadcaster, sse_stream
+from app.core.cache import catalog_cache, catalog_key, invalidate_catalog, sweet_key
+from app.core.compression import ENCODINGS, choose_encoding
+from app.core.catalog_snapshot import CatalogSnapshot
+from app.core.suggest import PrefixIndex
+from app.core.security import create_access_token, user_id_from_authorization
+from app.api.v1 import sweets as sweets_api
 
 def random_user():
     return f"admin_{uuid.uuid4().hex[:8]}"
 
+async def get_token(client, role="worker"):
+    # Register, optionally promote via direct SQL, then log in
+    username = random_user()
+    password = "password"
+    await client.post("/api/auth/register", json={"username": username, "password": password})
+    if role != "worker":
+        async with engine.begin() as conn:
+            await conn.execute(text(f"UPDATE users SET role = '{role}' WHERE username = '{username}'"))
+    login_res = await client.post(
+        "/api/auth/login",
+        data={"username": username, "password": password},
+        headers={"Content-Type": "application/x-www-form-urlencoded"}
+    )
+    return login_res.json()["access_token"]
+
+async def create_sweet(client, token, **overrides):
+    payload = {
+        "name": f"Sweet {uuid.uuid4().hex[:8]}",
+        "category": "Candy",
+        "price": 1.5,
+        "quantity": 10,
+        **overrides,
+    }
+    response = await client.post("/api/sweets/", json=payload, headers={"Authorization": f"Bearer {token}"})
+    assert response.status_code == 200
+    return response.json()
+
 @pytest.mark.asyncio
 async def test_create_sweet(client):
     username = random_user()
@@ -52,4 +99,689 @@ async def test_list_sweets(client):
     
     assert response.status_code == 200
     data = response.json()
-    assert isinstance(data, list)
\ No newline at end of file
+    assert isinstance(data, list)
+
+@pytest.mark.asyncio
+async def test_list_sweets_pagination(client):
+    admin_token = await get_token(client, role="admin")
+    created = [await create_sweet(client, admin_token) for _ in range(3)]
+    after = created[0]["id"] - 1
+
+    response = await client.get("/api/sweets/", params={"limit": 2, "after": after, "fields": "name,price"})
+    assert response.status_code == 200
+    page = response.json()
+    assert page == [{"id": s["id"], "name": s["name"], "price": s["price"]} for s in created[:2]]
+
+    # Follow the cursor to the next page
+    response = await client.get("/api/sweets/", params={"limit": 2, "after": response.headers["X-Next-After"]})
+    assert response.json()[0] == created[2]
+
+    response = await client.get("/api/sweets/", params={"fields": "name,password"})
+    assert response.status_code == 400
+
+@pytest.mark.asyncio
+async def test_list_sweets_ndjson(client):
+    admin_token = await get_token(client, role="admin")
+    sweet = await create_sweet(client, admin_token)
+
+    response = await client.get("/api/sweets/", params={"format": "ndjson", "after": sweet["id"] - 1})
+    assert response.headers["content-type"].startswith("application/x-ndjson")
+    lines = response.text.splitlines()
+    assert json.loads(lines[0]) == sweet
+
+def test_fast_json_matches_stdlib(monkeypatch):
+    # orjson is optional: with or without it, clients (and ETags) see the same bytes
+    rows = [
+        {"id": 1, "name": "Kaju Katli काजू", "price": 5.99, "quantity": 0, "image_url": None, "is_veg": True},
+        {"id": 2, "created_at": datetime(2024, 5, 1, 12, 30), "at": datetime(2024, 5, 1, 12, 30, 0, 250000)},
+    ]
+    fast = responses.dumps(rows)
+    monkeypatch.setattr(responses, "orjson", None)
+    assert responses.dumps(rows) == fast
+
+def test_plain_rows_without_deprecation_warnings():
+    with create_engine("sqlite://").connect() as conn, warnings.catch_warnings():
+        warnings.simplefilter("error")
+        assert responses.plain_rows(conn.execute(text("SELECT 1 AS id, 'Ladoo' AS name"))) == [{"id": 1, "name": "Ladoo"}]
+
+@pytest.mark.asyncio
+async def test_search_sweets(client):
+    admin_token = await get_token(client, role="admin")
+    tag = uuid.uuid4().hex[:8]
+    lava = await create_sweet(client, admin_token, name=f"Chocolate Lava {tag}", category="Cake", price=6.0)
+    bar = await create_sweet(client, admin_token, name=f"Dark Chocolate {tag}", category="Bar", price=3.0)
+    await create_sweet(client, admin_token, name=f"Gulab Jamun {tag}", category="Indian", price=2.0)
+
+    # Word prefixes, in any order
+    response = await client.get("/api/sweets/search", params={"name": f"choc {tag}"})
+    assert {s["id"] for s in response.json()} == {lava["id"], bar["id"]}
+
+    response = await client.get("/api/sweets/search", params={"name": tag, "category": "cak"})
+    assert [s["id"] for s in response.json()] == [lava["id"]]
+
+    response = await client.get("/api/sweets/search", params={"name": tag, "max_price": 4})
+    assert sorted(s["price"] for s in response.json()) == [2.0, 3.0]
+
+    # Renames are picked up by the index
+    headers = {"Authorization": f"Bearer {admin_token}"}
+    await client.put(f"/api/sweets/{bar['id']}", json={"name": f"Toffee {tag}"}, headers=headers)
+    response = await client.get("/api/sweets/search", params={"name": f"choc {tag}"})
+    assert [s["id"] for s in response.json()] == [lava["id"]]
+
+@pytest.mark.asyncio
+async def test_suggest_sweets(client):
+    admin_token = await get_token(client, role="admin")
+    headers = {"Authorization": f"Bearer {admin_token}"}
+    tag = uuid.uuid4().hex[:8]
+    sweet = await create_sweet(client, admin_token, name=f"Rasgulla {tag}", category="Bengali")
+
+    response = await client.get("/api/sweets/suggest", params={"q": f"{tag} rasg"})
+    assert response.json() == [{"id": sweet["id"], "name": sweet["name"]}]
+
+    # Matches on category words too
+    response = await client.get("/api/sweets/suggest", params={"q": f"beng {tag}"})
+    assert [s["id"] for s in response.json()] == [sweet["id"]]
+
+    # Kept in sync by update and delete
+    await client.put(f"/api/sweets/{sweet['id']}", json={"name": f"Sandesh {tag}"}, headers=headers)
+    response = await client.get("/api/sweets/suggest", params={"q": f"{tag} rasg"})
+    assert response.json() == []
+    response = await client.get("/api/sweets/suggest", params={"q": f"{tag} sand"})
+    assert [s["name"] for s in response.json()] == [f"Sandesh {tag}"]
+
+    await client.delete(f"/api/sweets/{sweet['id']}", headers=headers)
+    response = await client.get("/api/sweets/suggest", params={"q": tag})
+    assert response.json() == []
+
+class PausedRead:
+    # Stands in for SessionLocal: the query returns `rows` once `go` is set
+    def __init__(self, rows):
+        self.rows, self.go = rows, asyncio.Event()
+
+    def __call__(self):
+        return self
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        pass
+
+    async def execute(self, query):
+        await self.go.wait()
+        return SimpleNamespace(all=lambda: self.rows)
+
+@pytest.mark.asyncio
+async def test_suggest_reload_keeps_local_changes(monkeypatch):
+    index = PrefixIndex()
+    index.rebuild([(1, "Ladoo", "Indian")])
+    read = PausedRead([(1, "Ladoo", "Indian")])
+    monkeypatch.setattr(suggest, "SessionLocal", read)
+
+    # A background refresh reads, then this worker adds a sweet before the rows come back
+    reload = asyncio.create_task(index.load())
+    await asyncio.sleep(0)
+    index.add(2, "Barfi", "Indian")
+    read.go.set()
+    await reload
+    assert index.lookup("barfi") == [{"id": 2, "name": "Barfi"}]
+
+@pytest.mark.asyncio
+async def test_catalog_snapshot_reload_keeps_local_changes(monkeypatch):
+    snapshot = CatalogSnapshot()
+    snapshot.rebuild([(1, "Ladoo", "Indian", 2.0, 10, True)])
+    read = PausedRead([(1, "Ladoo", "Indian", 2.0, 10, True)])
+    monkeypatch.setattr(catalog_snapshot, "SessionLocal", read)
+
+    reload = asyncio.create_task(snapshot.load())
+    await asyncio.sleep(0)
+    snapshot.set_quantity(1, 4)  # a sale on this worker while the rows are on their way
+    read.go.set()
+    await reload
+    assert snapshot.quantity(1) == 4
+
+    # Not loaded yet: a load that overlaps a change reads again
+    snapshot.invalidate()
+    read.go.clear()
+    read.rows = [(1, "Ladoo", "Indian", 2.0, 4, True), (2, "Barfi", "Indian", 3.0, 1, True)]
+    load = asyncio.create_task(snapshot.load())
+    await asyncio.sleep(0)
+    snapshot.upsert(2, "Barfi", "Indian", 3.0, 1, True)
+    read.go.set()
+    await load
+    assert snapshot.ready and snapshot.quantity(2) == 1
+
+def test_catalog_snapshot_query():
+    snapshot = CatalogSnapshot()
+    snapshot.rebuild([
+        (3, "Barfi", "Indian", 4.0, 0, True),
+        (1, "Truffle", "Chocolate", 12.0, 5, True),
+        (2, "Fudge", "Chocolate", 6.0, 2, False),
+        (4, "Ladoo", "Indian", None, 9, None),
+    ])
+    page = snapshot.query(categories=["Chocolate"], sort="-price", price_bands=(5, 10))
+    assert page["total"] == 2 and page["ids"] == [1, 2]
+    # The category facet ignores the category filter; the others apply it
+    assert {f["value"]: f["count"] for f in page["facets"]["category"]} == {"Indian": 2, "Chocolate": 2}
+    assert page["facets"]["is_veg"] == [{"value": True, "count": 1}, {"value": False, "count": 1}]
+    assert [band["count"] for band in page["facets"]["price"]] == [0, 1, 1]
+
+    assert snapshot.query(in_stock=True, sort="name", limit=2)["ids"] == [2, 4]
+    assert snapshot.query(sort="price", offset=1, limit=2)["ids"] == [2, 1]  # unpriced last
+
+    snapshot.set_quantity(3, 7)
+    snapshot.upsert(5, "Halwa", "Indian", 1.0, 3, True)
+    snapshot.remove(1)
+    assert snapshot.query(in_stock=True, sort="price")["ids"] == [5, 3, 2, 4]
+
+@pytest.mark.asyncio
+async def test_browse_sweets(client):
+    token = await get_token(client, role="admin")
+    headers = {"Authorization": f"Bearer {token}"}
+    category = f"Browse {uuid.uuid4().hex[:8]}"
+    cheap = await create_sweet(client, token, category=category, price=3.0, quantity=1, is_veg=False)
+    dear = await create_sweet(client, token, category=category, price=8.0, quantity=5)
+    await create_sweet(client, token, category=category, price=15.0, quantity=0)
+
+    response = await client.get("/api/sweets/browse", params={"category": category, "in_stock": True, "sort": "-price"})
+    assert response.status_code == 200
+    page = response.json()
+    assert page["total"] == 2
+    assert [item["id"] for item in page["items"]] == [dear["id"], cheap["id"]]
+    assert page["facets"]["in_stock"] == [{"value": True, "count": 2}, {"value": False, "count": 1}]
+
+    # Kept current by the write handlers
+    await client.post(f"/api/sweets/{cheap['id']}/purchase", json={"amount": 1}, headers=headers)
+    page = (await client.get("/api/sweets/browse", params={"category": category, "in_stock": True})).json()
+    assert [item["id"] for item in page["items"]] == [dear["id"]]
+    await client.put(f"/api/sweets/{dear['id']}", json={"is_veg": False}, headers=headers)
+    page = (await client.get("/api/sweets/browse", params={"category": category, "is_veg": False})).json()
+    assert page["total"] == 2
+    await client.delete(f"/api/sweets/{dear['id']}", headers=headers)
+    page = (await client.get("/api/sweets/browse", params={"category": category, "is_veg": False})).json()
+    assert [item["id"] for item in page["items"]] == [cheap["id"]]
+    assert page["items"][0]["quantity"] == 0
+
+@pytest.mark.asyncio
+async def test_single_sweet_cache_skips_rows_read_before_a_write(client, monkeypatch):
+    sweet = await create_sweet(client, await get_token(client, role="admin"), quantity=10)
+    cache_rows = sweets_api.cache_sweets
+
+    async def write_meanwhile(rows, version):
+        # The read is done; a write commits and invalidates before we cache
+        async with engine.begin() as conn:
+            await conn.execute(text(f"UPDATE sweets SET quantity = 3 WHERE id = {sweet['id']}"))
+        await invalidate_catalog(sweet["id"])
+        await cache_rows(rows, version)
+
+    monkeypatch.setattr(sweets_api, "cache_sweets", write_meanwhile)
+    await catalog_cache.delete(sweet_key(sweet["id"]))
+    response = await client.get(f"/api/sweets/{sweet['id']}")
+    assert response.json()["quantity"] == 10
+    assert await catalog_cache.get(sweet_key(sweet["id"])) is None
+    monkeypatch.undo()
+
+    response = await client.get(f"/api/sweets/{sweet['id']}")
+    assert response.json()["quantity"] == 3
+
+@pytest.mark.asyncio
+async def test_catalog_cache_and_etag(client):
+    admin_token = await get_token(client, role="admin")
+    headers = {"Authorization": f"Bearer {admin_token}"}
+    sweet = await create_sweet(client, admin_token, quantity=4)
+    params = {"after": sweet["id"] - 1}
+
+    first = await client.get("/api/sweets/", params=params)
+    etag = first.headers["ETag"]
+    stats_before = (await client.get("/api/sweets/cache/stats", headers=headers)).json()
+
+    # Unchanged catalog: served from cache, and 304 with no body for a matching ETag
+    again = await client.get("/api/sweets/", params=params)
+    assert again.content == first.content
+    not_modified = await client.get("/api/sweets/", params=params, headers={"If-None-Match": etag})
+    assert not_modified.status_code == 304
+    assert not_modified.content == b""
+
+    stats = (await client.get("/api/sweets/cache/stats", headers=headers)).json()
+    assert stats["hits"] >= stats_before["hits"] + 2
+
+    # A purchase invalidates both the list and the single-sweet entry
+    assert (await client.get(f"/api/sweets/{sweet['id']}")).json()["quantity"] == 4
+    await client.post(f"/api/sweets/{sweet['id']}/purchase", json={"amount": 1}, headers=headers)
+
+    changed = await client.get("/api/sweets/", params=params, headers={"If-None-Match": etag})
+    assert changed.status_code == 200
+    assert changed.headers["ETag"] != etag
+    assert changed.json()[0]["quantity"] == 3
+    assert (await client.get(f"/api/sweets/{sweet['id']}")).json()["quantity"] == 3
+
+    assert (await client.get("/api/sweets/999999999")).status_code == 404
+
+@pytest.mark.asyncio
+async def test_catalog_compression_and_last_modified(client, monkeypatch):
+    monkeypatch.setattr(settings, "COMPRESSION_MIN_BYTES", 200)
+    admin_token = await get_token(client, role="admin")
+    first = await create_sweet(client, admin_token)
+    for _ in range(4):
+        await create_sweet(client, admin_token)
+    after = first["id"] - 1
+
+    plain = await client.get("/api/sweets/", params={"after": after}, headers={"Accept-Encoding": "identity"})
+    assert "content-encoding" not in plain.headers
+    assert plain.headers["Cache-Control"] == "no-cache"
+    assert "Accept-Encoding" in plain.headers["Vary"]
+
+    # Compressed once, then served from the cached entry
+    zipped = await client.get("/api/sweets/", params={"after": after}, headers={"Accept-Encoding": "gzip"})
+    assert zipped.headers["content-encoding"] == "gzip"
+    assert zipped.json() == plain.json()
+    assert int(zipped.headers["content-length"]) < len(plain.content)
+    _, _, encoded = await catalog_cache.get(await catalog_key(f"list:None:{after}:None"))
+    assert set(encoded) == {"gzip"}
+
+    last_modified = plain.headers["Last-Modified"]
+    not_modified = await client.get("/api/sweets/", params={"after": after}, headers={"If-Modified-Since": last_modified})
+    assert not_modified.status_code == 304
+    stale = await client.get("/api/sweets/", params={"after": after}, headers={"If-Modified-Since": "Sat, 01 Jan 2000 00:00:00 GMT"})
+    assert stale.status_code == 200
+
+    # Another worker changes a sweet (nothing here is invalidated) and a
+    # minute later this worker's cached page has expired: the page it builds
+    # now is newer than what the client holds
+    async with engine.begin() as conn:
+        await conn.execute(text(f"UPDATE sweets SET price = price + 1 WHERE id = {first['id']}"))
+    await catalog_cache.clear()
+    monkeypatch.setattr(sweets_api, "time", SimpleNamespace(time=lambda: time.time() + 60))
+    changed = await client.get("/api/sweets/", params={"after": after}, headers={"If-Modified-Since": last_modified})
+    assert changed.status_code == 200
+    assert changed.json()[0]["price"] == first["price"] + 1
+    assert (await client.get("/api/sweets/", params={"after": after}, headers={"If-Modified-Since": changed.headers["Last-Modified"]})).status_code == 304
+
+    # Other responses go through the middleware; small ones stay as they are
+    metrics = await client.get("/metrics", headers={"Accept-Encoding": "gzip"})
+    assert metrics.headers["content-encoding"] == "gzip"
+    assert "http_request_duration_seconds" in metrics.text
+    small = await client.get(f"/api/sweets/{first['id']}", headers={"Accept-Encoding": "gzip"})
+    assert "content-encoding" not in small.headers
+
+def test_choose_encoding():
+    assert choose_encoding("gzip, deflate") == "gzip"
+    assert choose_encoding("gzip;q=0, deflate") is None
+    assert choose_encoding("*") in ENCODINGS
+    assert choose_encoding(None) is None
+
+@pytest.mark.asyncio
+async def test_catalog_reads_use_replicas(client, tmp_path, monkeypatch):
+    # A second SQLite file stands in for a replica that hasn't caught up
+    tag = uuid.uuid4().hex[:8]
+    [replica] = database.make_replica_sessions([f"sqlite+aiosqlite:///{tmp_path}/replica.db"])
+    async with replica() as session:
+        conn = await session.connection()
+        await conn.run_sync(Base.metadata.create_all)
+        await conn.run_sync(install_search_index)
+        await session.execute(text(
+            f"INSERT INTO sweets (name, category, price, quantity, is_veg) VALUES ('Replica {tag}', 'Candy', 1, 1, 1)"
+        ))
+        await session.commit()
+    monkeypatch.setattr(database, "replica_sessions", [replica])
+
+    response = await client.get("/api/sweets/search", params={"name": f"replica {tag}"})
+    assert [s["name"] for s in response.json()] == [f"Replica {tag}"]
+
+    # A write goes to the primary; anonymous readers still see the lagging replica...
+    admin_token = await get_token(client, role="admin")
+    await create_sweet(client, admin_token, name=f"Fresh {tag}")
+    response = await client.get("/api/sweets/search", params={"name": f"fresh {tag}"})
+    assert response.json() == []
+
+    # ...while the writer reads its own write from the primary
+    headers = {"Authorization": f"Bearer {admin_token}"}
+    response = await client.get("/api/sweets/search", params={"name": f"fresh {tag}"}, headers=headers)
+    assert [s["name"] for s in response.json()] == [f"Fresh {tag}"]
+
+    # ...with any of their tokens (a refreshed one, another tab)
+    claims = jwt.get_unverified_claims(admin_token)
+    other_token = create_access_token({k: v for k, v in claims.items() if k not in ("exp", "iat")})
+    assert other_token != admin_token
+    response = await client.get("/api/sweets/search", params={"name": f"FRESH {tag}"}, headers={"Authorization": f"Bearer {other_token}"})  # not the page just cached
+    assert [s["name"] for s in response.json()] == [f"Fresh {tag}"]
+
+@pytest.mark.asyncio
+async def test_purchase_sweet(client):
+    admin_token = await get_token(client, role="admin")
+    sweet = await create_sweet(client, admin_token, quantity=3)
+    headers = {"Authorization": f"Bearer {admin_token}"}
+
+    response = await client.post(f"/api/sweets/{sweet['id']}/purchase", json={"amount": 2}, headers=headers)
+    assert response.status_code == 200
+    assert response.json()["quantity"] == 1
+
+    # Only one left: buying two must fail without touching stock
+    response = await client.post(f"/api/sweets/{sweet['id']}/purchase", json={"amount": 2}, headers=headers)
+    assert response.status_code == 400
+
+    response = await client.post("/api/sweets/999999999/purchase", json={"amount": 1}, headers=headers)
+    assert response.status_code == 404
+
+    response = await client.post(f"/api/sweets/{sweet['id']}/purchase", json={"amount": -5}, headers=headers)
+    assert response.status_code == 422
+
+@pytest.mark.asyncio
+async def test_concurrent_purchases_never_oversell(client):
+    admin_token = await get_token(client, role="admin")
+    stock = 150
+    sweet = await create_sweet(client, admin_token, quantity=stock)
+    headers = {"Authorization": f"Bearer {await get_token(client)}"}
+
+    # Fire far more purchases than there is stock. SQLite serialises writers on a
+    # file lock, so cap in-flight requests at a realistic number of tills.
+    attempts = 2000
+    tills = asyncio.Semaphore(5)
+
+    async def buy():
+        async with tills:
+            return await client.post(f"/api/sweets/{sweet['id']}/purchase", json={"amount": 1}, headers=headers)
+
+    responses = await asyncio.gather(*[buy() for _ in range(attempts)])
+    codes = [r.status_code for r in responses]
+
+    assert codes.count(200) == stock
+    assert codes.count(400) == attempts - stock
+    assert min(r.json()["quantity"] for r in responses if r.status_code == 200) == 0
+
+    async with engine.connect() as conn:
+        remaining = await conn.scalar(text(f"SELECT quantity FROM sweets WHERE id = {sweet['id']}"))
+    assert remaining == 0
+
+
+@pytest.mark.asyncio
+async def test_inventory_event_log(client):
+    admin_token = await get_token(client, role="admin")
+    sweet = await create_sweet(client, admin_token, quantity=10)
+    admin = {"Authorization": f"Bearer {admin_token}"}
+    worker = {"Authorization": f"Bearer {await get_token(client)}"}
+
+    await client.post(f"/api/sweets/{sweet['id']}/purchase", json={"amount": 3}, headers=worker)
+    await client.post(f"/api/sweets/{sweet['id']}/purchase", json={"amount": 30}, headers=worker)  # refused, not logged
+    await client.post(f"/api/sweets/{sweet['id']}/restock", json={"amount": 5}, headers=admin)
+    await client.put(f"/api/sweets/{sweet['id']}", json={"quantity": 4}, headers=admin)
+
+    response = await client.get(f"/api/sweets/{sweet['id']}/events", headers=admin)
+    assert response.status_code == 200
+    events = response.json()
+    assert [(e["kind"], e["delta"]) for e in events] == [("adjust", -8), ("restock", 5), ("purchase", -3)]
+    assert all(e["user_id"] for e in events)
+
+    response = await client.get(f"/api/sweets/{sweet['id']}/events", headers=worker)
+    assert response.status_code == 403
+
+@pytest.mark.asyncio
+async def test_concurrent_restocks_and_purchases_add_up(client):
+    admin_token = await get_token(client, role="admin")
+    sweet = await create_sweet(client, admin_token, quantity=100)
+    admin = {"Authorization": f"Bearer {admin_token}"}
+    worker = {"Authorization": f"Bearer {await get_token(client)}"}
+    tills = asyncio.Semaphore(8)
+
+    async def send(path, headers):
+        async with tills:
+            return await client.post(f"/api/sweets/{sweet['id']}/{path}", json={"amount": 1}, headers=headers)
+
+    responses = await asyncio.gather(*[send("purchase", worker) for _ in range(50)], *[send("restock", admin) for _ in range(50)])
+    assert all(r.status_code == 200 for r in responses)
+
+    async with engine.connect() as conn:
+        remaining = await conn.scalar(text(f"SELECT quantity FROM sweets WHERE id = {sweet['id']}"))
+        logged = await conn.scalar(text(f"SELECT SUM(delta) FROM inventory_events WHERE sweet_id = {sweet['id']}"))
+    assert remaining == 100
+    assert logged == 0
+
+@pytest.mark.asyncio
+async def test_write_behind_purchases_never_oversell(client, monkeypatch):
+    monkeypatch.setattr(settings, "INVENTORY_WRITE_BEHIND", True)
+    admin_token = await get_token(client, role="admin")
+    stock = 100
+    sweet = await create_sweet(client, admin_token, quantity=stock)
+    headers = {"Authorization": f"Bearer {await get_token(client)}"}
+
+    # No till cap needed: sales don't hold the SQLite write lock, the writer
+    # commits them in batches
+    attempts = 400
+    responses = await asyncio.gather(*[
+        client.post(f"/api/sweets/{sweet['id']}/purchase", json={"amount": 1}, headers=headers)
+        for _ in range(attempts)
+    ])
+    codes = [r.status_code for r in responses]
+    assert codes.count(200) == stock
+    assert codes.count(400) == attempts - stock
+
+    response = await client.post("/api/sweets/checkout", json={"items": [{"sweet_id": 999999999}]}, headers=headers)
+    assert response.status_code == 404
+    await inventory_writer.stop()
+
+    async with engine.connect() as conn:
+        remaining = await conn.scalar(text(f"SELECT quantity FROM sweets WHERE id = {sweet['id']}"))
+        logged = await conn.scalar(text(f"SELECT SUM(delta) FROM inventory_events WHERE sweet_id = {sweet['id']}"))
+    assert remaining == 0
+    assert logged == -stock
+
+@pytest.mark.asyncio
+async def test_live_inventory_events(client):
+    admin_token = await get_token(client, role="admin")
+    admin = {"Authorization": f"Bearer {admin_token}"}
+    queue = broadcaster.subscribe()
+    try:
+        sweet = await create_sweet(client, admin_token, quantity=6)
+        await client.post(f"/api/sweets/{sweet['id']}/purchase", json={"amount": 2}, headers=admin)
+        await client.post(f"/api/sweets/{sweet['id']}/purchase", json={"amount": 1}, headers=admin)  # already low: no second alert
+        await client.post(f"/api/sweets/{sweet['id']}/restock", json={"amount": 10}, headers=admin)
+        await client.put(f"/api/sweets/{sweet['id']}", json={"quantity": 1}, headers=admin)
+        await client.delete(f"/api/sweets/{sweet['id']}", headers=admin)
+    finally:
+        broadcaster.unsubscribe(queue)
+
+    events = []
+    while not queue.empty():
+        _, kind, data = queue.get_nowait()
+        if data.get("id") == sweet["id"]:
+            events.append((kind, data.get("quantity")))
+    assert events == [
+        ("sweet", 6), ("stock", 4), ("low_stock", 4), ("stock", 3),
+        ("stock", 13), ("sweet", 1), ("low_stock", 1), ("delete", None),
+    ]
+
+@pytest.mark.asyncio
+async def test_broadcaster_replay_and_resync():
+    hub = Broadcaster(history=3, queue_size=2)
+    for i in range(5):
+        hub.publish("stock", {"id": i})
+
+    # Reconnect within the history: missed events are replayed
+    queue = hub.subscribe(last_event_id=hub.event_id(3))
+    assert [queue.get_nowait()[0] for _ in range(2)] == [4, 5]
+
+    # Too far behind: told to refetch instead
+    assert hub.subscribe(last_event_id=hub.event_id(1)).get_nowait()[1] == "resync"
+
+    # An id another worker issued, even one that looks current here
+    other = Broadcaster(history=3, queue_size=2)
+    assert hub.subscribe(last_event_id=other.event_id(5)).get_nowait()[1] == "resync"
+    assert hub.subscribe(last_event_id="5").get_nowait()[1] == "resync"
+    assert hub.subscribe(last_event_id=hub.event_id(5)).empty()
+
+    # Slow consumer: its backlog collapses into one resync
+    for i in range(3):
+        hub.publish("stock", {"id": i})
+    assert queue.qsize() == 1 and queue.get_nowait()[1] == "resync"
+
+@pytest.mark.asyncio
+async def test_sse_stream_format():
+    class Disconnected:
+        async def is_disconnected(self):
+            return True
+
+    stream = sse_stream(Disconnected())
+    assert await stream.__anext__() == "retry: 3000\n\n"
+    broadcaster.publish("stock", {"id": 1, "quantity": 2})
+    assert await stream.__anext__() == f"id: {broadcaster.stream}.{broadcaster.last_id}\nevent: stock\ndata: {{\"id\":1,\"quantity\":2}}\n\n"
+    await stream.aclose()
+    assert broadcaster.subscribers == 0
+
+@pytest.mark.asyncio
+async def test_checkout_basket(client):
+    admin_token = await get_token(client, role="admin")
+    first = await create_sweet(client, admin_token, quantity=5)
+    second = await create_sweet(client, admin_token, quantity=2)
+    headers = {"Authorization": f"Bearer {await get_token(client)}"}
+
+    basket = {"items": [
+        {"sweet_id": first["id"], "amount": 2},
+        {"sweet_id": second["id"], "amount": 1},
+        {"sweet_id": first["id"], "amount": 1},
+    ]}
+    response = await client.post("/api/sweets/checkout", json=basket, headers=headers)
+    assert response.status_code == 200
+    assert [(s["id"], s["quantity"]) for s in response.json()] == [(first["id"], 2), (second["id"], 1)]
+
+    # Second line can't be filled: nothing in the basket is sold
+    basket = {"items": [
+        {"sweet_id": first["id"], "amount": 1},
+        {"sweet_id": second["id"], "amount": 5},
+    ]}
+    response = await client.post("/api/sweets/checkout", json=basket, headers=headers)
+    assert response.status_code == 400
+
+    response = await client.post(f"/api/sweets/{first['id']}/purchase", json={"amount": 2}, headers=headers)
+    assert response.json()["quantity"] == 0
+
+    basket = {"items": [{"sweet_id": 999999999, "amount": 1}]}
+    response = await client.post("/api/sweets/checkout", json=basket, headers=headers)
+    assert response.status_code == 404
+
+
+@pytest.mark.asyncio
+async def test_import_inventory(client):
+    headers = {"Authorization": f"Bearer {await get_token(client, role='admin')}"}
+    tag = uuid.uuid4().hex[:8]
+
+    csv_body = (
+        "name,category,price,quantity,is_veg\n"
+        f"Barfi {tag},Indian,2.5,10,true\n"
+        f"Jalebi {tag},Indian,1.0,5,\n"
+        f"Barfi {tag},Indian,3.0,12,false\n"
+        f"Broken {tag},Indian,not-a-price,1,\n"
+    )
+    response = await client.post(
+        "/api/sweets/import",
+        files={"file": ("sweets.csv", csv_body, "text/csv")},
+        headers=headers,
+    )
+    assert response.status_code == 200
+    report = response.json()
+    assert (report["created"], report["updated"], report["failed"]) == (2, 1, 1)
+    assert [r["status"] for r in report["rows"]] == ["created", "created", "updated", "error"]
+
+    ndjson_body = (
+        f'{{"name": "Barfi {tag}", "amount": 3}}\n'
+        f'{{"name": "Missing {tag}", "amount": 1}}\n'
+        "not json\n"
+    )
+    response = await client.post(
+        "/api/sweets/import?mode=restock",
+        files={"file": ("delivery.ndjson", ndjson_body, "application/x-ndjson")},
+        headers=headers,
+    )
+    report = response.json()
+    assert (report["restocked"], report["failed"]) == (1, 2)
+
+    response = await client.get("/api/sweets/search", params={"name": f"Barfi {tag}"})
+    [barfi] = response.json()
+    assert (barfi["price"], barfi["quantity"], barfi["is_veg"]) == (3.0, 15, False)
+
+@pytest.mark.asyncio
+async def test_import_updates_only_given_columns(client):
+    admin_token = await get_token(client, role="admin")
+    sweet = await create_sweet(client, admin_token, quantity=10, image_url="http://img/x.png", is_veg=False)
+    headers = {"Authorization": f"Bearer {admin_token}"}
+
+    csv_body = f"name,category,price,quantity\n{sweet['name']},Candy,2.0,4\n"
+    response = await client.post(
+        "/api/sweets/import",
+        files={"file": ("sweets.csv", csv_body, "text/csv")},
+        headers=headers,
+    )
+    assert response.json()["updated"] == 1
+
+    response = await client.get(f"/api/sweets/{sweet['id']}", headers=headers)
+    updated = response.json()
+    assert (updated["price"], updated["quantity"]) == (2.0, 4)
+    assert (updated["image_url"], updated["is_veg"]) == ("http://img/x.png", False)
+
+    response = await client.get(f"/api/sweets/{sweet['id']}/events", headers=headers)
+    events = response.json()
+    assert [(e["kind"], e["delta"]) for e in events] == [("adjust", -6)]
+    assert events[0]["user_id"]
+
+@pytest.mark.asyncio
+async def test_idempotent_purchase_retries(client):
+    admin_token = await get_token(client, role="admin")
+    sweet = await create_sweet(client, admin_token, quantity=10)
+    key = uuid.uuid4().hex
+    headers = {"Authorization": f"Bearer {admin_token}", "Idempotency-Key": key}
+
+    first = await client.post(f"/api/sweets/{sweet['id']}/purchase", json={"amount": 3}, headers=headers)
+    retry = await client.post(f"/api/sweets/{sweet['id']}/purchase", json={"amount": 3}, headers=headers)
+    assert first.status_code == retry.status_code == 200
+    assert retry.json() == first.json() == {**sweet, "quantity": 7}
+    assert retry.headers["idempotent-replayed"] == "true"
+
+    # Same key, different request
+    response = await client.post(f"/api/sweets/{sweet['id']}/purchase", json={"amount": 1}, headers=headers)
+    assert response.status_code == 422
+
+    # Keys are per user: someone else's identical key runs for real
+    other = {"Authorization": f"Bearer {await get_token(client)}", "Idempotency-Key": key}
+    response = await client.post(f"/api/sweets/{sweet['id']}/purchase", json={"amount": 3}, headers=other)
+    assert response.json()["quantity"] == 4 and "idempotent-replayed" not in response.headers
+
+    # Errors are recorded too: retrying a refused purchase stays refused without another attempt
+    headers["Idempotency-Key"] = uuid.uuid4().hex
+    for _ in range(2):
+        response = await client.post(f"/api/sweets/{sweet['id']}/purchase", json={"amount": 50}, headers=headers)
+        assert response.status_code == 400
+
+    # Survives a restart: the recorded response is in the database
+    idempotency._recorded.clear()
+    headers["Idempotency-Key"] = key
+    response = await client.post(f"/api/sweets/{sweet['id']}/purchase", json={"amount": 3}, headers=headers)
+    assert response.json()["quantity"] == 7 and response.headers["idempotent-replayed"] == "true"
+
+    async with engine.connect() as conn:
+        remaining = await conn.scalar(text(f"SELECT quantity FROM sweets WHERE id = {sweet['id']}"))
+    assert remaining == 4
+
+@pytest.mark.asyncio
+async def test_idempotency_key_claimed_across_workers(client, monkeypatch):
+    admin_token = await get_token(client, role="admin")
+    sweet = await create_sweet(client, admin_token, quantity=10)
+    key = uuid.uuid4().hex
+    headers = {"Authorization": f"Bearer {admin_token}", "Idempotency-Key": key, "Content-Type": "application/json"}
+    path, body = f"/api/sweets/{sweet['id']}/purchase", b'{"amount": 2}'
+
+    # Another worker is running the same request: its claim is in the table
+    user_id = await user_id_from_authorization(f"Bearer {admin_token}")
+    fingerprint = hashlib.sha256(b"POST %s\n%s" % (path.encode(), body)).hexdigest()
+    assert await idempotency.IdempotencyMiddleware(None)._claim(f"{user_id}:{key}", fingerprint) is None
+    response = await client.post(path, content=body, headers=headers)
+    assert response.status_code == 409
+
+    # A 5xx gives the key back, so the retry runs for real
+    headers["Idempotency-Key"] = uuid.uuid4().hex
+    async def broken(*args, **kwargs):
+        raise HTTPException(status_code=503, detail="down")
+    monkeypatch.setattr(sweets_api, "_decrement_stock", broken)
+    assert (await client.post(path, content=body, headers=headers)).status_code == 503
+    monkeypatch.undo()
+    response = await client.post(path, content=body, headers=headers)
+    assert response.status_code == 200 and response.json()["quantity"] == 8
+
@@ -0,0 +1,90 @@
+import json
+import uuid
+import pytest
+from sqlalchemy import select
+import manage
+from app.core.database import SessionLocal
+from app.models.user import User
+from tests.test_auth import register_and_login
+
+async def login(client, username, password):
+    response = await client.post("/api/auth/login", data={"username": username, "password": password})
+    return response.status_code
+
+async def roles(usernames):
+    async with SessionLocal() as db:
+        return dict((await db.execute(select(User.username, User.role).where(User.username.in_(usernames)))).all())
+
+@pytest.mark.asyncio
+async def test_import_roster(client, tmp_path, capsys):
+    tag = uuid.uuid4().hex[:8]
+    names = [f"staff{i}_{tag}" for i in range(5)]
+    roster = tmp_path / "staff.csv"
+    roster.write_text(
+        "username,password,role\n"
+        + "".join(f"{name},pw{i},{'admin' if i == 0 else ''}\n" for i, name in enumerate(names))
+        + f"{names[1]},again,\n"
+        + f"chef_{tag},pw,chef\n"
+    )
+
+    assert await manage.run(["users", "import", str(roster), "--dry-run"]) == 1  # the bad row
+    assert "would create 5, skipped 1 existing/duplicate, failed 1" in capsys.readouterr().out
+    assert await roles(names) == {}
+
+    # Small batches and two processes, so both batching and the pool are used
+    assert await manage.run(["users", "import", str(roster), "--workers", "2", "--batch-size", "2"]) == 1
+    assert "created 5, skipped 1 existing/duplicate, failed 1" in capsys.readouterr().out
+    assert await roles(names) == {names[0]: "admin", **{name: "worker" for name in names[1:]}}
+    assert await login(client, names[3], "pw3") == 200
+    assert await login(client, names[1], "again") == 401
+
+    # Re-running with newcomers added only creates the newcomers
+    roster = tmp_path / "staff.ndjson"
+    roster.write_text("".join(json.dumps({"username": name, "password": "new"}) + "\n" for name in [names[0], f"new_{tag}"]))
+    assert await manage.run(["users", "import", str(roster), "--role", "customer"]) == 0
+    assert "created 1, skipped 1" in capsys.readouterr().out
+    assert await roles([names[0], f"new_{tag}"]) == {names[0]: "admin", f"new_{tag}": "customer"}
+
+    assert await manage.run(["users", "delete", *names[:2], "--dry-run"]) == 0
+    assert len(await roles(names)) == 5
+    assert await manage.run(["users", "delete", *names[:2], f"ghost_{tag}"]) == 0
+    assert "deleted 2 users" in capsys.readouterr().out
+    assert set(await roles(names)) == set(names[2:])
+
+@pytest.mark.asyncio
+async def test_bulk_role_change(client):
+    admin_name, admin = await register_and_login(client, role="admin")
+    staff = [await register_and_login(client) for _ in range(3)]
+    usernames = [name for name, _ in staff]
+    headers = {"Authorization": f"Bearer {admin}"}
+
+    response = await client.put("/api/auth/users/role", json={"usernames": usernames[:2] + ["nobody_" + uuid.uuid4().hex], "role": "admin"}, headers=headers)
+    assert response.status_code == 200
+    report = response.json()
+    assert report["updated"] == usernames[:2]
+    assert len(report["missing"]) == 1
+    assert await roles(usernames) == {usernames[0]: "admin", usernames[1]: "admin", usernames[2]: "customer"}
+
+    # Promoted users' old tokens stop working; the untouched one's doesn't
+    assert (await client.get("/api/sweets/cache/stats", headers={"Authorization": f"Bearer {staff[0][1]}"})).status_code == 401
+    assert (await client.get("/api/sweets/cache/stats", headers={"Authorization": f"Bearer {staff[2][1]}"})).status_code == 403
+
+    again = await client.put("/api/auth/users/role", json={"usernames": usernames[:1], "role": "admin"}, headers=headers)
+    assert again.json()["unchanged"] == usernames[:1]
+    assert (await client.put("/api/auth/users/role", json={"usernames": usernames, "role": "chef"}, headers=headers)).status_code == 400
+    assert (await client.put("/api/auth/users/role", json={"usernames": usernames, "role": "superadmin"}, headers=headers)).status_code == 403
+    worker = {"Authorization": f"Bearer {staff[2][1]}"}
+    assert (await client.put("/api/auth/users/role", json={"usernames": usernames, "role": "worker"}, headers=worker)).status_code == 403
+
+    # An admin can't demote a superadmin, even in a batch, nor change their own role
+    boss, boss_token = await register_and_login(client, role="superadmin")
+    response = await client.put("/api/auth/users/role", json={"usernames": [usernames[2], boss], "role": "customer"}, headers=headers)
+    assert response.status_code == 403
+    assert await roles([usernames[2], boss]) == {usernames[2]: "customer", boss: "superadmin"}
+    assert (await client.put("/api/auth/users/role", json={"usernames": [admin_name], "role": "superadmin"}, headers=headers)).status_code == 403
+    assert (await client.put("/api/auth/users/role", json={"usernames": [admin_name], "role": "worker"}, headers=headers)).status_code == 403
+
+    # A superadmin can do both to others, but not step down themselves
+    boss_headers = {"Authorization": f"Bearer {boss_token}"}
+    assert (await client.put("/api/auth/users/role", json={"usernames": [boss], "role": "admin"}, headers=boss_headers)).status_code == 403
+    assert (await client.put("/api/auth/users/role", json={"usernames": [admin_name], "role": "superadmin"}, headers=boss_headers)).status_code == 200
@@ -1,11 +1,12 @@
-import { createContext, useState } from 'react';
+import { createContext, useEffect, useState } from 'react';
 import type { ReactNode } from 'react'; // <--- FIX: Explicit type import
+import api from '../services/api';
 
 // 1. Define the Shape of the Context
 interface AuthContextType {
   token: string | null;
   userRole: string | null;
-  login: (token: string, role: string) => void;
+  login: (token: string, role: string, refreshToken?: string) => void;
   logout: () => void;
   isAuthenticated: boolean;
 }
@@ -18,10 +19,22 @@ export const AuthProvider = ({ children }: { children: ReactNode }) => {
   const [token, setToken] = useState<string | null>(localStorage.getItem('token'));
   const [userRole, setUserRole] = useState<string | null>(localStorage.getItem('userRole'));
 
-  const login = (newToken: string, newRole: string) => {
+  // The api client refreshes expired tokens on its own and announces them here
+  useEffect(() => {
+    const onToken = (e: Event) => {
+      const { token, role } = (e as CustomEvent<{ token: string; role: string }>).detail;
+      setToken(token);
+      setUserRole(role);
+    };
+    window.addEventListener('auth:token', onToken);
+    return () => window.removeEventListener('auth:token', onToken);
+  }, []);
+
+  const login = (newToken: string, newRole: string, refreshToken?: string) => {
     // Save to Local Storage (so it survives refresh)
     localStorage.setItem('token', newToken);
     localStorage.setItem('userRole', newRole);
+    if (refreshToken) localStorage.setItem('refreshToken', refreshToken);
     
     // Update State
     setToken(newToken);
@@ -29,6 +42,10 @@ export const AuthProvider = ({ children }: { children: ReactNode }) => {
   };
 
   const logout = () => {
+    // End the session server-side too, so the refresh token can't be reused
+    const refreshToken = localStorage.getItem('refreshToken');
+    if (refreshToken) api.post('/auth/logout', { refresh_token: refreshToken }).catch(() => {});
+    localStorage.removeItem('refreshToken');
     localStorage.removeItem('token');
     localStorage.removeItem('userRole');
     setToken(null);
@@ -66,12 +66,16 @@ const Dashboard = () => {
 
   const [restockingId, setRestockingId] = useState<number | null>(null);
 
+  const [lowStockAlert, setLowStockAlert] = useState<string | null>(null);
+
   
 
   const auth = useContext(AuthContext);
 
   const navigate = useNavigate();
 
+  const isAdmin = ['admin', 'superadmin'].includes(auth?.userRole ?? ''); // same roles as get_current_admin
+
 
 
   const [formData, setFormData] = useState({
@@ -100,6 +104,71 @@ const Dashboard = () => {
 
 
 
+  // 1b. Live Updates: the server pushes every stock change, so actions don't refetch the list
+
+  useEffect(() => {
+
+    const events = new EventSource(`${api.defaults.baseURL}/events`);
+
+    const data = (e: Event) => JSON.parse((e as MessageEvent).data);
+
+    events.addEventListener('stock', (e) => {
+
+      const { id, quantity } = data(e);
+
+      setSweets(prev => prev.map(s => s.id === id ? { ...s, quantity } : s));
+
+    });
+
+    events.addEventListener('sweet', (e) => upsertSweet(data(e)));
+
+    events.addEventListener('delete', (e) => {
+
+      const { id } = data(e);
+
+      setSweets(prev => prev.filter(s => s.id !== id));
+
+    });
+
+    events.addEventListener('low_stock', (e) => {
+
+      const { name, quantity } = data(e);
+
+      setLowStockAlert(`${name} is running low: ${quantity} left`);
+
+    });
+
+    events.addEventListener('resync', () => fetchSweets()); // bulk change or missed events
+
+    // Each worker only broadcasts its own writes, so the stream can miss
+    // changes made through another one. Catch up once a dropped connection
+    // is back, when the tab comes back, and every minute regardless.
+    let dropped = false;
+
+    events.addEventListener('error', () => { dropped = true; });
+
+    events.addEventListener('open', () => { if (dropped) fetchSweets(); dropped = false; });
+
+    const onVisible = () => { if (document.visibilityState === 'visible') fetchSweets(); };
+
+    document.addEventListener('visibilitychange', onVisible);
+
+    const poll = setInterval(fetchSweets, 60_000);
+
+    return () => {
+
+      events.close();
+
+      document.removeEventListener('visibilitychange', onVisible);
+
+      clearInterval(poll);
+
+    };
+
+  }, []);
+
+
+
   // 2. Intelligent Filtering Effect
 
   useEffect(() => {
@@ -180,6 +249,16 @@ const Dashboard = () => {
 
 
 
+  // Apply a sweet returned by the API right away (the event stream brings the same change)
+
+  const upsertSweet = (sweet: Sweet) => {
+
+    setSweets(prev => prev.some(s => s.id === sweet.id) ? prev.map(s => s.id === sweet.id ? sweet : s) : [...prev, sweet]);
+
+  };
+
+
+
   const handleLogout = () => {
 
     auth?.logout();
@@ -204,7 +283,7 @@ const Dashboard = () => {
 
       await api.delete(`/sweets/${id}`);
 
-      fetchSweets(); // Refresh Master List
+      setSweets(prev => prev.filter(s => s.id !== id));
 
     } catch (error) { alert("Delete failed."); }
 
@@ -246,9 +325,9 @@ const Dashboard = () => {
 
     try {
 
-      await api.post(`/sweets/${id}/purchase`, { amount: 1 });
+      const response = await api.post(`/sweets/${id}/purchase`, { amount: 1 });
 
-      fetchSweets(); // Refresh Master List
+      upsertSweet(response.data);
 
     } catch (error) { alert("Purchase failed."); }
 
@@ -270,9 +349,9 @@ const Dashboard = () => {
 
     try {
 
-      await api.post(`/sweets/${id}/restock`, { amount });
+      const response = await api.post(`/sweets/${id}/restock`, { amount });
 
-      fetchSweets(); // Refresh Master List
+      upsertSweet(response.data);
 
     } catch (error) { alert("Restock failed."); }
 
@@ -300,9 +379,13 @@ const Dashboard = () => {
 
       };
 
-      if (editingSweet) await api.put(`/sweets/${editingSweet.id}`, payload);
+      const response = editingSweet
+
+        ? await api.put(`/sweets/${editingSweet.id}`, payload)
 
-      else await api.post('/sweets/', payload);
+        : await api.post('/sweets/', payload);
+
+      upsertSweet(response.data);
 
       
 
@@ -312,8 +395,6 @@ const Dashboard = () => {
 
       setFormData({ name: '', category: '', price: '', quantity: '', is_veg: true });
 
-      fetchSweets(); // Refresh Master List
-
     } catch (error) { alert("Operation failed."); }
 
     finally { setIsSubmitting(false); }
@@ -404,9 +485,9 @@ const Dashboard = () => {
 
             <div className="flex items-center gap-4">
 
-              <div className={`hidden sm:flex flex-col items-end px-4 py-1.5 rounded-xl border ${auth?.userRole === 'admin' ? 'bg-purple-50 border-purple-100' : 'bg-blue-50 border-blue-100'}`}>
+              <div className={`hidden sm:flex flex-col items-end px-4 py-1.5 rounded-xl border ${isAdmin ? 'bg-purple-50 border-purple-100' : 'bg-blue-50 border-blue-100'}`}>
 
-                <span className={`text-[10px] font-bold uppercase tracking-wider ${auth?.userRole === 'admin' ? 'text-purple-600' : 'text-blue-600'}`}>
+                <span className={`text-[10px] font-bold uppercase tracking-wider ${isAdmin ? 'text-purple-600' : 'text-blue-600'}`}>
 
                   Logged in as
 
@@ -472,7 +553,7 @@ const Dashboard = () => {
 
 
 
-          {auth?.userRole === 'admin' && (
+          {isAdmin && (
 
             <button 
 
@@ -656,6 +737,24 @@ const Dashboard = () => {
 
 
 
+        {lowStockAlert && isAdmin && (
+
+          <div className="mb-8 flex items-center justify-between gap-4 bg-red-50 border border-red-100 text-red-600 px-5 py-3 rounded-2xl font-semibold animate-slide-up">
+
+            <span>{lowStockAlert}</span>
+
+            <button onClick={() => setLowStockAlert(null)} className="p-1 rounded-lg hover:bg-red-100" title="Dismiss">
+
+              <X size={18} />
+
+            </button>
+
+          </div>
+
+        )}
+
+
+
         {filteredSweets.length === 0 ? (
 
           <div className="text-center py-20 animate-slide-up">
@@ -726,7 +825,7 @@ const Dashboard = () => {
 
 
 
-                  {auth?.userRole === 'admin' && (
+                  {isAdmin && (
 
                     <div className="absolute top-3 right-3 z-20 flex flex-col gap-2 opacity-0 group-hover:opacity-100 transition-all duration-300 translate-x-4 group-hover:translate-x-0">
 
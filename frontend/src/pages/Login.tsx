@@ -31,7 +31,7 @@ const Login = () => {
       const role = payload.role || 'customer'; 
 
       // 3. Save to Context
-      auth?.login(token, role);
+      auth?.login(token, role, res.data.refresh_token);
       
       navigate('/dashboard');
     } catch (err) {
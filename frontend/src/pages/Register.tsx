@@ -1,23 +1,19 @@
 import { useState } from 'react';
 import { useNavigate, Link } from 'react-router-dom';
 import api from '../services/api';
-import { User, Shield, UserPlus, ArrowLeft } from 'lucide-react';
+import { UserPlus, ArrowLeft } from 'lucide-react';
 
 const Register = () => {
   const [username, setUsername] = useState('');
   const [password, setPassword] = useState('');
-  const [role, setRole] = useState('customer'); // Default role
   const [error, setError] = useState('');
   const navigate = useNavigate();
 
   const handleRegister = async (e: React.FormEvent) => {
     e.preventDefault();
     try {
-      await api.post('/auth/register', { 
-        username, 
-        password,
-        role // Send the selected role to backend
-      });
+      // New accounts are customers; an admin hands out staff roles
+      await api.post('/auth/register', { username, password });
       alert("Registration Successful! Please Login.");
       navigate('/login');
     } catch (err: any) {
@@ -45,25 +41,6 @@ const Register = () => {
 
         <form onSubmit={handleRegister} className="space-y-5">
           
-          {/* Role Selection */}
-          <div className="grid grid-cols-2 gap-4 mb-2">
-            <div 
-              onClick={() => setRole('customer')}
-              className={`cursor-pointer p-4 rounded-xl border-2 flex flex-col items-center gap-2 transition-all ${role === 'customer' ? 'border-blue-500 bg-blue-50 text-blue-700' : 'border-gray-200 hover:border-gray-300 text-gray-500'}`}
-            >
-              <User size={24} />
-              <span className="font-semibold text-sm">Customer</span>
-            </div>
-            
-            <div 
-              onClick={() => setRole('admin')}
-              className={`cursor-pointer p-4 rounded-xl border-2 flex flex-col items-center gap-2 transition-all ${role === 'admin' ? 'border-purple-500 bg-purple-50 text-purple-700' : 'border-gray-200 hover:border-gray-300 text-gray-500'}`}
-            >
-              <Shield size={24} />
-              <span className="font-semibold text-sm">Admin</span>
-            </div>
-          </div>
-
           {/* Inputs */}
           <div>
             <label className="block text-sm font-medium text-gray-700 mb-1">Username</label>
@@ -91,11 +68,10 @@ const Register = () => {
 
           <button 
             type="submit" 
-            className={`w-full py-3.5 rounded-xl text-white font-bold text-lg shadow-lg transition-transform active:scale-95 flex items-center justify-center gap-2
-              ${role === 'admin' ? 'bg-purple-600 hover:bg-purple-700 shadow-purple-200' : 'bg-blue-600 hover:bg-blue-700 shadow-blue-200'}`}
+            className="w-full py-3.5 rounded-xl text-white font-bold text-lg shadow-lg transition-transform active:scale-95 flex items-center justify-center gap-2 bg-blue-600 hover:bg-blue-700 shadow-blue-200"
           >
             <UserPlus size={20} />
-            Sign Up as {role === 'admin' ? 'Admin' : 'Customer'}
+            Sign Up
           </button>
         </form>
 
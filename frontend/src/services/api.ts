@@ -13,4 +13,42 @@ api.interceptors.request.use((config) => {
   return config;
 });
 
+// Access tokens are short-lived: on a 401, trade the refresh token for a new
+// pair once and retry, instead of sending the user back to the login page.
+// Concurrent 401s share one refresh (refresh tokens are single use).
+let refreshing: Promise<string | null> | null = null;
+
+const refreshAccessToken = async (): Promise<string | null> => {
+  const refreshToken = localStorage.getItem('refreshToken');
+  if (!refreshToken) return null;
+  try {
+    const res = await axios.post(`${api.defaults.baseURL}/auth/refresh`, { refresh_token: refreshToken });
+    const token = res.data.access_token;
+    // The role may have changed since login; the new token carries the current one
+    const role = JSON.parse(atob(token.split('.')[1])).role || 'customer';
+    localStorage.setItem('token', token);
+    localStorage.setItem('userRole', role);
+    localStorage.setItem('refreshToken', res.data.refresh_token);
+    // Let AuthContext (and so the components reading it) pick up the new pair
+    window.dispatchEvent(new CustomEvent('auth:token', { detail: { token, role } }));
+    return token;
+  } catch {
+    localStorage.removeItem('refreshToken');
+    return null;
+  }
+};
+
+api.interceptors.response.use(undefined, async (error) => {
+  const original = error.config;
+  if (error.response?.status !== 401 || !original || original._retried || original.url?.startsWith('/auth/')) {
+    return Promise.reject(error);
+  }
+  refreshing = refreshing ?? refreshAccessToken().finally(() => { refreshing = null; });
+  const token = await refreshing;
+  if (!token) return Promise.reject(error);
+  original._retried = true;
+  original.headers.Authorization = `Bearer ${token}`;
+  return api(original);
+});
+
 export default api;